@@ -0,0 +1,66 @@
+"""
+Cost of selecting messages from a parsed ``.index`` file: the columnar
+`IndexFile.select` compared with filtering the list of message dictionaries.
+
+The index mimics an ensemble file: 51 members of surface and pressure level
+parameters.
+
+    python benchmarks/index.py
+"""
+
+import json
+import timeit
+
+from stactools.ecmwf_forecast import reads
+from stactools.ecmwf_forecast.index import IndexFile
+
+SURFACE = ["2t", "10u", "10v", "msl", "sp", "tp", "tcwv", "skt", "ro", "ssrd"]
+PRESSURE = ["t", "u", "v", "q", "gh", "r", "d", "vo", "w"]
+LEVELS = [1000, 925, 850, 700, 500, 300, 250, 200, 50]
+
+
+def lines():
+    offset = 0
+    for number in range(51):
+        messages = [{"param": p, "levtype": "sfc"} for p in SURFACE] + [
+            {"param": p, "levtype": "pl", "levelist": str(level)}
+            for p in PRESSURE
+            for level in LEVELS
+        ]
+        for message in messages:
+            message.update(
+                number=str(number), step="0", _offset=offset, _length=800_000
+            )
+            offset += 800_000
+            yield json.dumps(message)
+
+
+def best_of(func, repeat=20, number=10):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main():
+    text = list(lines())
+    messages = [json.loads(line) for line in text]
+    index = IndexFile.from_lines(text)
+    t_parse = best_of(lambda: IndexFile.from_lines(text), repeat=5, number=1)
+    print(f"{len(index)} messages, parsed in {t_parse * 1e3:.1f} ms")
+
+    for selection in [
+        {"param": "t"},
+        {"param": "t", "levelist": [500, 850], "number": 0},
+        {"levtype": "sfc", "number": list(range(10))},
+    ]:
+        assert len(index.select(**selection)) == len(
+            reads.select_messages(messages, **selection)
+        )
+        t_list = best_of(lambda: reads.select_messages(messages, **selection))
+        t_index = best_of(lambda: index.select(**selection))
+        print(
+            f"{json.dumps(selection):<60} dicts {t_list * 1e3:7.3f} ms"
+            f"  IndexFile {t_index * 1e3:7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Per-call cost of `list_sibling_assets`, compared with the previous implementation
+that regrouped `constants.get_combinations()` and re-parsed every sibling filename.
+
+    python benchmarks/list_sibling_assets.py
+"""
+
+import itertools
+import operator
+import timeit
+
+from stactools.ecmwf_forecast import constants, stac
+
+FILENAMES = [
+    "ecmwf/20220202/00z/0p4-beta/enfo/20220202000000-0h-enfo-ef.grib2",
+    "ecmwf/20220202/00z/0p4-beta/oper/20220202000000-0h-oper-fc.grib2",
+    "ecmwf/20220202/06z/0p4-beta/scda/20220202060000-0h-scda-fc.grib2",
+    "ecmwf/20220202/12z/0p4-beta/waef/20220202120000-240h-waef-ep.grib2",
+]
+
+
+def list_sibling_assets_groupby(filename):
+    p = stac.Parts.from_filename(filename)
+    combinations = constants.get_combinations()
+    d = {
+        k: list(v)
+        for k, v in itertools.groupby(combinations, key=operator.itemgetter(0, 1, 2, 3))
+    }
+    combos = list(d[p.format, p.type, p.reference_datetime.strftime("%H"), p.stream])
+    prefix = p.prefix or ""
+    other_files = [
+        f"{prefix}{p.reference_datetime:%Y%m%d%H}0000-{combo.step}-{combo.stream}"
+        f"-{combo.type}.{combo.format}"
+        for combo in combos
+    ]
+    if p.format == "grib2":
+        other_files.extend([file.rsplit(".", 1)[0] + ".index" for file in other_files])
+    parts = [stac.Parts.from_filename(other_file) for other_file in other_files]
+    return sorted(parts, key=operator.attrgetter("step"))
+
+
+def main(number=200):
+    for filename in FILENAMES:
+        assert list_sibling_assets_groupby(filename) == stac.list_sibling_assets(
+            filename
+        )
+
+    for name, func in [
+        ("before (groupby + parse)", list_sibling_assets_groupby),
+        ("after (precomputed index)", stac.list_sibling_assets),
+    ]:
+        t = timeit.timeit(lambda: [func(f) for f in FILENAMES], number=number)
+        per_call = t / (number * len(FILENAMES)) * 1e6
+        print(f"{name:<28} {per_call:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost of parsing and grouping a large listing of HREFs, compared with the
+previous `strptime`-based parser and `group_assets`, which parsed every
+filename twice.
+
+    python benchmarks/parts.py
+"""
+
+import datetime
+import itertools
+import re
+import time
+
+from stactools.ecmwf_forecast import constants, stac
+
+xpr = re.compile(
+    r"(?P<reference_datetime>\d{10})0000-"
+    r"(?P<step>\d+[h|m])-"
+    r"(?P<stream>\w+)-"
+    r"(?P<type>\w+)."
+    r"(?P<format>\w+)"
+)
+
+
+def from_filename_strptime(filename):
+    d = xpr.match(filename.rsplit("/", 1)[-1]).groupdict()
+    d["reference_datetime"] = datetime.datetime.strptime(
+        d["reference_datetime"], "%Y%m%d%H"
+    )
+    return d
+
+
+def item_key_strptime(filename):
+    d = from_filename_strptime(filename)
+    return d["reference_datetime"], d["stream"], d["type"]
+
+
+def group_assets_twice(asset_hrefs, key=item_key_strptime):
+    return itertools.groupby(sorted(asset_hrefs, key=key), key=key)
+
+
+def listing(n=100_000):
+    hrefs = []
+    start = datetime.datetime(2023, 1, 1)
+    for i in itertools.count():
+        reference_datetime = start + datetime.timedelta(hours=6 * i)
+        for fmt, type_, reference_time, stream, step in constants.get_combinations():
+            if reference_time != reference_datetime.strftime("%H"):
+                continue
+            for ext in ["grib2", "index"]:
+                hrefs.append(
+                    f"ecmwf/{reference_datetime:%Y%m%d}/{reference_time}z/0p4-beta/{stream}/"
+                    f"{reference_datetime:%Y%m%d%H}0000-{step}-{stream}-{type_}.{ext}"
+                )
+                if len(hrefs) == n:
+                    return hrefs
+
+
+def timed(name, func):
+    t0 = time.perf_counter()
+    func()
+    print(f"{name:<40} {time.perf_counter() - t0:8.3f} s")
+
+
+def main():
+    hrefs = listing()
+    print(f"{len(hrefs)} hrefs")
+    timed(
+        "parse: before (strptime)", lambda: [from_filename_strptime(h) for h in hrefs]
+    )
+    timed(
+        "parse: after (Parts.from_filenames)", lambda: stac.Parts.from_filenames(hrefs)
+    )
+    timed(
+        "group: before (parse twice)",
+        lambda: [list(v) for _, v in group_assets_twice(hrefs)],
+    )
+    timed("group: after", lambda: [list(v) for _, v in stac.group_assets(hrefs)])
+
+
+if __name__ == "__main__":
+    main()
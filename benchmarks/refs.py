@@ -0,0 +1,111 @@
+"""
+Cost of post-processing combined kerchunk references (base64 encoding the inline
+values and range-compressing the coordinates), compared with the previous
+`convert_base64` / `compress_lat_lon`.
+
+The input is `tests/blob_kerchunk_indices.json`, with its variables repeated to
+the size of an ensemble file.
+
+    python benchmarks/refs.py
+"""
+
+import base64
+import copy
+import json
+import pathlib
+import timeit
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast.range_codec import Range
+
+FIXTURE = pathlib.Path(__file__).parents[1] / "tests" / "blob_kerchunk_indices.json"
+
+
+def convert_base64_substrings(d):
+    for key in d["refs"]:
+        if (
+            ("/0" in key)
+            & ("." not in key)
+            & ("latitude" not in key)
+            & ("longitude" not in key)
+        ):
+            if d["refs"][key][0:6] != "base64":
+                d["refs"][key] = (
+                    b"base64:" + base64.b64encode(d["refs"][key].encode())
+                ).decode()
+    return d
+
+
+def compress_lat_lon_split(d):
+    for coord in ["latitude", "longitude"]:
+        d["refs"][f"{coord}/0"] = (
+            "base64:"
+            + base64.b64encode(
+                Range().encode(base64.b64decode(d["refs"][f"{coord}/0"][7:]))
+            ).decode()
+        )
+        d["refs"][f"{coord}/.zarray"] = ",".join(
+            [
+                ":".join([i.split(":")[0], '[{"id": "range"}]']) if "filter" in i else i
+                for i in d["refs"][f"{coord}/.zarray"].split(",")
+            ]
+        )
+    return d
+
+
+def refs(copies=50):
+    """The fixture with its variables repeated `copies` times, with raw inline values."""
+    with open(FIXTURE) as f:
+        d = json.load(f)
+    # undo the post-processing, as in the output of MultiZarrToZarr
+    for coord in ["latitude", "longitude"]:
+        d["refs"][f"{coord}/0"] = (
+            "base64:"
+            + base64.b64encode(
+                Range().decode(base64.b64decode(d["refs"][f"{coord}/0"][7:])).tobytes()
+            ).decode()
+        )
+        zarray = json.loads(d["refs"][f"{coord}/.zarray"])
+        zarray["filters"] = None
+        d["refs"][f"{coord}/.zarray"] = json.dumps(zarray, separators=(",", ":"))
+
+    out = dict(d["refs"])
+    for key, value in d["refs"].items():
+        name, _, rest = key.partition("/")
+        if isinstance(value, list) or key.endswith("/.zattrs"):
+            for i in range(copies):
+                out[f"{name}_{i}/{rest}"] = value
+        if key in ("time/0", "step/0", "meanSea/0"):
+            for i in range(copies):
+                out[f"{name}_{i}/0"] = "\x00" * 8
+    return {"version": 1, "refs": out}
+
+
+def best_of(func, d, repeat=20):
+    """The best time of `func` over `repeat` fresh copies of `d`."""
+    times = []
+    for _ in range(repeat):
+        x = copy.deepcopy(d)
+        times.append(timeit.timeit(lambda: func(x), number=1))
+    return min(times)
+
+
+def main():
+    for copies in [1, 50, 500]:
+        d = refs(copies)
+        before = convert_base64_substrings(compress_lat_lon_split(copy.deepcopy(d)))
+        after = khf.postprocess_refs(copy.deepcopy(d))
+        assert before["refs"].keys() == after["refs"].keys()
+
+        t_before = best_of(
+            lambda x: convert_base64_substrings(compress_lat_lon_split(x)), d
+        )
+        t_after = best_of(khf.postprocess_refs, d)
+        print(
+            f"{len(d['refs']):>6} keys: before (substrings + split) {t_before * 1e3:7.2f} ms"
+            f"  after (single pass) {t_after * 1e3:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
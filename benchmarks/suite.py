@@ -0,0 +1,210 @@
+"""
+Offline benchmarks of importing the package and of item creation, on synthetic
+GRIB2 and ``.index`` files written with ecCodes for every entry of
+`constants.get_combinations()`.
+
+Nothing is read from the network, so this can run on air-gapped CI. Save the
+results of a release as a baseline, and compare a new version against it:
+
+    python benchmarks/suite.py --save baseline.json
+    python benchmarks/suite.py --compare baseline.json --tolerance 0.25
+
+The comparison exits with a non-zero status when a benchmark is slower than
+the baseline by more than the tolerance. Writing the fixtures takes a while;
+``--fixtures DIR`` keeps them between runs.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import timeit
+import warnings
+
+import numpy as np
+from kerchunk.combine import MultiZarrToZarr
+from kerchunk.grib2 import scan_grib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf  # noqa: E402
+from stactools.ecmwf_forecast import constants, stac  # noqa: E402
+from stactools.ecmwf_forecast.range_codec import Range  # noqa: E402
+from tests.synthetic import write_combinations  # noqa: E402
+
+
+def fixtures(directory):
+    """The HREFs of the GRIB2 and index files, written if needed."""
+    marker = os.path.join(directory, "hrefs.json")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            return json.load(f)
+    grib2 = write_combinations(directory)
+    hrefs = sorted(grib2 + [khf.index_href(href) for href in grib2])
+    with open(marker, "w") as f:
+        json.dump(hrefs, f)
+    return hrefs
+
+
+def best_of(func, repeat, number=1):
+    """The best time per call of `func`, in seconds."""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def samples(hrefs):
+    """The step-0 (or first) GRIB2 file of each stream and type."""
+    out = {}
+    for href in hrefs:
+        p = stac.Parts.from_filename(href)
+        if p.format == "grib2":
+            key = f"{p.stream}-{p.type}"
+            if key not in out or p.offset < out[key].offset:
+                out[key] = p
+    return dict(sorted(out.items()))
+
+
+def raw_refs(part):
+    """Combined references of `part`, before `postprocess_refs`."""
+    return MultiZarrToZarr(scan_grib(part.filename), concat_dims=["time"]).translate()
+
+
+def benchmarks(hrefs, repeat):
+    """Yield the name and time per call of each benchmark."""
+    parts = samples(hrefs)
+
+    # in a new interpreter, like a worker process
+    for module in [
+        "stactools.ecmwf_forecast.stac",
+        "stactools.ecmwf_forecast.commands",
+    ]:
+        yield f"import[{module}]", best_of(
+            lambda: subprocess.run(
+                [sys.executable, "-c", f"import {module}"], check=True
+            ),
+            repeat,
+        )
+    yield "Parts.from_filename", best_of(
+        lambda: [stac.Parts.from_filename(h) for h in hrefs], repeat
+    ) / len(hrefs)
+    yield "group_assets", best_of(
+        lambda: [list(v) for _, v in stac.group_assets(hrefs)], repeat
+    )
+    for name, p in parts.items():
+        yield f"list_sibling_assets[{name}]", best_of(
+            lambda: stac.list_sibling_assets(p.filename), repeat, number=100
+        )
+
+    for name, p in parts.items():
+        if not stac._has_kerchunk_indices(p):
+            continue
+        yield f"get_kerchunk_indices[{name}]", best_of(
+            lambda: khf.get_kerchunk_indices(p, cache=False), repeat
+        )
+        yield f"get_kerchunk_indices[{name},use_index]", best_of(
+            lambda: khf.get_kerchunk_indices(p, use_index=True, cache=False), repeat
+        )
+
+    for name, p in parts.items():
+        siblings = [p.filename, khf.index_href(p.filename)]
+        yield f"create_item[{name},split_by_step]", best_of(
+            lambda: stac.create_item(siblings, split_by_step=True, cache=False), repeat
+        )
+
+    # serializing the ~170 assets of an enfo-ef item, from already-built indices
+    p = parts["enfo-ef"]
+    siblings = stac.list_sibling_assets(p.filename)
+    indices = khf.get_kerchunk_indices(p, cache=False)
+    kerchunk_indices = {s.filename: indices for s in siblings if s.format == "grib2"}
+    yield "serialize[pystac]", best_of(
+        lambda: json.dumps(
+            stac._create_item_from_parts(
+                siblings, kerchunk_indices=kerchunk_indices
+            ).to_dict(include_self_link=False)
+        ),
+        repeat,
+    )
+    yield "serialize[dict]", best_of(
+        lambda: stac._dumps(
+            stac._item_dict_from_parts(siblings, kerchunk_indices=kerchunk_indices)
+        ),
+        repeat,
+    )
+
+    refs = raw_refs(parts["wave-fc"])
+    yield "convert_base64+compress_lat_lon", best_of(
+        lambda: khf.convert_base64(khf.compress_lat_lon(json.loads(json.dumps(refs)))),
+        repeat,
+    )
+    yield "postprocess_refs", best_of(
+        lambda: khf.postprocess_refs(json.loads(json.dumps(refs))), repeat
+    )
+
+    codec = Range()
+    for name, values in [
+        ("latitude", np.linspace(90, -90, 721)),
+        ("longitude", np.linspace(-180, 179.75, 1440)),
+    ]:
+        encoded = codec.encode(values)
+        yield f"Range.encode[{name}]", best_of(
+            lambda: codec.encode(values), repeat, 100
+        )
+        yield f"Range.decode[{name}]", best_of(
+            lambda: codec.decode(encoded), repeat, 100
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Print the ratio to `baseline` of each result, and return the regressions."""
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            regressions.append(name)
+        print(f"{name:<50} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--fixtures", help="Directory of the fixtures, kept between runs."
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results in this JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hrefs = fixtures(args.fixtures or tmp)
+        print(
+            f"{len(hrefs)} files for {len(constants.get_combinations())} combinations"
+        )
+        results = {}
+        for name, seconds in benchmarks(hrefs, args.repeat):
+            results[name] = seconds
+            print(f"{name:<50} {seconds * 1e3:10.3f} ms", flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmarks slower than the baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
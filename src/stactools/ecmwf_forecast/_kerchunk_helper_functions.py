@@ -1,111 +1,615 @@
+import asyncio
+import atexit
 import base64
+import concurrent.futures
+import copy
+import functools
+import json
+import threading
+import uuid
 
 import fsspec
-from kerchunk.combine import MultiZarrToZarr
-from kerchunk.grib2 import scan_grib
-
-from stactools.ecmwf_forecast.range_codec import Range
-
-
-def get_kerchunk_indices(part):
-
-    # clear instance cache, prevents memory leak
-    fs = fsspec.filesystem("")
-    fs.clear_instance_cache()
-
-    out = scan_grib(part.filename)
-
-    if ((part.stream == "scda") or (part.stream == "oper")) and (part.type == "fc"):
-        messages_iso = [
-            out[i]
-            for i in range(len(out))
-            if "isobaricInhPa/.zarray" in list(out[i]["refs"].keys())
-        ]
-        mzz = MultiZarrToZarr(messages_iso, concat_dims=["time", "isobaricInhPa"])
-        d1 = mzz.translate()
-
-        messages_not_iso = [
-            out[i]
-            for i in range(len(out))
-            if "isobaricInhPa/.zarray" not in list(out[i]["refs"].keys())
-        ]
-        mzz = MultiZarrToZarr(
-            messages_not_iso,
-            identical_dims=[
-                "depthBelowLandLayer",
-                "entireAtmosphere",
-                "heightAboveGround",
-                "meanSea",
-                "surface",
-            ],
-            concat_dims=["time"],
+import numpy as np
+
+from stactools.ecmwf_forecast import constants, profiling, reads
+from stactools.ecmwf_forecast.cache import resolve_cache
+from stactools.ecmwf_forecast.filesystems import resolve_filesystems
+from stactools.ecmwf_forecast.reads import _async_filesystem, _close_async_filesystem
+
+# kerchunk, and through it cfgrib, ecCodes, zarr and xarray, take most of a
+# second to import, so they're imported by the functions building references
+# rather than here. Listing and grouping assets don't need them.
+
+# The default number of concurrent reads for the async functions
+DEFAULT_CONCURRENCY = 16
+# The number of batches of messages scanned by each process, so that the work
+# stays balanced when some messages take longer to decode.
+BATCHES_PER_PROCESS = 4
+
+
+def get_kerchunk_indices(
+    part, use_index=False, cache=False, filesystems=None, processes=None
+):
+    """
+    Build the kerchunk references for the GRIB2 file of `part`.
+
+    With ``use_index=True`` the message layout is read from the ``.index``
+    sidecar and only one message per variable is fetched and decoded (see
+    `scan_grib_from_index`), rather than reading the whole GRIB2 file.
+
+    `cache` is a `KerchunkCache`, ``True`` for the default cache, or ``False``
+    to always build the references. `filesystems` is the `FileSystems` used to
+    read the files, by default the ones shared by the process.
+
+    With `processes`, the messages of the GRIB2 file are split by the byte
+    ranges in its ``.index`` and scanned by that many processes (see
+    `scan_grib_parallel`). This doesn't apply with ``use_index=True``, which only
+    decodes a few messages.
+    """
+    with profiling.phase("kerchunk"):
+        filesystems = resolve_filesystems(filesystems)
+        cache = resolve_cache(cache)
+        if cache is not None:
+            key = cache.key(
+                part.filename, fs=filesystems.get(part.filename)[0], use_index=use_index
+            )
+            refs = cache.get(key)
+            if refs is not None:
+                return refs
+
+        refs = _get_kerchunk_indices(
+            part, use_index=use_index, filesystems=filesystems, processes=processes
+        )
+        if cache is not None:
+            cache.set(key, refs)
+        return refs
+
+
+def _get_kerchunk_indices(part, use_index=False, filesystems=None, processes=None):
+    filesystems = resolve_filesystems(filesystems)
+    if use_index:
+        messages = _iter_grib_from_index(
+            part.filename, index_href(part.filename), filesystems=filesystems
         )
-        d2 = mzz.translate()
-        mzz = MultiZarrToZarr(
-            [d1, d2],
-            identical_dims=[
-                "depthBelowLandLayer",
-                "entireAtmosphere",
-                "heightAboveGround",
-                "meanSea",
-                "surface",
-            ],
-            concat_dims=["time"],
+    elif processes:
+        messages = scan_grib_parallel(
+            part.filename,
+            index_href(part.filename),
+            processes=processes,
+            filesystems=filesystems,
         )
+    else:
+        messages = iter_grib(part.filename, filesystems=filesystems)
+
+    return combine_messages(part, messages)
+
+
+async def get_kerchunk_indices_async(
+    part, use_index=False, cache=False, semaphore=None
+):
+    """
+    Build the kerchunk references for the GRIB2 file of `part` on the event loop.
 
-    elif (part.stream == "enfo") and (part.type == "ep"):
-        mzz = MultiZarrToZarr(
-            out,
-            identical_dims=["heightAboveGround", "isobaricInhPa", "surface", "meanSea"],
-            concat_dims=["step", "time"],
+    Like `get_kerchunk_indices`, but the reads of the ``.index`` file and GRIB2
+    messages go through fsspec's async filesystems, so that many of them can be
+    in flight at once. Decoding the messages runs in a worker thread. `semaphore`
+    bounds the number of concurrent reads.
+    """
+    semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    cache = resolve_cache(cache)
+    if cache is not None:
+        key = await asyncio.to_thread(cache.key, part.filename, use_index=use_index)
+        refs = await asyncio.to_thread(cache.get, key)
+        if refs is not None:
+            return refs
+
+    if use_index:
+        out = await scan_grib_from_index_async(
+            part.filename, index_href(part.filename), semaphore=semaphore
         )
+        refs = await asyncio.to_thread(combine_messages, part, out)
+    else:
+        # The file is read while the messages are combined.
+        async with semaphore:
+            refs = await asyncio.to_thread(
+                combine_messages, part, iter_grib(part.filename)
+            )
+
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, refs)
+    return refs
 
-    elif (part.stream == "waef") and (part.type == "ef"):
-        mzz = MultiZarrToZarr(out, concat_dims=["number", "time"])
 
-    elif (part.stream == "waef") and (part.type == "ep"):
-        mzz = MultiZarrToZarr(
-            out, identical_dims=["meanSea"], concat_dims=["step", "time"]
+def combine_messages(part, messages):
+    """
+    Combine the references of each message in the GRIB2 file of `part`.
+
+    The messages are combined according to the `constants.COMBINE_RULES` for
+    the stream and type of `part`. `messages` can be an iterator, like
+    `iter_grib`, and is consumed once: each message is assigned to the group it's
+    combined in as it arrives, and the values it shares with the previous
+    messages, like the latitude and longitude, are only kept once.
+    """
+    rule = constants.COMBINE_RULES.get((part.stream, part.type))
+    if rule is None:
+        raise ValueError(
+            f"No kerchunk combine rule for stream={part.stream!r} type={part.type!r}"
         )
 
-    elif ((part.stream == "scwv") or (part.stream == "wave")) and (part.type == "fc"):
-        mzz = MultiZarrToZarr(out, concat_dims=["time"])
+    # Scanning is lazy: the messages are read and decoded as they're grouped.
+    with profiling.phase("scan"):
+        groups = _partition(messages, rule.split_dims)
+    with profiling.phase("combine"):
+        refs = _combine_groups(groups, rule)
+    with profiling.phase("postprocess"):
+        return postprocess_refs(refs)
 
-    return convert_base64(compress_lat_lon(mzz.translate()))
 
-def convert_base64(d):
-    for key in d['refs']:
-        if (('/0' in key) & ('.' not in key) & ('latitude' not in key) & ('longitude' not in key)):
-            if d['refs'][key][0:6]!='base64':
-                d['refs'][key] = (b"base64:" + base64.b64encode(d['refs'][key].encode())).decode()
+def _combine_groups(groups, rule):
+    from kerchunk.combine import MultiZarrToZarr
 
-    return d
+    identical_dims = list(rule.identical_dims)
+    if rule.split_dims:
+        # Within a file the step and valid time are the same for every message,
+        # but combining along the split dimension adds it to their shape.
+        identical_dims += sorted(STEP_COORDINATES)
+        combined = []
+        # Each group is released once it's combined.
+        for dim in (*rule.split_dims, None):
+            if dim in groups:
+                concat_dims = [*rule.concat_dims, dim] if dim else rule.concat_dims
+                mzz = MultiZarrToZarr(
+                    groups.pop(dim),
+                    concat_dims=list(concat_dims),
+                    identical_dims=identical_dims,
+                )
+                combined.append(mzz.translate())
+        groups[None] = combined
+        identical_dims += rule.split_dims
 
+    mzz = MultiZarrToZarr(
+        groups.pop(None, []),
+        concat_dims=list(rule.concat_dims),
+        identical_dims=identical_dims,
+    )
+    return mzz.translate()
 
-def compress_lat_lon(d):
-    d["refs"]["latitude/0"] = (
-        "base64:"
-        + base64.b64encode(
-            Range().encode(base64.b64decode(d["refs"]["latitude/0"][7:]))
-        ).decode()
+
+def _partition(messages, split_dims):
+    """
+    Group the references of `messages` by the first of `split_dims` they have, in
+    one pass. Messages without any of them are grouped under ``None``.
+    """
+    groups = {}
+    # Equal values of different messages are replaced by a single string.
+    shared = {}
+    for message in messages:
+        refs = message["refs"]
+        for key, value in refs.items():
+            if isinstance(value, str):
+                refs[key] = shared.setdefault(value, value)
+        dim = next((dim for dim in split_dims if f"{dim}/.zarray" in refs), None)
+        groups.setdefault(dim, []).append(message)
+    return groups
+
+
+# Coordinates that vary between the steps of a forecast run.
+STEP_COORDINATES = {"step", "valid_time"}
+
+
+def combine_steps(refs, remote_protocol=None):
+    """
+    Combine the references of each step of a forecast run along ``step``.
+
+    `refs` are the references of each step's GRIB2 file, as produced by
+    `get_kerchunk_indices`. Nothing is scanned again: the coordinates other than
+    ``step`` and ``valid_time`` are taken from the first step, and the chunk
+    references of each step are reused as is.
+    """
+    from kerchunk.combine import MultiZarrToZarr
+
+    refs = list(refs)
+    if not refs:
+        raise ValueError("At least one set of references is required.")
+    mzz = MultiZarrToZarr(
+        refs,
+        concat_dims=["step"],
+        identical_dims=sorted(_coordinates(refs[0]) - STEP_COORDINATES),
+        remote_protocol=remote_protocol,
     )
-    d["refs"]["longitude/0"] = (
-        "base64:"
-        + base64.b64encode(
-            Range().encode(base64.b64decode(d["refs"]["longitude/0"][7:]))
-        ).decode()
+    return mzz.translate()
+
+
+def _coordinates(refs):
+    # Coordinates are the arrays whose chunks are all inlined, rather than
+    # references to byte ranges of the GRIB2 file.
+    arrays = {}
+    for key, value in refs["refs"].items():
+        name, _, chunk = key.rpartition("/")
+        if name and not chunk.startswith("."):
+            arrays[name] = arrays.get(name, True) and not isinstance(value, list)
+    return {name for name, inline in arrays.items() if inline}
+
+
+def index_href(href):
+    """The HREF of the ``.index`` sidecar of a GRIB2 file."""
+    return href.rsplit(".", 1)[0] + ".index"
+
+
+def read_index(href, filesystems=None):
+    """Read the NDJSON ``.index`` file at `href` into a list of messages."""
+    fs, path = resolve_filesystems(filesystems).get(href)
+    with fs.open(path, "rb") as f:
+        lines = f.read().splitlines()
+    profiling.add_read(sum(len(line) + 1 for line in lines))
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def iter_grib(href, filesystems=None):
+    """
+    Generate references for a GRIB2 file, one message at a time.
+
+    This yields the same references as ``kerchunk.grib2.scan_grib``, but the
+    file is read and decoded lazily, so that only the current message is held in
+    memory.
+
+    Parameters
+    ----------
+    href: str
+        The HREF of the GRIB2 file.
+    filesystems: FileSystems, optional
+        The filesystems used to read the file.
+
+    Yields
+    ------
+    dict: the references of each message in the file, in Version 1 format
+    """
+    fs, path = resolve_filesystems(filesystems).get(href)
+    with fs.open(path, "rb") as f:
+        profiling.add_read(0)
+        for offset, data in reads.iter_messages(f):
+            profiling.add_read(len(data), requests=0)
+            yield _scan_message(data, href, offset)
+
+
+def scan_grib_parallel(href, index_href, processes, filesystems=None):
+    """
+    Generate references for a GRIB2 file, scanning its messages in processes.
+
+    Decoding GRIB2 messages is CPU-bound and holds the GIL, so rather than
+    threads, the messages listed in the ``.index`` sidecar are split into
+    contiguous batches that are read and scanned by a pool of `processes`
+    workers. Each worker initializes ecCodes once, when it starts. The pool is
+    kept until exit for the following calls with the same number of processes,
+    which can run concurrently.
+
+    This returns the same references as ``kerchunk.grib2.scan_grib``, in the
+    order of the messages in the file, regardless of the number of processes.
+
+    Parameters
+    ----------
+    href: str
+        The HREF of the GRIB2 file.
+    index_href: str
+        The HREF of the ``.index`` file describing `href`.
+    processes: int
+        The number of worker processes.
+    filesystems: FileSystems, optional
+        The filesystems used to read the files. They're recreated in each
+        worker, with the same storage options.
+
+    Returns
+    -------
+    list(dict): references dicts in Version 1 format, one per message in the file
+    """
+    filesystems = resolve_filesystems(filesystems)
+    messages = sorted(
+        read_index(index_href, filesystems=filesystems), key=lambda m: m["_offset"]
     )
-    d["refs"]["latitude/.zarray"] = ",".join(
-        [
-            ":".join([i.split(":")[0], '[{"id": "range"}]']) if "filter" in i else i
-            for i in d["refs"]["latitude/.zarray"].split(",")
-        ]
+    if not messages:
+        return []
+    n = min(len(messages), processes * BATCHES_PER_PROCESS)
+    bounds = [i * len(messages) // n for i in range(n + 1)]
+    batches = [messages[start:end] for start, end in zip(bounds, bounds[1:])]
+    scan = functools.partial(_scan_batch, href, filesystems=filesystems)
+    profiling.add_read(sum(m["_length"] for m in messages), requests=len(batches))
+    out = []
+    for refs in _scan_pool(processes).map(scan, batches):
+        out.extend(refs)
+    return out
+
+
+# The pools of `scan_grib_parallel`, by number of processes. They're only
+# shut down at exit, so that a call never shuts down a pool another call is
+# still using.
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+def _scan_pool(processes):
+    with _pools_lock:
+        pool = _pools.get(processes)
+        if pool is None:
+            pool = _pools[processes] = concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes, initializer=_init_scan_worker
+            )
+        return pool
+
+
+@atexit.register
+def shutdown_scan_pool():
+    """
+    Stop the worker processes of `scan_grib_parallel`.
+
+    This runs at exit. Don't call it while `scan_grib_parallel` is running.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def _init_scan_worker():
+    """
+    Import kerchunk and load ecCodes and its definitions once per worker, rather
+    than for its first message.
+    """
+    import eccodes
+    import kerchunk.grib2  # noqa: F401
+
+    handle = eccodes.codes_grib_new_from_samples("GRIB2")
+    try:
+        eccodes.codes_get(handle, "shortName")
+    finally:
+        eccodes.codes_release(handle)
+
+
+def _scan_batch(href, messages, filesystems=None):
+    data = reads.read_messages(href, messages, filesystems=filesystems)
+    return [_scan_message(d, href, m["_offset"]) for m, d in zip(messages, data)]
+
+
+def _message_group_key(message):
+    # Messages of one variable only differ by their level, ensemble member and
+    # byte range; anything else gets its own representative message.
+    return (
+        message["param"],
+        message["levtype"],
+        message.get("step"),
+        message.get("type"),
+        message.get("stream"),
     )
-    d["refs"]["longitude/.zarray"] = ",".join(
-        [
-            ":".join([i.split(":")[0], '[{"id": "range"}]']) if "filter" in i else i
-            for i in d["refs"]["longitude/.zarray"].split(",")
-        ]
+
+
+def scan_grib_from_index(href, index_href, filesystems=None):
+    """
+    Generate references for a GRIB2 file using its ``.index`` sidecar.
+
+    This returns the same references as ``kerchunk.grib2.scan_grib``. Rather than
+    reading the whole GRIB2 file, the first message of each parameter / level type
+    is fetched (using the byte range from the index) and decoded. The references
+    for the other messages of that group are derived from it, with the byte range,
+    level and ensemble member taken from the index.
+
+    Parameters
+    ----------
+    href: str
+        The HREF of the GRIB2 file.
+    index_href: str
+        The HREF of the ``.index`` file describing `href`.
+    filesystems: FileSystems, optional
+        The filesystems used to read the files.
+
+    Returns
+    -------
+    list(dict): references dicts in Version 1 format, one per message in the file
+    """
+    return list(_iter_grib_from_index(href, index_href, filesystems=filesystems))
+
+
+def _iter_grib_from_index(href, index_href, filesystems=None):
+    # The representatives are read up front, and the references of the other
+    # messages derived lazily.
+    filesystems = resolve_filesystems(filesystems)
+    messages = read_index(index_href, filesystems=filesystems)
+    representatives = _representatives(messages)
+    data = reads.read_messages(href, representatives, filesystems=filesystems)
+    fetch = _fetcher(href, representatives, data, filesystems=filesystems)
+    return _scan_index_messages(href, messages, fetch)
+
+
+async def scan_grib_from_index_async(href, index_href, semaphore=None):
+    """
+    Generate references for a GRIB2 file using its ``.index`` sidecar, asynchronously.
+
+    The ``.index`` file and the representative message of each group are fetched
+    concurrently with fsspec's async filesystems. See `scan_grib_from_index`.
+    """
+    semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    index_fs, index_path = _async_filesystem(index_href)
+    try:
+        async with semaphore:
+            index = await index_fs._cat_file(index_path)
+    finally:
+        await _close_async_filesystem(index_fs)
+    messages = [json.loads(line) for line in index.splitlines() if line.strip()]
+    representatives = _representatives(messages)
+    data = await reads.read_messages_async(href, representatives, semaphore=semaphore)
+    fetch = _fetcher(href, representatives, data)
+    return await asyncio.to_thread(list, _scan_index_messages(href, messages, fetch))
+
+
+def _representatives(messages):
+    # The first message of each group, which is decoded.
+    representatives = {}
+    for message in messages:
+        representatives.setdefault(_message_group_key(message), message)
+    return list(representatives.values())
+
+
+def _fetcher(href, representatives, data, filesystems=None):
+    """Get the bytes of a message, from the representatives read up front."""
+    fetched = {m["_offset"]: d for m, d in zip(representatives, data)}
+    fs, path = resolve_filesystems(filesystems).get(href)
+
+    def fetch(message):
+        start = message["_offset"]
+        if start in fetched:
+            return fetched[start]
+        # Only needed when a representative's values were inlined, which doesn't
+        # happen for the ECMWF grids.
+        return fs.cat_file(path, start=start, end=start + message["_length"])
+
+    return fetch
+
+
+def _scan_index_messages(href, messages, fetch):
+    representatives: dict = {}
+    for message in messages:
+        key = _message_group_key(message)
+        representative = representatives.get(key)
+        if representative is None:
+            representative = _scan_message(fetch(message), href, message["_offset"])
+            if _data_variable(representative) is not None:
+                representatives[key] = representative
+            else:
+                # The values are small enough to be inlined, so they can't be shared.
+                yield representative
+                continue
+        yield _message_refs(representative, message)
+
+
+def _scan_message(data, href, offset):
+    """Run ``scan_grib`` on the bytes of a single GRIB2 message."""
+    from kerchunk.grib2 import scan_grib
+
+    memfs = fsspec.filesystem("memory")
+    path = f"/ecmwf-forecast/{uuid.uuid4().hex}.grib2"
+    memfs.pipe_file(path, data)
+    try:
+        (refs,) = scan_grib(f"memory://{path}")
+    finally:
+        memfs.rm_file(path)
+    refs["templates"] = {"u": href}
+    for key, value in refs["refs"].items():
+        if isinstance(value, list):
+            refs["refs"][key] = [value[0], value[1] + offset, value[2]]
+    return refs
+
+
+def _data_variable(refs):
+    """The key of the data chunk reference in a single message's `refs`, if any."""
+    for key, value in refs["refs"].items():
+        if isinstance(value, list):
+            return key
+    return None
+
+
+def _message_refs(representative, message):
+    """Derive the references for `message` from those of its group's representative."""
+    out = copy.deepcopy(representative)
+    refs = out["refs"]
+    key = _data_variable(out)
+    refs[key] = [refs[key][0], message["_offset"], message["_length"]]
+    var = key.split("/", 1)[0]
+
+    if "levelist" in message:
+        level = json.loads(refs[f"{var}/.zattrs"])["GRIB_typeOfLevel"]
+        _set_inline_value(refs, level, float(message["levelist"]))
+    if "number" in message and "number/.zarray" in refs:
+        _set_inline_value(refs, "number", int(message["number"]))
+
+    return out
+
+
+def _set_inline_value(refs, name, value):
+    dtype = np.dtype(json.loads(refs[f"{name}/.zarray"])["dtype"])
+    data = np.array(value, dtype=dtype).tobytes()
+    refs[f"{name}/0"] = (b"base64:" + base64.b64encode(data)).decode()
+
+
+RANGE_KEYS = {"latitude/0", "longitude/0"}
+RANGE_ZARRAY_KEYS = {"latitude/.zarray", "longitude/.zarray"}
+# The filters of the range-encoded coordinates, `range_codec.Range`
+RANGE_FILTERS = [{"id": "range"}]
+
+
+def _is_inline_key(key):
+    # Inline coordinate values, like "time/0" or "isobaricInhPa/0". Not chunk
+    # references ("swh/0.0.0"), metadata (".zarray") or the range-encoded latitude
+    # and longitude. Most keys contain a ".", so that's checked first.
+    return (
+        "." not in key
+        and "/0" in key
+        and "latitude" not in key
+        and "longitude" not in key
     )
 
+
+def postprocess_refs(d):
+    """
+    Post-process combined references in a single pass over the keys.
+
+    This is equivalent to ``convert_base64(compress_lat_lon(d))``: inline values are
+    base64 encoded, and the latitude and longitude coordinates are compressed with
+    the `Range` codec.
+    """
+    from stactools.ecmwf_forecast.range_codec import Range
+
+    refs = d["refs"]
+    codec = Range()
+    for key, value in refs.items():
+        if "." in key:
+            if key in RANGE_ZARRAY_KEYS:
+                refs[key] = _range_zarray(value)
+        elif key in RANGE_KEYS:
+            refs[key] = _to_base64(codec.encode(_inline_bytes(value)))
+        elif _is_inline_key(key) and _needs_base64(value):
+            refs[key] = _to_base64(value.encode())
+    return d
+
+
+def convert_base64(d):
+    """Base64 encode the inline values in `d`."""
+    refs = d["refs"]
+    for key, value in refs.items():
+        if _is_inline_key(key) and _needs_base64(value):
+            refs[key] = _to_base64(value.encode())
+
     return d
+
+
+def compress_lat_lon(d):
+    """Compress the latitude and longitude coordinates in `d` with the `Range` codec."""
+    from stactools.ecmwf_forecast.range_codec import Range
+
+    refs = d["refs"]
+    codec = Range()
+    for key in RANGE_KEYS:
+        refs[key] = _to_base64(codec.encode(_inline_bytes(refs[key])))
+    for key in RANGE_ZARRAY_KEYS:
+        refs[key] = _range_zarray(refs[key])
+
+    return d
+
+
+def _needs_base64(value):
+    return isinstance(value, str) and not value.startswith("base64")
+
+
+def _inline_bytes(value):
+    # kerchunk stores inline values as text when they happen to be ASCII
+    if value.startswith("base64:"):
+        return base64.b64decode(value[7:])
+    return value.encode()
+
+
+def _to_base64(data):
+    return "base64:" + base64.b64encode(data).decode("ascii")
+
+
+def _range_zarray(value):
+    zarray = json.loads(value)
+    zarray["filters"] = RANGE_FILTERS
+    return json.dumps(zarray, separators=(",", ":"))
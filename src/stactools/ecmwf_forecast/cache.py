@@ -0,0 +1,182 @@
+"""
+On-disk cache for kerchunk references.
+
+Entries are keyed by the HREF of the GRIB2 file and the ETag / size / modification
+time reported by its filesystem, so a file that's rewritten in place gets new
+references.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Optional, Union
+
+import fsspec
+
+logger = logging.getLogger(__name__)
+
+# Bump this when the references produced for a file change:
+# 2: the range-encoded coordinates' `.zarray` is compact JSON
+# 3: the `Range` codec's raw encoding of irregular arrays
+# 4: references are combined from streamed messages
+# 5: index messages are grouped by their type and stream
+CACHE_VERSION = "5"
+CACHE_DIR_ENV = "ECMWF_FORECAST_CACHE_DIR"
+INFO_KEYS = ["etag", "ETag", "size", "mtime", "last_modified", "LastModified"]
+
+
+class KerchunkCache:
+    """
+    A persistent, least-recently-used cache of kerchunk references.
+
+    Parameters
+    ----------
+    directory: str
+        The directory holding the cache entries. Created if it doesn't exist.
+    max_bytes: int
+        The total size of the entries to keep. The least recently used entries
+        are evicted beyond this.
+    max_entries: int, optional
+        The number of entries to keep.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1024**3,
+        max_entries: Optional[int] = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<KerchunkCache directory={self.directory!r} "
+            f"hits={self.hits} misses={self.misses}>"
+        )
+
+    def key(
+        self, href: str, fs: Optional[fsspec.AbstractFileSystem] = None, **options: Any
+    ) -> str:
+        """
+        The cache key for `href`, based on the file's current metadata.
+
+        `fs` is the filesystem of `href`, looked up from its protocol by default.
+        `options` are the options the references were built with, like
+        ``use_index``, which give different references for the same file.
+        """
+        if fs is None:
+            fs, path = fsspec.core.url_to_fs(href)
+        else:
+            path = fs._strip_protocol(href)
+        token: dict[str, Any] = file_token(fs.info(path))
+        token["href"] = href
+        token["version"] = CACHE_VERSION
+        token["options"] = options
+        return hashlib.sha256(json.dumps(token, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """Get the references for `key`, or None if it's not cached."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        try:
+            # mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        """Store the references `value` for `key`, evicting old entries if needed."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond the size and count limits."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort(reverse=True)
+        total = 0
+        for i, (_, size, path) in enumerate(entries):
+            total += size
+            if total > self.max_bytes or (
+                self.max_entries is not None and i >= self.max_entries
+            ):
+                logger.debug("Evicting %s", path)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> None:
+        """Remove all the entries."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+
+
+def file_token(info: dict[str, Any]) -> dict[str, str]:
+    """The ETag / size / modification time in a filesystem's `info` for a file."""
+    return {k: str(info[k]) for k in INFO_KEYS if info.get(k) is not None}
+
+
+def default_cache_dir() -> str:
+    """
+    The directory of the default cache.
+
+    This is ``$ECMWF_FORECAST_CACHE_DIR`` if set, or
+    ``~/.cache/stactools-ecmwf-forecast``.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if directory is None:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        directory = os.path.join(base, "stactools-ecmwf-forecast")
+    return directory
+
+
+@functools.lru_cache
+def _cache_for(directory: str) -> KerchunkCache:
+    return KerchunkCache(directory)
+
+
+def resolve_cache(cache: Union[KerchunkCache, bool, None]) -> Optional[KerchunkCache]:
+    """
+    Get the cache to use for a `cache` argument.
+
+    ``True`` gives the default cache, ``False`` or ``None`` disables caching,
+    and a `KerchunkCache` is used as is.
+    """
+    if cache is True:
+        return _cache_for(default_cache_dir())
+    elif cache is False or cache is None:
+        return None
+    return cache
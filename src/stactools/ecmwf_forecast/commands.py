@@ -1,12 +1,128 @@
+import contextlib
+import functools
+import json
 import logging
 
 import click
+import pystac
 
-from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast import pgstac, profiling, reads, stac
+from stactools.ecmwf_forecast._kerchunk_helper_functions import index_href
+from stactools.ecmwf_forecast.index import IndexFile
+from stactools.ecmwf_forecast.state import StateStore
 
 logger = logging.getLogger(__name__)
 
 
+@contextlib.contextmanager
+def _profile(enabled: bool):
+    """With `enabled`, record the phases of the command and print a summary."""
+    if not enabled:
+        yield
+        return
+    sink = profiling.MemorySink()
+    with profiling.recording(sink, memory=True):
+        yield
+    click.echo(profiling.format_summary(sink.records), err=True)
+
+
+profile_option = click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print the time, reads and memory of each phase. Slower.",
+)
+
+
+def item_options(func):
+    """
+    Add the options of item creation shared by the commands, passed to the
+    command as a `stac.ItemOptions` named ``options``.
+    """
+    options = [
+        click.option(
+            "--use-index",
+            is_flag=True,
+            default=False,
+            help="Build the kerchunk indices from the index file rather than the GRIB2 file.",
+        ),
+        click.option(
+            "--datacube",
+            is_flag=True,
+            default=False,
+            help="Describe the variables and levels from the index files (datacube extension).",
+        ),
+        click.option(
+            "--no-cache",
+            is_flag=True,
+            default=False,
+            help="Don't use the on-disk cache of kerchunk indices.",
+        ),
+        click.option(
+            "--references-href",
+            default=None,
+            help="Write the kerchunk indices to files under this HREF, not in the items.",
+        ),
+        click.option(
+            "--references-format",
+            type=click.Choice(["json", "parquet"]),
+            default="json",
+            help="The format of the files written with --references-href.",
+        ),
+        click.option(
+            "--templates",
+            type=click.File("r"),
+            default=None,
+            help="JSON file of kerchunk index templates. Items only store the delta.",
+        ),
+        click.option(
+            "--processes",
+            type=int,
+            default=None,
+            help="Scan each GRIB2 file's messages with this many processes.",
+        ),
+        click.option(
+            "--all-products",
+            is_flag=True,
+            default=False,
+            help="Build kerchunk indices for every product, not only wave forecasts.",
+        ),
+    ]
+
+    @functools.wraps(func)
+    def wrapper(
+        *args,
+        use_index: bool,
+        datacube: bool,
+        no_cache: bool,
+        references_href: str,
+        references_format: str,
+        templates,
+        processes: int,
+        all_products: bool,
+        **kwargs,
+    ):
+        options = stac.ItemOptions(
+            use_index=use_index,
+            datacube=datacube,
+            cache=not no_cache,
+            references_href=references_href,
+            references_format=references_format,
+            templates=json.load(templates) if templates else None,
+            processes=processes,
+            kerchunk_products=(
+                stac.ALL_KERCHUNK_PRODUCTS
+                if all_products
+                else stac.DEFAULT_KERCHUNK_PRODUCTS
+            ),
+        )
+        return func(*args, options=options, **kwargs)
+
+    for option in reversed(options):
+        wrapper = option(wrapper)
+    return wrapper
+
+
 def create_ecmwfforecast_command(cli):
     """Creates the stactools-ecmwf-forecast command line utility."""
 
@@ -31,7 +147,15 @@ def create_ecmwfforecast_command(cli):
         help="Key-value pairs to include in extra-fields",
         multiple=True,
     )
-    def create_collection_command(destination: str, thumbnail: str, extra_field):
+    @click.option(
+        "--templates",
+        type=click.File("r"),
+        default=None,
+        help="JSON file of kerchunk index templates, from create-templates.",
+    )
+    def create_collection_command(
+        destination: str, thumbnail: str, extra_field, templates
+    ):
         """Creates a STAC Collection
 
         Args:
@@ -40,7 +164,9 @@ def create_ecmwfforecast_command(cli):
         extra_fields = dict(k.split("=") for k in extra_field)
 
         collection = stac.create_collection(
-            thumbnail=thumbnail, extra_fields=extra_fields
+            thumbnail=thumbnail,
+            extra_fields=extra_fields,
+            templates=json.load(templates) if templates else None,
         )
 
         collection.set_self_href(destination)
@@ -53,15 +179,269 @@ def create_ecmwfforecast_command(cli):
     @click.argument("asset-href")
     @click.argument("index-href")
     @click.argument("destination")
-    def create_item_command(asset_href, index_href: str, destination: str):
+    @item_options
+    @profile_option
+    def create_item_command(
+        asset_href,
+        index_href: str,
+        destination: str,
+        options: stac.ItemOptions,
+        profile: bool,
+    ):
         """Creates a STAC Item
 
         Args:
             source (str): HREF of the Asset associated with the Item
             destination (str): An HREF for the STAC Collection
         """
-        item = stac.create_item([asset_href, index_href], split_by_step=True)
-        item.save_object(dest_href=destination)
+        with _profile(profile):
+            item = stac.create_item(
+                [asset_href, index_href],
+                options=options,
+                split_by_step=True,
+            )
+            with profiling.phase("write", item_id=item.id):
+                item.save_object(dest_href=destination)
+
+        return None
+
+    @ecmwfforecast.command(
+        "create-items", short_help="Create many STAC items using a pool of workers"
+    )
+    @click.argument("hrefs", type=click.File("r"))
+    @click.argument("destination")
+    @click.option(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of workers (default: CPUs).",
+    )
+    @click.option(
+        "--executor",
+        type=click.Choice(["thread", "process"]),
+        default="thread",
+        help="Run the workers in threads or processes.",
+    )
+    @click.option(
+        "--split-by-step", is_flag=True, default=False, help="Create one item per step."
+    )
+    @item_options
+    @click.option(
+        "--stream",
+        is_flag=True,
+        default=False,
+        help="Create items as soon as all their assets are listed, in that order.",
+    )
+    @click.option(
+        "--timeout",
+        type=float,
+        default=None,
+        help="With --stream, seconds before creating items with missing assets.",
+    )
+    @click.option(
+        "--fast",
+        is_flag=True,
+        default=False,
+        help="Build and write the items as plain dictionaries, without pystac.",
+    )
+    @click.option(
+        "--validate-sample",
+        type=float,
+        default=0.01,
+        help="With --fast, the fraction of the items checked with pystac.",
+    )
+    @click.option(
+        "--dehydrate",
+        is_flag=True,
+        default=False,
+        help="Write the items dehydrated against the collection, for pgstac.",
+    )
+    @click.option(
+        "--collection",
+        type=click.File("r"),
+        default=None,
+        help="With --dehydrate, the collection JSON (default: create-collection's).",
+    )
+    @profile_option
+    def create_items_command(
+        hrefs,
+        destination: str,
+        workers: int,
+        executor: str,
+        split_by_step: bool,
+        options: stac.ItemOptions,
+        stream: bool,
+        timeout: float,
+        fast: bool,
+        validate_sample: float,
+        dehydrate: bool,
+        collection,
+        profile: bool,
+    ):
+        """Creates STAC Items for many assets
+
+        Args:
+            hrefs (file): File with one asset HREF per line, or "-" for stdin
+            destination (str): A ``.ndjson`` file, or a directory for the Item JSON
+        """
+        if collection is not None and not dehydrate:
+            raise click.UsageError("--collection requires --dehydrate")
+        if dehydrate and not destination.endswith(".ndjson"):
+            raise click.UsageError("--dehydrate requires a .ndjson destination")
+        asset_hrefs = (line.strip() for line in hrefs if line.strip())
+        with _profile(profile):
+            if fast:
+                dicts = stac.create_item_dicts(
+                    asset_hrefs,
+                    options=options,
+                    split_by_step=split_by_step,
+                    workers=workers,
+                    executor=executor,
+                    stream=stream,
+                    timeout=timeout,
+                    validate_sample=validate_sample,
+                )
+            else:
+                items = stac.create_items(
+                    asset_hrefs,
+                    options=options,
+                    split_by_step=split_by_step,
+                    workers=workers,
+                    executor=executor,
+                    stream=stream,
+                    timeout=timeout,
+                )
+                if dehydrate:
+                    dicts = (item.to_dict(include_self_link=False) for item in items)
+            if dehydrate:
+                dicts = pgstac.dehydrate_items(
+                    dicts,
+                    json.load(collection) if collection else stac.create_collection(),
+                )
+            if fast or dehydrate:
+                n = stac.write_item_dicts(dicts, destination)
+            else:
+                n = stac.write_items(items, destination)
+        logger.info("Wrote %d items to %s", n, destination)
+
+        return None
+
+    @ecmwfforecast.command(
+        "create-templates", short_help="Create templates of kerchunk indices"
+    )
+    @click.argument("items", type=click.File("r"))
+    @click.argument("destination", type=click.File("w"))
+    def create_templates_command(items, destination):
+        """Creates templates of the kerchunk indices shared by many items
+
+        Args:
+            items (file): NDJSON file of items with full kerchunk indices
+            destination (file): JSON file for the templates
+        """
+        templates = stac.build_templates(
+            pystac.Item.from_dict(json.loads(line)) for line in items if line.strip()
+        )
+        json.dump(templates, destination)
+
+        return None
+
+    @ecmwfforecast.command(
+        "update", short_help="Create the STAC items that are new or changed"
+    )
+    @click.argument("prefix")
+    @click.argument("destination")
+    @click.option(
+        "--state",
+        "state_path",
+        default="ecmwf-forecast-state.db",
+        help="SQLite database recording the items already created.",
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of workers (default: CPUs).",
+    )
+    @click.option(
+        "--executor",
+        type=click.Choice(["thread", "process"]),
+        default="thread",
+        help="Run the workers in threads or processes.",
+    )
+    @click.option(
+        "--split-by-step", is_flag=True, default=False, help="Create one item per step."
+    )
+    @item_options
+    @profile_option
+    def update_command(
+        prefix: str,
+        destination: str,
+        state_path: str,
+        workers: int,
+        executor: str,
+        split_by_step: bool,
+        options: stac.ItemOptions,
+        profile: bool,
+    ):
+        """Creates STAC Items for the new or changed assets under a prefix
+
+        Args:
+            prefix (str): Directory or bucket prefix to list
+            destination (str): A ``.ndjson`` file, or a directory for the Item JSON
+        """
+        with _profile(profile), StateStore(state_path) as state:
+            items = stac.update_items(
+                prefix,
+                state,
+                options=options,
+                split_by_step=split_by_step,
+                workers=workers,
+                executor=executor,
+            )
+            n = stac.write_items(items, destination)
+        logger.info("Wrote %d items to %s", n, destination)
+
+        return None
+
+    @ecmwfforecast.command("extract", short_help="Extract messages from a GRIB2 file")
+    @click.argument("href")
+    @click.argument("destination", type=click.File("wb"))
+    @click.option("--param", multiple=True, help="Parameters to extract.")
+    @click.option("--levtype", multiple=True, help="Level types to extract.")
+    @click.option("--levelist", multiple=True, help="Levels to extract.")
+    @click.option("--number", multiple=True, help="Ensemble members to extract.")
+    @click.option("--step", multiple=True, help="Steps to extract.")
+    @click.option(
+        "--max-gap",
+        type=int,
+        default=reads.DEFAULT_MAX_GAP,
+        help="Merge reads of messages separated by up to this many bytes.",
+    )
+    def extract_command(
+        href: str, destination, param, levtype, levelist, number, step, max_gap: int
+    ):
+        """Extracts the messages matching a selection from a GRIB2 file
+
+        Args:
+            href (str): HREF of the GRIB2 file, next to its ``.index`` file
+            destination (file): File for the extracted GRIB2 messages
+        """
+        messages = (
+            IndexFile.from_href(index_href(href))
+            .select(
+                param=param or None,
+                levtype=levtype or None,
+                levelist=levelist or None,
+                number=number or None,
+                step=step or None,
+            )
+            .messages()
+        )
+        for data in reads.read_messages(href, messages, max_gap=max_gap):
+            destination.write(data)
+        logger.info("Extracted %d messages from %s", len(messages), href)
 
         return None
 
@@ -1,4 +1,7 @@
+import datetime
 import functools
+import sys
+import types
 import typing
 
 
@@ -117,3 +120,89 @@ def get_combinations(fmt="grib2"):
                             ]
                         )
     return combinations
+
+
+class CombineRule(typing.NamedTuple):
+    """
+    How to combine the kerchunk references of the messages in a GRIB2 file.
+
+    The messages are combined with ``MultiZarrToZarr`` along `concat_dims`,
+    copying `identical_dims` from the first message. The messages on each of
+    `split_dims` (like pressure levels) are first combined separately, also
+    along that dimension, and then merged with the others.
+    """
+
+    concat_dims: typing.Tuple[str, ...]
+    identical_dims: typing.Tuple[str, ...] = ()
+    split_dims: typing.Tuple[str, ...] = ()
+
+
+# Single level types, which have one value per file
+SINGLE_LEVELS = (
+    "depthBelowLandLayer",
+    "entireAtmosphere",
+    "heightAboveGround",
+    "meanSea",
+    "surface",
+)
+
+# How to combine the messages of each (stream, type). Keep in sync with the
+# products in `get_combinations`. There's no rule for mmsf, whose steps are
+# months rather than hours.
+COMBINE_RULES: typing.Mapping[typing.Tuple[str, str], CombineRule] = (
+    types.MappingProxyType(
+        {
+            ("oper", "fc"): CombineRule(
+                ("time",), SINGLE_LEVELS, split_dims=("isobaricInhPa",)
+            ),
+            ("scda", "fc"): CombineRule(
+                ("time",), SINGLE_LEVELS, split_dims=("isobaricInhPa",)
+            ),
+            ("enfo", "ef"): CombineRule(
+                ("number", "time"), SINGLE_LEVELS, split_dims=("isobaricInhPa",)
+            ),
+            ("enfo", "ep"): CombineRule(
+                ("step", "time"), SINGLE_LEVELS + ("isobaricInhPa",)
+            ),
+            ("waef", "ef"): CombineRule(("number", "time"), SINGLE_LEVELS),
+            ("waef", "ep"): CombineRule(("step", "time"), SINGLE_LEVELS),
+            ("wave", "fc"): CombineRule(("time",)),
+            ("scwv", "fc"): CombineRule(("time",)),
+        }
+    )
+)
+
+
+def index_combinations(
+    combinations: typing.Iterable[Combination],
+) -> typing.Mapping[typing.Tuple[str, str, str, str], typing.Tuple[str, ...]]:
+    """
+    Index combinations by (format, type, reference_time, stream), the attributes
+    shared by the assets of an item.
+
+    The values are the steps of that item, sorted as strings. The input doesn't
+    need to be sorted.
+    """
+    index: typing.Dict[typing.Tuple[str, str, str, str], typing.List[str]] = {}
+    for combination in combinations:
+        key = typing.cast(typing.Tuple[str, str, str, str], tuple(combination[:4]))
+        index.setdefault(key, []).append(sys.intern(combination.step))
+    return types.MappingProxyType(
+        {key: tuple(sorted(steps)) for key, steps in index.items()}
+    )
+
+
+def _step_offset(step: str) -> typing.Optional[datetime.timedelta]:
+    if step.endswith("h"):
+        return datetime.timedelta(hours=int(step[:-1]))
+    # Monthly steps don't have a fixed offset
+    return None
+
+
+# The steps of each item, keyed by (format, type, reference_time, stream)
+ITEM_STEPS = index_combinations(get_combinations())
+
+# The offset from the reference time of each hourly step
+STEP_OFFSETS: typing.Mapping[str, datetime.timedelta] = types.MappingProxyType(
+    {step: offset for step in STEPS if (offset := _step_offset(step)) is not None}
+)
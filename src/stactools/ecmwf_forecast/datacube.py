@@ -0,0 +1,130 @@
+"""
+Datacube metadata (variables and dimensions) of items, from their ``.index`` files.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+from typing import Any, Optional, Sequence
+
+from .filesystems import FileSystems
+from .index import IndexFile
+
+# The dimension of the levels of each level type, and its unit
+LEVEL_DIMENSIONS = {
+    "pl": ("isobaricInhPa", "hPa"),
+    "sol": ("soilLayer", None),
+}
+SPATIAL_DIMENSIONS = {
+    "latitude": {
+        "type": "spatial",
+        "axis": "y",
+        "extent": [-90.0, 90.0],
+        "reference_system": 4326,
+    },
+    "longitude": {
+        "type": "spatial",
+        "axis": "x",
+        "extent": [-180.0, 180.0],
+        "reference_system": 4326,
+    },
+}
+DEFAULT_WORKERS = 16
+
+
+def read_indexes(
+    hrefs: Sequence[str],
+    workers: Optional[int] = DEFAULT_WORKERS,
+    filesystems: Optional[FileSystems] = None,
+) -> list[IndexFile]:
+    """
+    Read the ``.index`` files at `hrefs` concurrently, in one round trip, with
+    the `FileSystems` `filesystems`.
+    """
+    read = functools.partial(IndexFile.from_href, filesystems=filesystems)
+    if len(hrefs) <= 1:
+        return [read(href) for href in hrefs]
+    with concurrent.futures.ThreadPoolExecutor(min(len(hrefs), workers or 1)) as pool:
+        return list(pool.map(read, hrefs))
+
+
+def datacube_properties(indexes: Sequence[IndexFile]) -> dict[str, Any]:
+    """
+    The ``cube:dimensions`` and ``cube:variables`` describing the messages of
+    `indexes`.
+
+    Each parameter is a variable, with the ``step`` dimension, the ``number`` of
+    the ensemble member for ensemble products, the level dimension of its level type
+    (like ``isobaricInhPa``), and the ``latitude`` and ``longitude``.
+    """
+    values: dict[str, set] = {}
+    variables: dict[str, dict[str, Any]] = {}
+    for index in indexes:
+        for levtype in index.unique("levtype"):
+            subset = index.select(levtype=levtype)
+            level_dimension = None
+            if subset.unique("levelist"):
+                level_dimension = _level_dimension(levtype)
+            for param in subset.unique("param"):
+                messages = subset.select(param=param)
+                names = ["step"]
+                _update(values, "step", messages.unique("step"))
+                if messages.unique("number"):
+                    names.append("number")
+                    _update(values, "number", messages.unique("number"))
+                if level_dimension is not None:
+                    names.append(level_dimension)
+                    _update(values, level_dimension, messages.unique("levelist"))
+                names.extend(SPATIAL_DIMENSIONS)
+
+                variable = variables.setdefault(
+                    param, {"type": "data", "dimensions": names}
+                )
+                for name in names:
+                    if name not in variable["dimensions"]:
+                        variable["dimensions"].insert(-2, name)
+
+    dimensions: dict[str, dict[str, Any]] = {}
+    for name, dimension_values in values.items():
+        dimension: dict[str, Any] = {
+            "type": "other",
+            "values": sorted(
+                (_number(v) for v in dimension_values),
+                key=lambda v: (isinstance(v, str), v),
+            ),
+        }
+        if name == "step":
+            dimension["unit"] = "h"
+        for level_name, unit in LEVEL_DIMENSIONS.values():
+            if name == level_name:
+                dimension.update(type="spatial", axis="z")
+                if unit is not None:
+                    dimension["unit"] = unit
+        dimensions[name] = dimension
+    if variables:
+        dimensions.update(SPATIAL_DIMENSIONS)
+
+    return {
+        "cube:dimensions": dimensions,
+        "cube:variables": dict(sorted(variables.items())),
+    }
+
+
+def _level_dimension(levtype: str) -> str:
+    return LEVEL_DIMENSIONS.get(levtype, (levtype, None))[0]
+
+
+def _update(values: dict[str, set], name: str, new: list[str]) -> None:
+    values.setdefault(name, set()).update(new)
+
+
+def _number(value: str) -> Any:
+    # Steps, levels and members are numbers, except for step ranges like "0-24".
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
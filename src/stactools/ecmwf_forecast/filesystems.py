@@ -0,0 +1,135 @@
+"""
+Reuse fsspec filesystems, and their connection pools, between items.
+
+Filesystems are created once per protocol and kept for a bounded time, rather
+than looked up in (and cleared from) fsspec's global instance cache. Their
+listings caches, the only state that grows with the number of files read, are
+bounded too.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Optional, Union
+
+import fsspec
+
+logger = logging.getLogger(__name__)
+
+
+class FileSystems:
+    """
+    A pool of fsspec filesystems, one per protocol.
+
+    Parameters
+    ----------
+    storage_options: dict, optional
+        The options for each protocol's filesystem, like
+        ``{"az": {"account_name": "ai4edataeuwest"}}``.
+    max_age: float
+        Seconds after which a filesystem is replaced by a new one, releasing
+        its connections.
+    max_listings: int
+        The number of directory listings a filesystem may cache before its
+        listings cache is cleared.
+    """
+
+    def __init__(
+        self,
+        storage_options: Optional[dict[str, dict[str, Any]]] = None,
+        max_age: float = 600.0,
+        max_listings: int = 1000,
+    ):
+        self.storage_options = storage_options or {}
+        self.max_age = max_age
+        self.max_listings = max_listings
+        self.created = 0
+        self._filesystems: dict[str, tuple[fsspec.AbstractFileSystem, float]] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<FileSystems protocols={sorted(self._filesystems)} created={self.created}>"
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Filesystems hold connections and locks, so they're recreated in
+        # worker processes.
+        return {
+            "storage_options": self.storage_options,
+            "max_age": self.max_age,
+            "max_listings": self.max_listings,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+
+    def __enter__(self) -> "FileSystems":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def get(self, href: str) -> tuple[fsspec.AbstractFileSystem, str]:
+        """The filesystem for `href`, and the path of `href` on it."""
+        protocol = fsspec.utils.get_protocol(href)
+        with self._lock:
+            entry = self._filesystems.get(protocol)
+            now = time.monotonic()
+            if entry is None or now - entry[1] > self.max_age:
+                if entry is not None:
+                    logger.debug("Replacing the %s filesystem", protocol)
+                    _release(entry[0])
+                fs = fsspec.filesystem(
+                    protocol,
+                    skip_instance_cache=True,
+                    **self.storage_options.get(protocol, {}),
+                )
+                self.created += 1
+                entry = self._filesystems[protocol] = (fs, now)
+            fs = entry[0]
+            if len(getattr(fs, "dircache", ())) > self.max_listings:
+                _release(fs)
+        return fs, fs._strip_protocol(href)
+
+    def stats(self) -> dict[str, int]:
+        """The number of filesystems, cached listings and filesystems created."""
+        with self._lock:
+            filesystems = [fs for fs, _ in self._filesystems.values()]
+        return {
+            "filesystems": len(filesystems),
+            "listings": sum(len(getattr(fs, "dircache", ())) for fs in filesystems),
+            "created": self.created,
+        }
+
+    def close(self) -> None:
+        """Release all the filesystems."""
+        with self._lock:
+            filesystems = [fs for fs, _ in self._filesystems.values()]
+            self._filesystems.clear()
+        for fs in filesystems:
+            _release(fs)
+
+
+def _release(fs: fsspec.AbstractFileSystem) -> None:
+    # Connection pools are closed when the filesystem is garbage collected;
+    # this drops what it caches in the meantime. Not every filesystem clears its
+    # listings in `invalidate_cache`.
+    fs.invalidate_cache()
+    dircache = getattr(fs, "dircache", None)
+    if dircache is not None:
+        dircache.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def default_filesystems() -> FileSystems:
+    """The filesystems shared by the calls that don't pass their own."""
+    return FileSystems()
+
+
+def resolve_filesystems(filesystems: Union[FileSystems, None]) -> FileSystems:
+    """Get the filesystems to use for a `filesystems` argument."""
+    if filesystems is None:
+        return default_filesystems()
+    return filesystems
@@ -0,0 +1,191 @@
+"""
+Columnar, in-memory model of the NDJSON ``.index`` sidecar of a GRIB2 file.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import threading
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from .filesystems import FileSystems, resolve_filesystems
+from .reads import SELECTION_KEYS
+
+# The columns holding the message metadata, as strings. A missing value (like the
+# level of a surface parameter) is the empty string.
+COLUMNS = SELECTION_KEYS
+# The number of parsed files kept by `IndexFile.from_href`.
+CACHE_SIZE = 256
+
+
+class IndexFile:
+    """
+    The messages of a GRIB2 file, from its ``.index`` sidecar.
+
+    Messages are stored in columns: ``offset`` and ``length`` as int64 arrays,
+    and ``param``, ``levtype``, ``levelist``, ``number`` and ``step`` as string
+    arrays, so that selections are vectorized.
+
+    Parameters
+    ----------
+    offset, length: numpy.ndarray
+        The byte range of each message.
+    columns: dict[str, numpy.ndarray]
+        The string columns, by name.
+    """
+
+    def __init__(
+        self, offset: np.ndarray, length: np.ndarray, columns: dict[str, np.ndarray]
+    ):
+        self.offset = offset
+        self.length = length
+        self.columns = columns
+
+    def __repr__(self) -> str:
+        return f"<IndexFile messages={len(self)}>"
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str | bytes]) -> "IndexFile":
+        """Parse the lines of an ``.index`` file."""
+        offset = []
+        length = []
+        values: dict[str, list[str]] = {name: [] for name in COLUMNS}
+        for line in lines:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            offset.append(message["_offset"])
+            length.append(message["_length"])
+            for name, column in values.items():
+                column.append(str(message.get(name, "")))
+        return cls(
+            np.array(offset, dtype=np.int64),
+            np.array(length, dtype=np.int64),
+            {name: np.array(column, dtype=str) for name, column in values.items()},
+        )
+
+    @classmethod
+    def from_href(
+        cls,
+        href: str,
+        filesystems: Optional[FileSystems] = None,
+        token: Optional[dict[str, str]] = None,
+    ) -> "IndexFile":
+        """
+        Read the ``.index`` file at `href`.
+
+        Parsed files are cached by HREF, without checking the file again; see
+        `clear_cache`. Callers that already listed the file can pass its `token`
+        (the `cache.file_token` of its info), so that a file that's been rewritten
+        since it was cached is read again. `filesystems` is the `FileSystems` used
+        to read the file.
+        """
+        with _cache_lock:
+            cached = _cache.get(href)
+            if cached is not None and (token is None or cached[0] == token):
+                _cache.move_to_end(href)
+                return cached[1]
+
+        fs, path = resolve_filesystems(filesystems).get(href)
+        with fs.open(path, "rt") as f:
+            index = cls.from_lines(f)
+        with _cache_lock:
+            _cache[href] = (token, index)
+            _cache.move_to_end(href)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return index
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Forget the files parsed by `from_href`."""
+        with _cache_lock:
+            _cache.clear()
+
+    def mask(self, **selection: Any) -> np.ndarray:
+        """
+        The boolean mask of the messages matching `selection`.
+
+        Each keyword is a column name with a value or a list of values, compared
+        as strings. ``None`` selects everything.
+        """
+        unknown = set(selection) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Bad selection keys: {sorted(unknown)}")
+
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in selection.items():
+            if value is None:
+                continue
+            if isinstance(value, (str, int)):
+                value = [value]
+            mask &= np.isin(self.columns[name], [str(v) for v in value])
+        return mask
+
+    def select(self, **selection: Any) -> "IndexFile":
+        """The messages matching `selection`. See `mask`."""
+        return self[self.mask(**selection)]
+
+    def __getitem__(self, key: Any) -> "IndexFile":
+        return IndexFile(
+            self.offset[key],
+            self.length[key],
+            {name: column[key] for name, column in self.columns.items()},
+        )
+
+    def unique(self, name: str) -> list[str]:
+        """The distinct non-empty values of a column, sorted."""
+        return [v for v in np.unique(self.columns[name]).tolist() if v]
+
+    def to_ranges(self, max_gap: Optional[int] = None) -> np.ndarray:
+        """
+        The byte ranges of the messages, as an ``(n, 2)`` array of start and end.
+
+        Ranges are sorted. With `max_gap`, ranges separated by at most that many
+        bytes are merged, like `reads.plan_reads`.
+        """
+        order = np.argsort(self.offset, kind="stable")
+        start = self.offset[order]
+        end = start + self.length[order]
+        if max_gap is None or len(start) == 0:
+            return np.stack([start, end], axis=1)
+
+        end = np.maximum.accumulate(end)
+        breaks = np.flatnonzero(start[1:] - end[:-1] > max_gap) + 1
+        first = np.concatenate([[0], breaks])
+        last = np.concatenate([breaks - 1, [len(start) - 1]])
+        return np.stack([start[first], end[last]], axis=1)
+
+    def messages(self) -> list[dict[str, Any]]:
+        """
+        The messages as dictionaries, like the lines of the ``.index`` file.
+
+        These can be passed to `reads.read_messages`. Empty values are left out.
+        """
+        names = list(self.columns)
+        rows = zip(
+            self.offset.tolist(),
+            self.length.tolist(),
+            *(self.columns[name].tolist() for name in names),
+        )
+        return [
+            {
+                **{name: value for name, value in zip(names, values) if value},
+                "_offset": offset,
+                "_length": length,
+            }
+            for offset, length, *values in rows
+        ]
+
+
+# The token and parsed file of each HREF
+_cache: collections.OrderedDict[str, tuple[Optional[dict[str, str]], IndexFile]] = (
+    collections.OrderedDict()
+)
+_cache_lock = threading.Lock()
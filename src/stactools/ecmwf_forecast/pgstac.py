@@ -0,0 +1,173 @@
+"""
+Items dehydrated against their collection, for loading into pgstac.
+
+pgstac stores each item as its difference from a base item built from the
+collection: the ``type`` and ``stac_version`` of a STAC item, the collection's
+``id`` and its ``item_assets`` as the ``assets``. An asset of a dehydrated item
+only holds the fields that differ from its item asset definition (the ``href``
+and ``kerchunk:indices``, but not the ``type`` and ``roles``).
+
+Fields of the base item missing from an item are marked with
+`DO_NOT_MERGE_MARKER`, so that `hydrate` doesn't add them back. This follows
+``pypgstac.hydration``, and `hydrate` undoes `dehydrate` exactly:
+
+>>> base = base_item(stac.create_collection())
+>>> dehydrated = dehydrate(base, item)
+>>> assert hydrate(base, dehydrated) == item
+
+`dehydrate_items` dehydrates many items for loading. By default, their assets
+inherit the ``title`` and ``description`` of their item asset definition, rather
+than marking them as missing.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Iterable, Iterator, Union
+
+from pystac import Collection
+
+# The value of the fields of the base item that aren't in an item.
+DO_NOT_MERGE_MARKER = "𒍟※"
+
+
+def base_item(collection: Union[Collection, dict[str, Any]]) -> dict[str, Any]:
+    """
+    The base item of the items of `collection`, like pgstac's
+    ``collection_base_item``.
+    """
+    if isinstance(collection, Collection):
+        collection = collection.to_dict(include_self_link=False, transform_hrefs=False)
+    return {
+        "type": "Feature",
+        "stac_version": collection["stac_version"],
+        "assets": collection.get("item_assets", {}),
+        "collection": collection["id"],
+    }
+
+
+def dehydrate(base: dict[str, Any], item: dict[str, Any]) -> dict[str, Any]:
+    """
+    The fields of the item dictionary `item` that differ from `base`.
+
+    The dehydrated item shares its values with `item`.
+    """
+    return _strip(base, item)
+
+
+def hydrate(base: dict[str, Any], item: dict[str, Any]) -> dict[str, Any]:
+    """
+    Add the fields of `base` back to the dehydrated item dictionary `item`.
+
+    `item` is updated in place, and returned. The values copied from `base`
+    are copies, so `base` can be shared by many items.
+    """
+    _merge(base, item)
+    return item
+
+
+def dehydrate_items(
+    items: Iterable[dict[str, Any]],
+    collection: Union[Collection, dict[str, Any]],
+    inherit_item_assets: bool = True,
+) -> Iterator[dict[str, Any]]:
+    """
+    Dehydrate item dictionaries against `collection`, setting their
+    ``collection`` to its ID.
+
+    Parameters
+    ----------
+    items: Iterable[dict]
+        The items, from `stac.create_item_dicts` or ``Item.to_dict``.
+    collection: pystac.Collection or dict
+        The collection of the items, like `stac.create_collection`.
+    inherit_item_assets: bool
+        Whether the assets described by the collection's ``item_assets`` take
+        the fields of their definition they don't have, like its ``title``
+        and ``description``, once hydrated. Otherwise, those fields are marked
+        as missing in every asset, which takes more space than they save.
+
+    Returns
+    -------
+    Iterator[dict]
+    """
+    base = base_item(collection)
+    for item in items:
+        item = {**item, "collection": base["collection"]}
+        if inherit_item_assets:
+            item["assets"] = with_item_assets(item["assets"], base["assets"])
+        yield dehydrate(base, item)
+
+
+def hydrate_items(
+    items: Iterable[dict[str, Any]], collection: Union[Collection, dict[str, Any]]
+) -> Iterator[dict[str, Any]]:
+    """Hydrate the items of `collection` written by `dehydrate_items`."""
+    base = base_item(collection)
+    for item in items:
+        yield hydrate(base, item)
+
+
+def with_item_assets(
+    assets: dict[str, dict[str, Any]], item_assets: dict[str, dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    """
+    The assets, with the fields of their definition in `item_assets` they
+    don't have.
+    """
+    return {
+        key: {**item_assets[key], **asset} if key in item_assets else asset
+        for key, asset in assets.items()
+    }
+
+
+def _strip(base: dict[str, Any], item: dict[str, Any]) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for key, value in item.items():
+        if key not in base:
+            out[key] = value
+            continue
+
+        base_value = base[key]
+        if base_value == value:
+            continue
+
+        if isinstance(base_value, list) and isinstance(value, list):
+            if len(base_value) == len(value):
+                out[key] = [
+                    _strip(b, v) if isinstance(b, dict) and isinstance(v, dict) else v
+                    for b, v in zip(base_value, value)
+                ]
+            else:
+                out[key] = value
+        elif value is None or value == []:
+            # pgstac doesn't keep empty values that differ from the base item.
+            continue
+        elif isinstance(base_value, dict) and isinstance(value, dict):
+            out[key] = _strip(base_value, value)
+        else:
+            out[key] = value
+
+    # Fields of the base item missing from the item aren't hydrated.
+    for key in base:
+        if key not in item:
+            out[key] = DO_NOT_MERGE_MARKER
+    return out
+
+
+def _merge(base: dict[str, Any], item: dict[str, Any]) -> None:
+    for key, base_value in base.items():
+        if key not in item:
+            item[key] = copy.deepcopy(base_value)
+            continue
+
+        value = item[key]
+        if isinstance(base_value, dict) and isinstance(value, dict):
+            _merge(base_value, value)
+        elif isinstance(base_value, list) and isinstance(value, list):
+            if len(base_value) == len(value):
+                for b, v in zip(base_value, value):
+                    if isinstance(b, dict) and isinstance(v, dict):
+                        _merge(b, v)
+        elif value == DO_NOT_MERGE_MARKER:
+            del item[key]
@@ -0,0 +1,267 @@
+"""
+Per-item, per-phase timings of item creation.
+
+Recording is scoped with a context variable, and is off unless `recording` is
+active, in which case every `phase` (like ``scan``, ``combine`` or
+``serialize``) emits a `Record` of its wall time, the bytes and requests read
+during it and, optionally, the peak of memory allocated, to a sink:
+
+>>> sink = MemorySink()
+>>> with recording(sink):
+...     item = stac.create_item(hrefs)
+>>> print(format_summary(sink.records))
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import logging
+import time
+import tracemalloc
+from typing import IO, Any, Callable, Iterable, Iterator, NamedTuple, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class Record(NamedTuple):
+    """The measurements of one phase of one item."""
+
+    item_id: Optional[str]
+    phase: str
+    seconds: float
+    bytes_read: int = 0
+    requests: int = 0
+    # Bytes allocated above the start of the phase, when tracing memory.
+    peak_memory: Optional[int] = None
+
+
+class Sink(Protocol):
+    def emit(self, record: Record) -> None: ...
+
+
+class MemorySink:
+    """Keep the records in a list, for tests and summaries."""
+
+    def __init__(self) -> None:
+        self.records: list[Record] = []
+
+    def emit(self, record: Record) -> None:
+        self.records.append(record)
+
+
+class LoggingSink:
+    """Log each record, at DEBUG level by default."""
+
+    def __init__(self, logger: logging.Logger = logger, level: int = logging.DEBUG):
+        self.logger = logger
+        self.level = level
+
+    def emit(self, record: Record) -> None:
+        self.logger.log(
+            self.level,
+            "%s %s: %.3fs, %d bytes in %d requests",
+            record.item_id,
+            record.phase,
+            record.seconds,
+            record.bytes_read,
+            record.requests,
+        )
+
+
+class JSONLinesSink:
+    """Write each record as a line of JSON to the open file `f`."""
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+
+    def emit(self, record: Record) -> None:
+        self.f.write(json.dumps(record._asdict()) + "\n")
+
+
+class _Frame:
+    __slots__ = ("bytes_read", "requests", "peak", "start_memory")
+
+    def __init__(self, start_memory: int):
+        self.bytes_read = 0
+        self.requests = 0
+        self.peak = start_memory
+        self.start_memory = start_memory
+
+
+class Recorder:
+    """The sink of a `recording`, and the phases currently open."""
+
+    def __init__(self, sink: Sink, memory: bool = False):
+        self.sink = sink
+        self.memory = memory
+        self.frames: list[_Frame] = []
+
+    def emit(self, record: Record) -> None:
+        self.sink.emit(record)
+
+
+_recorder: contextvars.ContextVar[Optional[Recorder]] = contextvars.ContextVar(
+    "ecmwf_forecast_recorder", default=None
+)
+_item_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "ecmwf_forecast_item_id", default=None
+)
+
+
+def current() -> Optional[Recorder]:
+    """The recorder of the active `recording`, if any."""
+    return _recorder.get()
+
+
+@contextlib.contextmanager
+def recording(sink: Sink, memory: bool = False) -> Iterator[Recorder]:
+    """
+    Record the phases run in this context to `sink`.
+
+    With `memory`, ``tracemalloc`` traces allocations while recording, which
+    slows everything down. Its peaks are process-wide, so phases running
+    concurrently in threads count each other's allocations.
+    """
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _recorder.set(Recorder(sink, memory=memory))
+    try:
+        yield _recorder.get()  # type: ignore[misc]
+    finally:
+        _recorder.reset(token)
+        if started:
+            tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def item(item_id: str) -> Iterator[None]:
+    """Attribute the phases in this context to `item_id`, recorded as ``item``."""
+    token = _item_id.set(item_id)
+    try:
+        with phase("item"):
+            yield
+    finally:
+        _item_id.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name: str, item_id: Optional[str] = None) -> Iterator[None]:
+    """
+    Record the time, reads and memory of the code in this context as `name`, for
+    `item_id` or the current `item`.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+
+    memory = recorder.memory and tracemalloc.is_tracing()
+    if memory:
+        current_memory, peak = tracemalloc.get_traced_memory()
+        if recorder.frames:
+            outer = recorder.frames[-1]
+            outer.peak = max(outer.peak, peak)
+        tracemalloc.reset_peak()
+    frame = _Frame(current_memory if memory else 0)
+    recorder.frames.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        recorder.frames.pop()
+        peak_memory = None
+        if memory:
+            frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            peak_memory = frame.peak - frame.start_memory
+        if recorder.frames:
+            outer = recorder.frames[-1]
+            outer.bytes_read += frame.bytes_read
+            outer.requests += frame.requests
+            outer.peak = max(outer.peak, frame.peak)
+        recorder.emit(
+            Record(
+                item_id or _item_id.get(),
+                name,
+                seconds,
+                frame.bytes_read,
+                frame.requests,
+                peak_memory,
+            )
+        )
+
+
+def add_read(nbytes: int, requests: int = 1) -> None:
+    """Count `nbytes` read with `requests` requests in the current phase."""
+    recorder = _recorder.get()
+    if recorder is not None and recorder.frames:
+        frame = recorder.frames[-1]
+        frame.bytes_read += nbytes
+        frame.requests += requests
+
+
+def capture(
+    func: Callable[..., Any], *args: Any, memory: bool = False, **kwargs: Any
+) -> tuple[Any, list[Record]]:
+    """
+    Call `func` while recording to a new `MemorySink`, and return its result and
+    the records.
+
+    Workers, which don't share the caller's context, run tasks with this, and
+    the caller replays the records to its own sink.
+    """
+    sink = MemorySink()
+    with recording(sink, memory=memory):
+        result = func(*args, **kwargs)
+    return result, sink.records
+
+
+def summarize(records: Iterable[Record]) -> dict[str, dict[str, Any]]:
+    """
+    Aggregate `records` by phase: the number of records, the total and mean
+    seconds, the bytes and requests read and the largest memory peak.
+    """
+    out: dict[str, dict[str, Any]] = {}
+    for record in records:
+        summary = out.setdefault(
+            record.phase,
+            {
+                "count": 0,
+                "seconds": 0.0,
+                "bytes_read": 0,
+                "requests": 0,
+                "peak_memory": None,
+            },
+        )
+        summary["count"] += 1
+        summary["seconds"] += record.seconds
+        summary["bytes_read"] += record.bytes_read
+        summary["requests"] += record.requests
+        if record.peak_memory is not None:
+            summary["peak_memory"] = max(
+                summary["peak_memory"] or 0, record.peak_memory
+            )
+    for summary in out.values():
+        summary["mean_seconds"] = summary["seconds"] / summary["count"]
+    return out
+
+
+def format_summary(records: Iterable[Record]) -> str:
+    """
+    A table of `summarize`, slowest phases first. Phases are nested (``scan`` runs
+    within ``kerchunk``, within ``item``), so their times overlap.
+    """
+    rows = [
+        "phase                count   total (s)    mean (ms)    MB read   requests   peak MB"
+    ]
+    summaries = sorted(summarize(records).items(), key=lambda kv: -kv[1]["seconds"])
+    for name, s in summaries:
+        peak = "" if s["peak_memory"] is None else f"{s['peak_memory'] / 1e6:.1f}"
+        rows.append(
+            f"{name:<20} {s['count']:>5} {s['seconds']:>11.3f} {s['mean_seconds'] * 1e3:>12.3f}"
+            f" {s['bytes_read'] / 1e6:>10.1f} {s['requests']:>10} {peak:>9}"
+        )
+    return "\n".join(rows)
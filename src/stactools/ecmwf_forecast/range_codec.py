@@ -1,38 +1,102 @@
+import functools
+import logging
+
 import numpy as np
 from numcodecs.abc import Codec
+from numcodecs.compat import ensure_ndarray, ndarray_copy
+
+logger = logging.getLogger(__name__)
+
+# Compare the encoded array in blocks of this many elements, bounding the
+# temporary memory used.
+BLOCK_SIZE = 4096
 
 
 class Range(Codec):
     """Codec providing range compression
 
+    Regularly spaced arrays (like the latitude and longitude of a regular grid)
+    are encoded as ``(start, stop, step)`` and decoded with ``np.arange``.
+
+    Arrays that aren't regular within `tolerance` are either stored as is
+    (``irregular="raw"``, marked by a leading NaN), or raise a ``ValueError``
+    (``irregular="raise"``).
+
+    Decoded arrays are memoized, since many datasets share the same grid. They're
+    read-only; pass ``out`` to `decode` for a writable copy.
+
     Parameters
     ----------
+    dtype: dtype
+        The data type of the array.
+    tolerance: float
+        The largest absolute difference allowed between the array and its
+        range-encoded values.
+    irregular: str
+        What to do with an irregular array: ``"raw"`` or ``"raise"``.
     """
 
     codec_id = "range"
 
-    def __init__(self, dtype=float):
+    def __init__(self, dtype=float, tolerance=1e-10, irregular="raw"):
         self.dtype = np.dtype(dtype)
         if self.dtype == object:
             raise ValueError("object arrays are not supported")
+        if irregular not in ("raw", "raise"):
+            raise ValueError(f"irregular must be 'raw' or 'raise', not {irregular!r}")
+        self.tolerance = tolerance
+        self.irregular = irregular
 
     def _get_start_stop_inc(self, array):
         start = array[0]
         stop = array[-1]
-        diffs = array[1:] - array[0:-1]
-        delta = np.mean(diffs)
-        max_diff = np.max(np.abs(delta - diffs))
-        if max_diff > 1e-10:
-            print("Delta may not be accurate:", delta, max_diff)
+        # The mean of the differences, without computing them
+        delta = (stop - start) / (len(array) - 1)
         return start, stop + delta, delta
 
+    def _is_regular(self, array, encoded):
+        decoded = _decode(encoded, self.dtype.str)
+        if decoded.shape != array.shape:
+            return False
+
+        buf = np.empty(min(len(array), BLOCK_SIZE), dtype=self.dtype)
+        for i in range(0, len(array), BLOCK_SIZE):
+            j = i + BLOCK_SIZE
+            a, b = array[i:j], decoded[i:j]
+            t = buf[: len(a)]
+            np.subtract(a, b, out=t)
+            np.abs(t, out=t)
+            if t.max() > self.tolerance:
+                return False
+        return True
+
     def encode(self, buf):
-        info = self._get_start_stop_inc(np.frombuffer(buf, dtype=self.dtype))
-        info = np.array([*info], dtype=self.dtype)
-        return info.tobytes()
-
-    def decode(self, buf):
-        new_arr = np.arange(
-            *[i for i in np.frombuffer(buf, dtype=self.dtype)], dtype=self.dtype
-        )
-        return new_arr
+        array = np.frombuffer(buf, dtype=self.dtype)
+        if len(array) > 1:
+            info = np.array([*self._get_start_stop_inc(array)], dtype=self.dtype)
+            encoded = info.tobytes()
+            if self._is_regular(array, encoded):
+                return encoded
+
+        if self.irregular == "raise" or self.dtype.kind != "f":
+            raise ValueError("Array is not regularly spaced within the tolerance.")
+        logger.warning("Array is not regularly spaced. Storing the raw values.")
+        return np.concatenate([np.array([np.nan], dtype=self.dtype), array]).tobytes()
+
+    def decode(self, buf, out=None):
+        decoded = _decode(bytes(ensure_ndarray(buf)), self.dtype.str)
+        if out is not None:
+            return ndarray_copy(decoded, out)
+        return decoded
+
+
+@functools.lru_cache(maxsize=64)
+def _decode(buf: bytes, dtype: str) -> np.ndarray:
+    values = np.frombuffer(buf, dtype=dtype)
+    if len(values) and values.dtype.kind == "f" and np.isnan(values[0]):
+        # irregular array, stored as is
+        decoded = values[1:].copy()
+    else:
+        decoded = np.arange(*values, dtype=dtype)
+    decoded.setflags(write=False)
+    return decoded
@@ -0,0 +1,248 @@
+"""
+Read GRIB2 messages with as few range requests as possible.
+
+The byte ranges of the messages to read, from the ``.index`` sidecar, are
+sorted and merged when they're adjacent or separated by less than a gap
+(`plan_reads`). Each merged range is fetched with a single request, with a
+bounded number of requests in flight, and split back into the messages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional, Sequence
+
+import fsspec
+
+from . import profiling
+from .filesystems import FileSystems, resolve_filesystems
+
+# Merge ranges separated by up to this many bytes. Reading the gap is cheaper
+# than another round trip.
+DEFAULT_MAX_GAP = 64 * 1024
+# Don't merge ranges beyond this many bytes, so that large reads still run
+# concurrently.
+DEFAULT_MAX_SIZE = 64 * 1024**2
+DEFAULT_CONCURRENCY = 16
+SELECTION_KEYS = ("param", "levtype", "levelist", "number", "step")
+
+
+class Read(NamedTuple):
+    """A range request covering one or more messages."""
+
+    start: int
+    end: int
+    messages: tuple[dict[str, Any], ...]
+
+
+def select_messages(
+    messages: Iterable[dict[str, Any]], **selection: Any
+) -> list[dict[str, Any]]:
+    """
+    Select the entries of an ``.index`` file matching `selection`.
+
+    Each keyword is one of ``param``, ``levtype``, ``levelist``, ``number`` or
+    ``step``, with a value or a list of values. Values are compared as strings,
+    like they're stored in the index, so ``levelist=500`` matches ``"500"``.
+    """
+    unknown = set(selection) - set(SELECTION_KEYS)
+    if unknown:
+        raise ValueError(f"Bad selection keys: {sorted(unknown)}")
+
+    wanted = {}
+    for key, value in selection.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, int)):
+            value = [value]
+        wanted[key] = {str(v) for v in value}
+
+    return [
+        message
+        for message in messages
+        if all(message.get(key) in values for key, values in wanted.items())
+    ]
+
+
+def plan_reads(
+    messages: Iterable[dict[str, Any]],
+    max_gap: int = DEFAULT_MAX_GAP,
+    max_size: int = DEFAULT_MAX_SIZE,
+) -> list[Read]:
+    """
+    Plan the range requests reading `messages`.
+
+    Messages are sorted by offset, and a message is added to the previous read
+    if it starts at most `max_gap` bytes after its end, and the read stays under
+    `max_size` bytes.
+    """
+    reads: list[Read] = []
+    start = end = 0
+    current: list[dict[str, Any]] = []
+    for message in sorted(messages, key=lambda m: m["_offset"]):
+        offset = message["_offset"]
+        stop = offset + message["_length"]
+        if current and offset - end <= max_gap and max(stop, end) - start <= max_size:
+            current.append(message)
+            end = max(end, stop)
+        else:
+            if current:
+                reads.append(Read(start, end, tuple(current)))
+            start, end, current = offset, stop, [message]
+    if current:
+        reads.append(Read(start, end, tuple(current)))
+    return reads
+
+
+def split_read(read: Read, data: bytes) -> list[bytes]:
+    """Split the bytes fetched for `read` into its messages."""
+    return [
+        data[m["_offset"] - read.start : m["_offset"] - read.start + m["_length"]]
+        for m in read.messages
+    ]
+
+
+def read_messages(
+    href: str,
+    messages: Sequence[dict[str, Any]],
+    max_gap: int = DEFAULT_MAX_GAP,
+    max_size: int = DEFAULT_MAX_SIZE,
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    filesystems: Optional[FileSystems] = None,
+) -> list[bytes]:
+    """
+    Read `messages` of the GRIB2 file at `href`.
+
+    Parameters
+    ----------
+    href: str
+        The HREF of the GRIB2 file.
+    messages: list[dict]
+        Entries of the file's ``.index``, possibly from `select_messages`.
+    max_gap, max_size: int
+        How ranges are merged, see `plan_reads`.
+    max_concurrency: int
+        The number of requests in flight.
+    filesystems: FileSystems, optional
+        The filesystems used to read the file.
+
+    Returns
+    -------
+    list[bytes]: The bytes of each message, in the order of `messages`.
+    """
+    fs, path = resolve_filesystems(filesystems).get(href)
+    reads = plan_reads(messages, max_gap=max_gap, max_size=max_size)
+    profiling.add_read(sum(r.end - r.start for r in reads), requests=len(reads))
+
+    def fetch(read: Read) -> bytes:
+        return fs.cat_file(path, start=read.start, end=read.end)
+
+    if len(reads) == 1:
+        data = [fetch(reads[0])]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_concurrency) as pool:
+            data = list(pool.map(fetch, reads))
+    return _by_message(messages, reads, data)
+
+
+async def read_messages_async(
+    href: str,
+    messages: Sequence[dict[str, Any]],
+    max_gap: int = DEFAULT_MAX_GAP,
+    max_size: int = DEFAULT_MAX_SIZE,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> list[bytes]:
+    """
+    Read `messages` of the GRIB2 file at `href` with fsspec's async filesystems.
+
+    Like `read_messages`, with `semaphore` bounding the number of requests in
+    flight.
+    """
+    semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    reads = plan_reads(messages, max_gap=max_gap, max_size=max_size)
+    fs, path = _async_filesystem(href)
+
+    async def fetch(read: Read) -> bytes:
+        async with semaphore:
+            return await fs._cat_file(path, start=read.start, end=read.end)
+
+    try:
+        data = await asyncio.gather(*[fetch(read) for read in reads])
+    finally:
+        await _close_async_filesystem(fs)
+    return _by_message(messages, reads, data)
+
+
+def iter_messages(f: IO[bytes]) -> Iterator[tuple[int, bytes]]:
+    """
+    Read the GRIB2 messages of the open file `f` one at a time.
+
+    Yields the offset and bytes of each message. Bytes between messages, like
+    padding, are skipped.
+
+    Raises
+    ------
+    ValueError: If a message isn't GRIB edition 2, or is truncated.
+    """
+    while True:
+        start = f.tell()
+        head = f.read(1024)
+        ind = head.find(b"GRIB")
+        if ind == -1 or len(head) < ind + 16:
+            if len(head) < 1024:
+                if ind != -1:
+                    raise ValueError(f"Truncated GRIB2 message at offset {start + ind}")
+                return
+            # Look again from the start of the message, or keep the end of the
+            # block in case it's split across blocks.
+            f.seek(start + (ind if ind != -1 else len(head) - 3))
+            continue
+        offset = start + ind
+        edition = head[ind + 7]
+        if edition != 2:
+            raise ValueError(
+                f"Bad GRIB edition {edition} at offset {offset}. Must be 2."
+            )
+        # Section 0 ends with the total length of the message.
+        length = int.from_bytes(head[ind + 8 : ind + 16], "big")
+        if length < 16 + 4:
+            raise ValueError(f"Bad GRIB2 message length {length} at offset {offset}")
+        f.seek(offset)
+        data = f.read(length)
+        if len(data) != length or not data.endswith(b"7777"):
+            raise ValueError(f"Truncated GRIB2 message at offset {offset}")
+        yield offset, data
+
+
+def _by_message(
+    messages: Sequence[dict[str, Any]], reads: list[Read], data: Sequence[bytes]
+) -> list[bytes]:
+    fetched = {}
+    for read, buf in zip(reads, data):
+        for message, message_data in zip(read.messages, split_read(read, buf)):
+            fetched[id(message)] = message_data
+    return [fetched[id(message)] for message in messages]
+
+
+def _async_filesystem(href):
+    """An async filesystem for `href`, wrapping synchronous filesystems if needed."""
+    protocol = fsspec.utils.get_protocol(href)
+    cls = fsspec.get_filesystem_class(protocol)
+    if getattr(cls, "async_impl", False):
+        fs = fsspec.filesystem(protocol, asynchronous=True, skip_instance_cache=True)
+    else:
+        # Only in recent fsspec releases, so that older ones can still import
+        # this module for the synchronous functions.
+        from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+
+        fs = AsyncFileSystemWrapper(fsspec.filesystem(protocol), asynchronous=True)
+    return fs, fs._strip_protocol(href)
+
+
+async def _close_async_filesystem(fs):
+    # Sessions are bound to the running event loop, so they're closed
+    # rather than left for the instance cache.
+    session = getattr(fs, "_session", None)
+    if session is not None and not session.closed:
+        await session.close()
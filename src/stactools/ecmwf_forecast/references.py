@@ -0,0 +1,139 @@
+"""
+Store kerchunk references outside of items.
+
+References can be written to sidecar files (`write_references`), and split into
+a template shared by many items plus a small per-item delta (`build_template`,
+`split_references`, `merge_references`).
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Optional
+
+import fsspec
+
+JSON_MEDIA_TYPE = "application/json"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+FORMATS = {"json": (".json", JSON_MEDIA_TYPE), "parquet": (".parq", PARQUET_MEDIA_TYPE)}
+# The item asset field naming the template its (delta) references apply to, and
+# the collection field holding the templates.
+TEMPLATE_FIELD = "kerchunk:template"
+TEMPLATES_FIELD = "kerchunk:templates"
+
+
+def references_href(
+    base: str, item_id: str, asset_key: str, format: str = "json"
+) -> str:
+    """The HREF for the references of an item's asset, under `base`."""
+    extension, _ = FORMATS[format]
+    return f"{base.rstrip('/')}/{item_id}/{asset_key}{extension}"
+
+
+def write_references(refs: dict[str, Any], href: str, format: str = "json") -> str:
+    """
+    Write the kerchunk references `refs` to `href`.
+
+    ``format="json"`` writes a compact JSON file. ``format="parquet"`` writes a
+    kerchunk Parquet reference store (a directory), which requires ``fastparquet``.
+    Both can be opened with fsspec's ``reference://`` filesystem, by passing `href`
+    as ``fo``.
+
+    Returns
+    -------
+    str: The media type of the references.
+    """
+    if format == "json":
+        with fsspec.open(href, "w") as f:
+            json.dump(refs, f, separators=(",", ":"))
+    elif format == "parquet":
+        try:
+            from kerchunk.df import refs_to_dataframe
+        except ImportError as e:
+            raise ImportError(
+                "Writing parquet references requires kerchunk and fastparquet."
+            ) from e
+
+        refs_to_dataframe(refs, href)
+    else:
+        raise ValueError(
+            f"Bad references format: {format}. Must be 'json' or 'parquet'."
+        )
+
+    return FORMATS[format][1]
+
+
+def template_key(stream: str, type: str) -> str:
+    """The key of the template for a stream and type, like ``"wave-fc"``."""
+    return f"{stream}-{type}"
+
+
+def build_template(references: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Build a template from the references of several items.
+
+    The template holds the references that are identical in all of them: the
+    ``.zgroup``, ``.zattrs`` and ``.zarray`` documents, and coordinates like
+    ``latitude/0`` and ``longitude/0``. Use references from at least two items,
+    so that per-item values like ``time/0`` are left out.
+    """
+    common: Optional[dict[str, Any]] = None
+    for refs in references:
+        if common is None:
+            common = dict(refs["refs"])
+        else:
+            other = refs["refs"]
+            common = {k: v for k, v in common.items() if k in other and other[k] == v}
+    if common is None:
+        raise ValueError("At least one set of references is required.")
+    return {"version": 1, "refs": common}
+
+
+def split_references(refs: dict[str, Any], template: dict[str, Any]) -> dict[str, Any]:
+    """
+    The delta between the references `refs` and `template`.
+
+    The delta holds the references that are missing from, or differ from, the
+    template, and lists the template's references missing from `refs` under
+    ``"deleted"``. ``merge_references(template, delta)`` gives back `refs`.
+    """
+    base = template["refs"]
+    current = refs["refs"]
+    delta: dict[str, Any] = {
+        "version": refs.get("version", 1),
+        "refs": {k: v for k, v in current.items() if k not in base or base[k] != v},
+    }
+    deleted = [k for k in base if k not in current]
+    if deleted:
+        delta["deleted"] = deleted
+    return delta
+
+
+def merge_references(template: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """Merge the `delta` from `split_references` into `template`."""
+    merged = dict(template["refs"])
+    for k in delta.get("deleted", []):
+        merged.pop(k, None)
+    merged.update(delta["refs"])
+    return {"version": delta.get("version", 1), "refs": merged}
+
+
+def asset_references(
+    extra_fields: dict[str, Any], templates: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """
+    The full references of an item's data asset.
+
+    Parameters
+    ----------
+    extra_fields: dict
+        The asset's extra fields, with ``kerchunk:indices``.
+    templates: dict
+        The templates, by `template_key`. Usually the collection's
+        ``kerchunk:templates``.
+    """
+    refs = extra_fields["kerchunk:indices"]
+    key = extra_fields.get(TEMPLATE_FIELD)
+    if key is None:
+        return refs
+    return merge_references(templates[key], refs)
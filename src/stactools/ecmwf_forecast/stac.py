@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import concurrent.futures
 import dataclasses
 import datetime
+import functools
 import itertools
+import json
 import logging
 import operator
-import pathlib
+import os
 import re
-from typing import Any, Optional
+import time
+import zlib
+from typing import Any, Iterable, Iterator, Optional
 
 import fsspec
 import pystac
+import pystac.extensions.item_assets
 from pystac import (
     CatalogType,
     Collection,
@@ -21,9 +29,22 @@ from pystac import (
     SpatialExtent,
     TemporalExtent,
 )
+from pystac.extensions.datacube import DatacubeExtension
+from pystac.utils import datetime_to_str
 
 from . import _kerchunk_helper_functions as khf
-from . import constants
+from . import constants, profiling
+from . import references as refs
+from .cache import KerchunkCache, file_token
+from .datacube import datacube_properties, read_indexes
+from .filesystems import FileSystems, resolve_filesystems
+from .index import IndexFile
+from .state import StateStore
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
 
@@ -38,8 +59,38 @@ xpr = re.compile(
 NDJSON_MEDIA_TYPE = "application/x-ndjson"
 GRIB2_MEDIA_TYPE = "application/wmo-GRIB2"
 
+# Every item covers the whole globe.
+_GEOMETRY = {
+    "type": "Polygon",
+    "coordinates": (
+        (
+            (180.0, -90.0),
+            (180.0, 90.0),
+            (-180.0, 90.0),
+            (-180.0, -90.0),
+            (180.0, -90.0),
+        ),
+    ),
+}
+_BBOX = [-180.0, -90.0, 180.0, 90.0]
+# The media type and roles of each format of asset.
+_ASSET_FORMATS = {
+    "grib2": (GRIB2_MEDIA_TYPE, ["data"]),
+    "index": (NDJSON_MEDIA_TYPE, ["index"]),
+    "bufr": (None, ["data"]),
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_reference_datetime(value: str) -> datetime.datetime:
+    # Fixed-width YYYYMMDDHH; much faster than strptime, and listings share
+    # a handful of reference times.
+    return datetime.datetime(
+        int(value[0:4]), int(value[4:6]), int(value[6:8]), int(value[8:10])
+    )
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class Parts:
     reference_datetime: datetime.datetime
     stream: str
@@ -49,6 +100,14 @@ class Parts:
     filename: str
     split_by_step: bool = False
     resolution: Optional[str] = None
+    # Derived from the fields above on first access, since they're used
+    # repeatedly while creating items.
+    _item_id: Optional[str] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _forecast_datetime: Optional[datetime.datetime] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def datetime(self):
@@ -58,35 +117,55 @@ class Parts:
             return self.reference_datetime
 
     @classmethod
-    def from_filename(cls, filename: str, split_by_step=False, resolution: Optional[str] = None) -> "Parts":
-        name = pathlib.Path(filename).name
+    def from_filename(
+        cls, filename: str, split_by_step=False, resolution: Optional[str] = None
+    ) -> "Parts":
+        name = filename.rpartition("/")[2]
         m = xpr.match(name)
         if not m:
             raise ValueError(name)
-        d = m.groupdict()
-        d["filename"] = filename
-        d["reference_datetime"] = datetime.datetime.strptime(
-            d["reference_datetime"], "%Y%m%d%H"
-        )  # type: ignore
-        if resolution:
-            d["resolution"] = resolution
-        #  error: Argument 1 to "Parts" has incompatible type
-        # "**Dict[str, Union[str, Any]]"; expected "datetime"
-        return cls(**d, split_by_step=split_by_step)  # type: ignore
+        reference_datetime, step, stream, type_, format_ = m.groups()
+        return cls(
+            _parse_reference_datetime(reference_datetime),
+            stream,
+            step,
+            type_,
+            format_,
+            filename,
+            split_by_step,
+            resolution or None,
+        )
+
+    @classmethod
+    def from_filenames(
+        cls,
+        filenames: Iterable[str],
+        split_by_step=False,
+        resolution: Optional[str] = None,
+    ) -> list["Parts"]:
+        """Parse many filenames. See `Parts.from_filename`."""
+        from_filename = cls.from_filename
+        return [
+            from_filename(filename, split_by_step, resolution) for filename in filenames
+        ]
 
     @property
     def item_id(self) -> str:
-        parts = [
-            "ecmwf",
-            self.reference_datetime.isoformat(timespec="hours"),
-            self.stream,
-            self.type,
-        ]
-        if self.split_by_step:
-            parts.append(self.step)
-        if self.resolution is not None:
-            parts.append(self.resolution)
-        return "-".join(parts)
+        item_id = self._item_id
+        if item_id is None:
+            parts = [
+                "ecmwf",
+                self.reference_datetime.isoformat(timespec="hours"),
+                self.stream,
+                self.type,
+            ]
+            if self.split_by_step:
+                parts.append(self.step)
+            if self.resolution is not None:
+                parts.append(self.resolution)
+            item_id = "-".join(parts)
+            object.__setattr__(self, "_item_id", item_id)
+        return item_id
 
     @property
     def asset_id(self) -> str:
@@ -99,6 +178,10 @@ class Parts:
     # for offset and forecast_datetime
     @property
     def offset(self):
+        offset = constants.STEP_OFFSETS.get(self.step)
+        if offset is not None:
+            return offset
+
         v, u = self.step[:-1], self.step[-1]
         offset_value = int(v)
 
@@ -112,22 +195,26 @@ class Parts:
 
     @property
     def forecast_datetime(self):
-        return self.reference_datetime + self.offset
+        if self._forecast_datetime is None:
+            object.__setattr__(
+                self, "_forecast_datetime", self.reference_datetime + self.offset
+            )
+        return self._forecast_datetime
 
     @property
     def prefix(self) -> str | None:
-        if self.filename.count("/"):
-            prefix = self.filename.rsplit("/", 1)[0]
-            return prefix + "/"
-        return None
+        prefix, sep, _ = self.filename.rpartition("/")
+        return prefix + sep if sep else None
 
     @property
     def name(self):
-        return pathlib.Path(self.filename).name
+        return self.filename.rpartition("/")[2]
 
 
 def create_collection(
-    thumbnail=None, extra_fields: dict[str, Any] | None = None
+    thumbnail=None,
+    extra_fields: dict[str, Any] | None = None,
+    templates: dict[str, dict[str, Any]] | None = None,
 ) -> Collection:
     """Create a STAC Collection
 
@@ -137,6 +224,12 @@ def create_collection(
 
     See `Collection<https://pystac.readthedocs.io/en/latest/api.html#collection>`_.
 
+    Args:
+        thumbnail (str): URL for the collection thumbnail asset
+        extra_fields (dict): Extra fields for the collection
+        templates (dict): Templates of kerchunk indices, from `build_templates`,
+            stored under ``kerchunk:templates``
+
     Returns:
         Collection: STAC Collection object
     """
@@ -210,6 +303,8 @@ def create_collection(
 
     if extra_fields:
         collection.extra_fields.update(extra_fields)
+    if templates:
+        collection.extra_fields[refs.TEMPLATES_FIELD] = templates
 
     item_assets = {
         "data": pystac.extensions.item_assets.AssetDefinition(
@@ -223,7 +318,7 @@ def create_collection(
                 ),
             }
         ),
-  "index": pystac.extensions.item_assets.AssetDefinition(
+        "index": pystac.extensions.item_assets.AssetDefinition(
             {
                 "type": NDJSON_MEDIA_TYPE,
                 "roles": ["index"],
@@ -279,12 +374,181 @@ def group_assets(asset_hrefs: list[str], key=item_key):
     """
     Groups a list of asset HREFs according to which item they belong in.
     """
-    asset_hrefs = sorted(asset_hrefs, key=key)
-    grouped = itertools.groupby(asset_hrefs, key=key)
-    return grouped
+    # compute each key once, rather than in both sorted and groupby
+    keyed = sorted(((key(href), href) for href in asset_hrefs), key=_first)
+    for k, group in itertools.groupby(keyed, key=_first):
+        yield k, (href for _, href in group)
+
+
+_first = operator.itemgetter(0)
+
+
+def stream_assets(
+    asset_hrefs: Iterable[str],
+    split_by_step=False,
+    timeout: Optional[float] = None,
+) -> Iterator[tuple[tuple, list[str]]]:
+    """
+    Group a stream of asset HREFs into items, yielding each group once it's complete.
+
+    Unlike `group_assets`, this doesn't need the full listing up front. An item is
+    complete once a GRIB2 and an index file have been seen for each of its steps,
+    according to `constants.ITEM_STEPS`. Only the incomplete groups are kept in
+    memory.
+
+    Parameters
+    ----------
+    asset_hrefs: Iterable[str]
+        The HREFs, for example from ``fs.find`` on a bucket. They may arrive in any order.
+    split_by_step: bool
+        Whether each step is its own item (see `item_key_split_by_parts`).
+    timeout: float, optional
+        Yield incomplete groups once this many seconds have passed since their first
+        HREF. This is checked as HREFs arrive. Any remaining incomplete groups are
+        yielded at the end of the stream.
+
+    Yields
+    ------
+    tuple[tuple, list[str]]
+        The item key and the HREFs of the item, in the order they arrived.
+    """
+    # key -> (first seen, expected assets, seen assets, hrefs)
+    pending: dict[tuple, tuple[float, Optional[int], set, list[str]]] = {}
+
+    for href in asset_hrefs:
+        now = time.monotonic()
+        p = Parts.from_filename(href)
+        key: tuple = (p.reference_datetime, p.stream, p.type)
+        if split_by_step:
+            key += (p.offset,)
+        if key not in pending:
+            pending[key] = (now, _expected_assets(p, split_by_step), set(), [])
+        _, expected, seen, hrefs = pending[key]
+        seen.add((p.step, p.format))
+        hrefs.append(href)
+
+        if expected is not None and len(seen) >= expected:
+            del pending[key]
+            yield key, hrefs
+
+        if timeout is not None:
+            expired = [k for k, v in pending.items() if now - v[0] >= timeout]
+            for k in expired:
+                logger.warning("Yielding incomplete group %s after %ss", k, timeout)
+                yield k, pending.pop(k)[3]
+
+    for k, (_, _, _, hrefs) in pending.items():
+        logger.debug("Yielding incomplete group %s at end of stream", k)
+        yield k, hrefs
+
+
+def _expected_assets(part: Parts, split_by_step=False) -> Optional[int]:
+    """The number of (step, format) assets in the item of `part`, if known."""
+    if part.format not in ("grib2", "index"):
+        return None
+    steps = constants.ITEM_STEPS.get(
+        ("grib2", part.type, part.reference_datetime.strftime("%H"), part.stream)
+    )
+    if steps is None:
+        return None
+    # a grib2 and index file per step
+    return 2 if split_by_step else 2 * len(steps)
+
+
+# The (stream, type) of the products whose kerchunk indices are built by
+# default, and of every product with a combine rule
+DEFAULT_KERCHUNK_PRODUCTS = (("wave", "fc"),)
+ALL_KERCHUNK_PRODUCTS = tuple(constants.COMBINE_RULES)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ItemOptions:
+    """
+    How items are created, shared by `create_item`, `create_items`,
+    `update_items`, and their dictionary and async counterparts.
 
+    Those functions take an `ItemOptions`, and its fields as keyword arguments
+    overriding those of the options.
 
-def create_item(asset_hrefs: list[str], split_by_step=False, resolution: Optional[str] = None) -> Item:
+    Parameters
+    ----------
+    split_by_step: bool
+        Create an item per step of a forecast run, rather than per run.
+    resolution: str, optional
+        The resolution of the files, included in the item IDs.
+    use_index: bool
+        Whether to build the kerchunk indices from each GRIB2 file's ``.index``
+        sidecar, which reads only a single message per variable, rather than
+        scanning the whole GRIB2 file.
+    cache: KerchunkCache or bool
+        The cache for kerchunk indices. ``True`` uses the default on-disk cache
+        (see `cache.default_cache_dir`), and ``False``, the default, disables
+        caching.
+    references_href: str, optional
+        Write the kerchunk indices to files under this HREF, linked from the
+        item as ``references`` assets, rather than inlining them in the item's
+        ``kerchunk:indices``.
+    references_format: str
+        The format of the references files, ``"json"`` or ``"parquet"``.
+    templates: dict, optional
+        Templates of kerchunk indices, by `references.template_key`. The
+        kerchunk indices of an item with a template only hold the delta from
+        it (see `references.split_references`), and its assets name the
+        template in ``kerchunk:template``. Files written with
+        `references_href` always hold the full references.
+    datacube: bool
+        Whether to read the item's ``.index`` files (concurrently) and describe
+        its parameters, levels, ensemble members and steps with the datacube
+        extension.
+    filesystems: FileSystems, optional
+        The filesystems used to read the files. By default, filesystems are
+        shared by all the calls in a process, keeping their connections open.
+        Not used by the async functions.
+    processes: int, optional
+        Scan the messages of each GRIB2 file with this many processes, split by
+        the byte ranges in its ``.index`` file (see
+        `_kerchunk_helper_functions.scan_grib_parallel`). Not used with
+        `use_index`, nor by the async functions. With `create_items`, the files
+        of concurrent items share the pool, and with ``executor="process"``
+        each worker has a pool of its own.
+    kerchunk_products: tuple[tuple[str, str], ...]
+        The (stream, type) of the GRIB2 assets that get kerchunk indices, among
+        those of `constants.COMBINE_RULES`. Only wave forecasts by default; use
+        `ALL_KERCHUNK_PRODUCTS` for every product with a combine rule.
+    """
+
+    split_by_step: bool = False
+    resolution: Optional[str] = None
+    use_index: bool = False
+    cache: KerchunkCache | bool = False
+    references_href: Optional[str] = None
+    references_format: str = "json"
+    templates: Optional[dict[str, dict[str, Any]]] = None
+    datacube: bool = False
+    filesystems: Optional[FileSystems] = None
+    processes: Optional[int] = None
+    kerchunk_products: tuple[tuple[str, str], ...] = DEFAULT_KERCHUNK_PRODUCTS
+
+    @classmethod
+    def of(cls, options: Optional[ItemOptions] = None, **kwargs: Any) -> ItemOptions:
+        """`options`, or the default options, with the fields in `kwargs` replaced."""
+        if options is None:
+            return cls(**kwargs)
+        if not isinstance(options, cls):
+            raise TypeError(
+                f"options must be ItemOptions, not {type(options).__name__}"
+            )
+        return dataclasses.replace(options, **kwargs) if kwargs else options
+
+
+def create_item(
+    asset_hrefs: list[str],
+    split_by_step: Optional[bool] = None,
+    resolution: Optional[str] = None,
+    *,
+    options: Optional[ItemOptions] = None,
+    **kwargs: Any,
+) -> Item:
     """
     Create an item for the hrefs.
 
@@ -294,15 +558,571 @@ def create_item(asset_hrefs: list[str], split_by_step=False, resolution: Optiona
         The HREFs for the item's assets. These should all belong to the item, according
         to `item_key`. Use `group_assets` prior on a list of assets possibly belonging
         to multiple items.
+    split_by_step: bool, optional
+        Create an item per step of a forecast run, rather than per run.
+    resolution: str, optional
+        The resolution of the files, included in the item IDs.
+    options: ItemOptions, optional
+        How to create the item.
+    **kwargs
+        Fields of `ItemOptions`, like ``use_index=True``, overriding those of
+        `options`, like `split_by_step` and `resolution` do when given.
 
     Returns
     -------
     pystac.Item
     """
-    parts = [
-        Parts.from_filename(href, split_by_step=split_by_step, resolution=resolution) for href in asset_hrefs
+    options = ItemOptions.of(
+        options, **_given(split_by_step=split_by_step, resolution=resolution), **kwargs
+    )
+    parts = Parts.from_filenames(
+        asset_hrefs, split_by_step=options.split_by_step, resolution=options.resolution
+    )
+    with profiling.item(parts[0].item_id):
+        return _create_item_from_parts(parts, options)
+
+
+def create_item_dict(
+    asset_hrefs: list[str],
+    split_by_step: Optional[bool] = None,
+    resolution: Optional[str] = None,
+    *,
+    options: Optional[ItemOptions] = None,
+    **kwargs: Any,
+) -> dict[str, Any]:
+    """
+    Create an item for the hrefs as a dictionary.
+
+    This takes the same arguments as `create_item`, and returns the same item as
+    ``create_item(...).to_dict(include_self_link=False)``. The dictionary is
+    built directly, without the `pystac.Item` and the `pystac.Asset` of every
+    step, which is faster for bulk runs that only serialize the items (see
+    `create_item_dicts` and `write_item_dicts`).
+
+    Returns
+    -------
+    dict
+    """
+    options = ItemOptions.of(
+        options, **_given(split_by_step=split_by_step, resolution=resolution), **kwargs
+    )
+    parts = Parts.from_filenames(
+        asset_hrefs, split_by_step=options.split_by_step, resolution=options.resolution
+    )
+    with profiling.item(parts[0].item_id):
+        return _item_dict_from_parts(parts, options)
+
+
+def create_items(
+    asset_hrefs: Iterable[str],
+    *,
+    options: Optional[ItemOptions] = None,
+    workers: Optional[int] = None,
+    executor: str = "thread",
+    stream: bool = False,
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+) -> Iterator[Item]:
+    """
+    Create the items for many asset HREFs, using a pool of workers.
+
+    The HREFs are grouped into items with `group_assets`, and each item is
+    created by a worker. Items are yielded in the order of their `item_key`,
+    regardless of the number of workers, as soon as they (and all the items
+    before them) are done.
+
+    Parameters
+    ----------
+    asset_hrefs: Iterable[str]
+        The HREFs for the assets, possibly belonging to multiple items.
+    options: ItemOptions, optional
+        How to create the items. Like for `create_item`, its fields can be
+        overridden with keyword arguments.
+    workers: int, optional
+        The number of workers. Defaults to the number of CPUs.
+    executor: str
+        Either ``"thread"`` or ``"process"``. Scanning GRIB2 files is mostly CPU-bound,
+        so a process pool is typically faster when building kerchunk indices.
+    stream: bool
+        Group the HREFs with `stream_assets` instead, so that items are created
+        while `asset_hrefs` is still being listed. Items are then yielded in the
+        order their groups complete.
+    timeout: float, optional
+        With ``stream=True``, the timeout for incomplete groups.
+
+    Returns
+    -------
+    Iterator[pystac.Item]
+    """
+    options = ItemOptions.of(options, **kwargs)
+    dicts = _create_in_pool(
+        functools.partial(_create_item_dict, options=options),
+        asset_hrefs,
+        split_by_step=options.split_by_step,
+        workers=workers,
+        executor=executor,
+        stream=stream,
+        timeout=timeout,
+    )
+    for d in dicts:
+        yield Item.from_dict(d, preserve_dict=False)
+
+
+def create_item_dicts(
+    asset_hrefs: Iterable[str],
+    *,
+    options: Optional[ItemOptions] = None,
+    workers: Optional[int] = None,
+    executor: str = "thread",
+    stream: bool = False,
+    timeout: Optional[float] = None,
+    validate_sample: float = 0.01,
+    **kwargs: Any,
+) -> Iterator[dict[str, Any]]:
+    """
+    Create the items for many asset HREFs as dictionaries, using a pool of workers.
+
+    This is the bulk counterpart of `create_item_dict`: like `create_items`, but
+    the items are built and yielded as dictionaries, ready for `write_item_dicts`.
+
+    Parameters
+    ----------
+    validate_sample: float
+        The fraction of the items checked with `validate_item_dict`. Items are
+        sampled by their ID, so the same items are checked on every run.
+
+    Returns
+    -------
+    Iterator[dict]
+    """
+    options = ItemOptions.of(options, **kwargs)
+    create = functools.partial(
+        _create_fast_item_dict, options=options, validate_sample=validate_sample
+    )
+    return _create_in_pool(
+        create,
+        asset_hrefs,
+        split_by_step=options.split_by_step,
+        workers=workers,
+        executor=executor,
+        stream=stream,
+        timeout=timeout,
+    )
+
+
+def _create_in_pool(
+    create,
+    asset_hrefs: Iterable[str],
+    split_by_step=False,
+    workers: Optional[int] = None,
+    executor: str = "thread",
+    stream: bool = False,
+    timeout: Optional[float] = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Group `asset_hrefs` into items, and yield the item dictionaries returned by
+    ``create(hrefs)`` in a pool of workers, like `create_items`.
+    """
+    if executor == "thread":
+        pool_class: Any = concurrent.futures.ThreadPoolExecutor
+    elif executor == "process":
+        pool_class = concurrent.futures.ProcessPoolExecutor
+    else:
+        raise ValueError(f"Bad executor: {executor}. Must be 'thread' or 'process'.")
+
+    if stream:
+        grouped = stream_assets(
+            asset_hrefs, split_by_step=split_by_step, timeout=timeout
+        )
+    else:
+        key = item_key_split_by_parts if split_by_step else item_key
+        grouped = group_assets(list(asset_hrefs), key=key)
+    groups = (list(hrefs) for _, hrefs in grouped)
+
+    # Workers don't share the context of the recording, so they record to
+    # their own, and the records are passed on to it.
+    recorder = profiling.current()
+    if recorder is not None:
+        create = functools.partial(profiling.capture, create, memory=recorder.memory)
+
+    workers = workers or os.cpu_count() or 1
+    with pool_class(max_workers=workers) as pool:
+        for d in _map_ordered(pool, create, groups, window=2 * workers):
+            if recorder is not None:
+                d, records = d
+                for record in records:
+                    recorder.emit(record)
+            yield d
+
+
+def update_items(
+    prefix: str,
+    state: StateStore,
+    *,
+    options: Optional[ItemOptions] = None,
+    workers: Optional[int] = None,
+    executor: str = "thread",
+    **kwargs: Any,
+) -> Iterator[Item]:
+    """
+    Create the items under `prefix` that are new or changed since the last update.
+
+    The files under `prefix` are listed and grouped into items. An item is skipped
+    if `state` records that it was created from the same HREFs, with the same
+    ETag / size / modification time. The other items are created with
+    `create_items`, and recorded in `state` once the caller has consumed them.
+
+    Parameters
+    ----------
+    prefix: str
+        The directory or bucket prefix to list, e.g. ``az://ecmwf/20240101/``.
+    state: StateStore
+        The record of previously created items.
+    options: ItemOptions, optional
+        How to create the items, like for `create_items`.
+
+    Returns
+    -------
+    Iterator[pystac.Item]
+    """
+    options = ItemOptions.of(options, **kwargs)
+    split_by_step = options.split_by_step
+    fs, root = resolve_filesystems(options.filesystems).get(prefix)
+    tokens = {}
+    with profiling.phase("list"):
+        listing = fs.find(root, detail=True)
+    for path, info in listing.items():
+        href = fs.unstrip_protocol(path) if "://" in prefix else path
+        m = xpr.match(href.rpartition("/")[2])
+        if m and m.group("format") in ("grib2", "index"):
+            tokens[href] = file_token(info)
+
+    key = item_key_split_by_parts if split_by_step else item_key
+    changed: dict[str, dict[str, Any]] = {}
+    n = 0
+    for _, group in group_assets(list(tokens), key=key):
+        hrefs = list(group)
+        n += 1
+        item_id = Parts.from_filename(
+            hrefs[0], split_by_step=split_by_step, resolution=options.resolution
+        ).item_id
+        assets = {href: tokens[href] for href in hrefs}
+        if not state.is_current(item_id, assets):
+            changed[item_id] = assets
+
+    logger.info("%d of %d items under %s are new or changed", len(changed), n, prefix)
+    items = create_items(
+        [href for assets in changed.values() for href in assets],
+        options=options,
+        workers=workers,
+        executor=executor,
+    )
+    for item in items:
+        yield item
+        state.put(item, changed[item.id])
+
+
+def _map_ordered(pool, func, iterable, window):
+    """
+    Like ``pool.map``, but with at most `window` tasks submitted at a time.
+
+    ``Executor.map`` consumes its whole input before returning, which would
+    wait for the end of a streaming listing.
+    """
+    futures: collections.deque = collections.deque()
+    for x in iterable:
+        futures.append(pool.submit(func, x))
+        while len(futures) >= window or (futures and futures[0].done()):
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+async def create_item_async(
+    asset_hrefs: list[str],
+    *,
+    options: Optional[ItemOptions] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    **kwargs: Any,
+) -> Item:
+    """
+    Create an item for the hrefs, reading remote files asynchronously.
+
+    This is the async counterpart of `create_item`. The kerchunk indices for
+    the item's GRIB2 assets are built concurrently, and with ``use_index=True``
+    the reads of ``.index`` files and GRIB2 messages use fsspec's async
+    filesystems (HTTP, Azure Blob Storage, S3, ...).
+
+    Parameters
+    ----------
+    semaphore: asyncio.Semaphore, optional
+        Bounds the number of concurrent reads. Share one semaphore between
+        calls to bound the total.
+
+    Returns
+    -------
+    pystac.Item
+    """
+    options = ItemOptions.of(options, **kwargs)
+    semaphore = semaphore or asyncio.Semaphore(khf.DEFAULT_CONCURRENCY)
+    parts = Parts.from_filenames(
+        asset_hrefs, split_by_step=options.split_by_step, resolution=options.resolution
+    )
+    kerchunk_parts = [p for p in parts if _has_kerchunk_indices(p, options)]
+    index_hrefs = [
+        p.filename for p in parts if options.datacube and p.format == "index"
     ]
-    return _create_item_from_parts(parts, split_by_step=split_by_step)
+    indices, indexes = await asyncio.gather(
+        asyncio.gather(
+            *[
+                khf.get_kerchunk_indices_async(
+                    p,
+                    use_index=options.use_index,
+                    cache=options.cache,
+                    semaphore=semaphore,
+                )
+                for p in kerchunk_parts
+            ]
+        ),
+        asyncio.gather(*[_read_index_async(href, semaphore) for href in index_hrefs]),
+    )
+    return _create_item_from_parts(
+        parts,
+        options,
+        kerchunk_indices={p.filename: d for p, d in zip(kerchunk_parts, indices)},
+        indexes=indexes,
+    )
+
+
+async def _read_index_async(href: str, semaphore: asyncio.Semaphore) -> IndexFile:
+    async with semaphore:
+        return await asyncio.to_thread(IndexFile.from_href, href)
+
+
+async def create_items_async(
+    asset_hrefs: Iterable[str],
+    *,
+    options: Optional[ItemOptions] = None,
+    max_concurrency: int = khf.DEFAULT_CONCURRENCY,
+    **kwargs: Any,
+) -> list[Item]:
+    """
+    Create the items for many asset HREFs concurrently, on a single event loop.
+
+    The HREFs are grouped with `group_assets` and the items are returned in
+    the order of their `item_key`. At most `max_concurrency` reads are in
+    flight at once.
+
+    Returns
+    -------
+    list[pystac.Item]
+    """
+    options = ItemOptions.of(options, **kwargs)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    key = item_key_split_by_parts if options.split_by_step else item_key
+    groups = [list(hrefs) for _, hrefs in group_assets(list(asset_hrefs), key=key)]
+    return await asyncio.gather(
+        *[
+            create_item_async(hrefs, options=options, semaphore=semaphore)
+            for hrefs in groups
+        ]
+    )
+
+
+def build_templates(items: Iterable[Item]) -> dict[str, dict[str, Any]]:
+    """
+    Build templates of kerchunk indices from items with full kerchunk indices.
+
+    Returns
+    -------
+    dict: The templates by `references.template_key`, for `create_collection`
+        and the `templates` argument of `create_item`.
+    """
+    indices = collections.defaultdict(list)
+    for item in items:
+        key = refs.template_key(
+            item.properties["ecmwf:stream"], item.properties["ecmwf:type"]
+        )
+        for asset in item.assets.values():
+            fields = asset.extra_fields
+            if fields.get("kerchunk:indices") and refs.TEMPLATE_FIELD not in fields:
+                indices[key].append(fields["kerchunk:indices"])
+    return {key: refs.build_template(value) for key, value in indices.items()}
+
+
+def create_run_references(
+    items: Item | Iterable[Item], templates: Optional[dict[str, dict[str, Any]]] = None
+) -> dict[str, Any]:
+    """
+    Combine the kerchunk indices of a forecast run into a single reference set.
+
+    The per-step kerchunk indices already stored with the items (inline, in
+    ``references`` sidecar JSON files, or as deltas from a template) are
+    concatenated along ``step``, so that the whole run opens as one dataset.
+    No GRIB2 file is scanned.
+
+    Parameters
+    ----------
+    items: pystac.Item or Iterable[pystac.Item]
+        An item with one asset per step, or the items of one run created with
+        ``split_by_step=True``.
+    templates: dict, optional
+        The templates for items created with `templates`.
+
+    Returns
+    -------
+    dict: The kerchunk references of the run.
+    """
+    if isinstance(items, Item):
+        items = [items]
+
+    steps = []
+    for item in items:
+        for key, asset in item.assets.items():
+            fields = asset.extra_fields
+            if "references" in (asset.roles or []):
+                if asset.media_type != refs.JSON_MEDIA_TYPE:
+                    raise ValueError(
+                        f"Can't combine {asset.media_type} references of {item.id}"
+                    )
+                with fsspec.open(asset.href) as f:
+                    indices = json.load(f)
+            elif fields.get("kerchunk:indices"):
+                indices = fields["kerchunk:indices"]
+            else:
+                continue
+
+            if refs.TEMPLATE_FIELD in fields:
+                indices = refs.merge_references(
+                    (templates or {})[fields[refs.TEMPLATE_FIELD]], indices
+                )
+            step = fields.get("ecmwf:step", item.properties.get("ecmwf:step"))
+            if step is None:
+                raise ValueError(
+                    f"Asset {key} of {item.id} doesn't have an ecmwf:step."
+                )
+            offset = constants.STEP_OFFSETS.get(step, datetime.timedelta.max)
+            steps.append((offset, key, indices))
+
+    if not steps:
+        raise ValueError("The items don't have any kerchunk indices.")
+    steps.sort(key=operator.itemgetter(0, 1))
+    return khf.combine_steps([indices for _, _, indices in steps])
+
+
+def _given(**kwargs: Any) -> dict[str, Any]:
+    """The arguments in `kwargs` that were given, i.e. aren't None."""
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+def _create_item_dict(asset_hrefs: list[str], options: ItemOptions) -> dict[str, Any]:
+    # Workers return dictionaries, which are cheaper to send between processes.
+    item = create_item(asset_hrefs, options=options)
+    with profiling.phase("serialize", item_id=item.id):
+        return item.to_dict(include_self_link=False)
+
+
+def _create_fast_item_dict(
+    asset_hrefs: list[str], options: ItemOptions, validate_sample: float = 0.0
+) -> dict[str, Any]:
+    d = create_item_dict(asset_hrefs, options=options)
+    if _is_sampled(d["id"], validate_sample):
+        with profiling.phase("validate", item_id=d["id"]):
+            validate_item_dict(d)
+    return d
+
+
+def _is_sampled(item_id: str, rate: float) -> bool:
+    # A hash of the ID rather than a random number, so that samples are
+    # reproducible.
+    return zlib.crc32(item_id.encode()) < rate * 2**32
+
+
+def validate_item_dict(d: dict[str, Any]) -> None:
+    """
+    Check that pystac loads the item dictionary `d`, and serializes it back to `d`.
+
+    Raises
+    ------
+    ValueError: If pystac can't load the item, or it differs once loaded.
+    """
+    try:
+        item = Item.from_dict(d)
+    except Exception as e:
+        raise ValueError(f"pystac can't load the item {d.get('id')}: {e}") from e
+    roundtrip = item.to_dict(include_self_link=False)
+    if roundtrip != d:
+        keys = sorted(
+            k for k in roundtrip.keys() | d.keys() if roundtrip.get(k) != d.get(k)
+        )
+        raise ValueError(f"The item {d['id']} differs once loaded by pystac, in {keys}")
+
+
+def write_items(items: Iterable[Item], destination: str) -> int:
+    """
+    Write items to `destination` as they're produced.
+
+    If `destination` ends with ``.ndjson`` the items are written as newline-delimited
+    JSON to that file. Otherwise, each item is saved as ``<item.id>.json`` in the
+    `destination` directory.
+
+    Returns
+    -------
+    int: The number of items written.
+    """
+    n = 0
+    if destination.endswith(".ndjson"):
+        with fsspec.open(destination, "w") as f:
+            for item in items:
+                with profiling.phase("write", item_id=item.id):
+                    f.write(json.dumps(item.to_dict(include_self_link=False)) + "\n")
+                n += 1
+    else:
+        for item in items:
+            with profiling.phase("write", item_id=item.id):
+                item.save_object(
+                    include_self_link=False,
+                    dest_href=os.path.join(destination, f"{item.id}.json"),
+                )
+            n += 1
+    return n
+
+
+def write_item_dicts(items: Iterable[dict[str, Any]], destination: str) -> int:
+    """
+    Write item dictionaries to `destination` as they're produced.
+
+    Like `write_items`, to a ``.ndjson`` file or as ``<id>.json`` files in a
+    directory. The items are encoded as compact JSON with ``orjson`` when it's
+    installed (the ``fast`` extra), or the standard library otherwise.
+
+    Returns
+    -------
+    int: The number of items written.
+    """
+    n = 0
+    if destination.endswith(".ndjson"):
+        with fsspec.open(destination, "wb") as f:
+            for d in items:
+                with profiling.phase("write", item_id=d["id"]):
+                    f.write(_dumps(d) + b"\n")
+                n += 1
+    else:
+        for d in items:
+            with profiling.phase("write", item_id=d["id"]):
+                with fsspec.open(
+                    os.path.join(destination, f"{d['id']}.json"), "wb"
+                ) as f:
+                    f.write(_dumps(d))
+            n += 1
+    return n
+
+
+def _dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
 
 
 def create_item_from_representative_asset(asset_href: str) -> Item:
@@ -331,7 +1151,84 @@ def create_item_from_representative_asset(asset_href: str) -> Item:
     return _create_item_from_parts(siblings)
 
 
-def _create_item_from_parts(parts: list[Parts], split_by_step=False) -> Item:
+def _create_item_from_parts(
+    parts: list[Parts],
+    options: ItemOptions = ItemOptions(),
+    kerchunk_indices: Optional[dict[str, dict]] = None,
+    indexes: Optional[list[IndexFile]] = None,
+) -> Item:
+    """
+    Create the item for `parts`.
+
+    `kerchunk_indices` optionally maps the filename of GRIB2 assets to
+    already-built kerchunk indices. Any others are built here. Likewise, with
+    ``options.datacube``, `indexes` are the already-read ``.index`` files of
+    the item.
+    """
+    part = _check_parts(parts)
+    item = pystac.Item(
+        part.item_id,
+        geometry=dict(_GEOMETRY),
+        bbox=list(_BBOX),
+        datetime=part.datetime,
+        properties=_item_properties(parts, options.split_by_step),
+    )
+
+    if options.datacube:
+        DatacubeExtension.ext(item, add_if_missing=True)
+        item.properties.update(
+            _datacube_properties(parts, indexes, filesystems=options.filesystems)
+        )
+
+    assets = _item_assets(parts, item.id, options, kerchunk_indices=kerchunk_indices)
+    for key, asset in assets:
+        item.add_asset(key, pystac.Asset.from_dict(asset))
+
+    return item
+
+
+def _item_dict_from_parts(
+    parts: list[Parts],
+    options: ItemOptions = ItemOptions(),
+    kerchunk_indices: Optional[dict[str, dict]] = None,
+    indexes: Optional[list[IndexFile]] = None,
+) -> dict[str, Any]:
+    """
+    Create the item for `parts` as a dictionary.
+
+    This is equal to ``_create_item_from_parts(...).to_dict(include_self_link=False)``,
+    but builds the dictionary directly rather than a `pystac.Item` and its
+    `pystac.Asset` objects.
+    """
+    part = _check_parts(parts)
+    properties = _item_properties(parts, options.split_by_step)
+    stac_extensions = []
+    if options.datacube:
+        stac_extensions.append(DatacubeExtension.get_schema_uri())
+        properties.update(
+            _datacube_properties(parts, indexes, filesystems=options.filesystems)
+        )
+    properties["datetime"] = datetime_to_str(part.datetime)
+
+    assets = _item_assets(
+        parts, part.item_id, options, kerchunk_indices=kerchunk_indices
+    )
+    # In the order of `pystac.Item.to_dict`.
+    return {
+        "type": "Feature",
+        "stac_version": pystac.get_stac_version(),
+        "stac_extensions": stac_extensions,
+        "id": part.item_id,
+        "geometry": dict(_GEOMETRY),
+        "bbox": list(_BBOX),
+        "properties": properties,
+        "links": [],
+        "assets": dict(assets),
+    }
+
+
+def _check_parts(parts: list[Parts]) -> Parts:
+    """The first of `parts`, after checking that they all belong to its item."""
     part = parts[0]
     for i, other in enumerate(parts):
         if part.item_id != other.item_id:
@@ -339,85 +1236,125 @@ def _create_item_from_parts(parts: list[Parts], split_by_step=False) -> Item:
                 f"Asset {i} has different Item ID ({part.item_id} != {other.item_id}). "
                 f"URL = {part.filename}"
             )
+    return part
 
-    geometry = {
-        "type": "Polygon",
-        "coordinates": (
-            (
-                (180.0, -90.0),
-                (180.0, 90.0),
-                (-180.0, 90.0),
-                (-180.0, -90.0),
-                (180.0, -90.0),
-            ),
-        ),
-    }
-    bbox = [-180.0, -90.0, 180.0, 90.0]
 
-    item = pystac.Item(
-        part.item_id,
-        geometry=geometry,
-        bbox=bbox,
-        datetime=part.datetime,
-        properties={},
-    )
-
-    item.properties["ecmwf:stream"] = part.stream
-    item.properties["ecmwf:type"] = part.type
-    item.properties["ecmwf:reference_datetime"] = (
-        part.reference_datetime.isoformat() + "Z"
-    )
-    item.properties["ecmwf:resolution"] = part.resolution
-    item.properties["ecmwf:forecast_datetime"] = (
-        part.forecast_datetime.isoformat() + "Z"
-    )
-
-    fs = fsspec.filesystem("")
-    fs.clear_instance_cache()
+def _item_properties(parts: list[Parts], split_by_step=False) -> dict[str, Any]:
+    """The properties of the item for `parts`, except ``datetime``."""
+    part = parts[0]
+    properties = {
+        "ecmwf:stream": part.stream,
+        "ecmwf:type": part.type,
+        "ecmwf:reference_datetime": part.reference_datetime.isoformat() + "Z",
+        "ecmwf:resolution": part.resolution,
+        "ecmwf:forecast_datetime": part.forecast_datetime.isoformat() + "Z",
+    }
 
     if split_by_step:
-        item.properties["ecmwf:step"] = part.step
+        properties["ecmwf:step"] = part.step
     else:
         offset = max(p.offset for p in parts)
-        item.properties["start_datetime"] = part.reference_datetime.isoformat() + "Z"
-        item.properties["end_datetime"] = (
+        properties["start_datetime"] = part.reference_datetime.isoformat() + "Z"
+        properties["end_datetime"] = (
             part.reference_datetime + offset
         ).isoformat() + "Z"
+    return properties
+
+
+def _datacube_properties(
+    parts: list[Parts],
+    indexes: Optional[list[IndexFile]] = None,
+    filesystems: Optional[FileSystems] = None,
+) -> dict[str, Any]:
+    """The datacube properties of the item for `parts`, reading its indexes if needed."""
+    with profiling.phase("datacube"):
+        if indexes is None:
+            indexes = read_indexes(
+                [p.filename for p in parts if p.format == "index"],
+                filesystems=filesystems,
+            )
+        return datacube_properties(indexes)
+
+
+def _item_assets(
+    parts: list[Parts],
+    item_id: str,
+    options: ItemOptions,
+    kerchunk_indices: Optional[dict[str, dict]] = None,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    """
+    Yield the key and dictionary of each asset of the item for `parts`, in the
+    form of `pystac.Asset.to_dict`, building the kerchunk indices as needed.
+    """
+    kerchunk_indices = kerchunk_indices or {}
+    part = parts[0]
+    template_key = refs.template_key(part.stream, part.type)
+    split_by_step = options.split_by_step
+    references_href = options.references_href
+    template = (options.templates or {}).get(template_key)
 
     for p in parts:
+        try:
+            media_type, roles = _ASSET_FORMATS[p.format]
+        except KeyError:
+            raise ValueError(f"Bad extension: {p.format}") from None
+
+        indices: Optional[dict[str, Any]] = None
         if p.format == "grib2":
-            media_type = GRIB2_MEDIA_TYPE
-            roles = ["data"]
-            if ((p.stream == "wave") & (p.type == "fc")):
-                kerchunk_indices = khf.get_kerchunk_indices(p)
+            if p.filename in kerchunk_indices:
+                indices = kerchunk_indices[p.filename]
+            elif _has_kerchunk_indices(p, options):
+                indices = khf.get_kerchunk_indices(
+                    p,
+                    use_index=options.use_index,
+                    cache=options.cache,
+                    filesystems=options.filesystems,
+                    processes=options.processes,
+                )
             else:
-                kerchunk_indices = {}
-        elif p.format == "index":
-            media_type = NDJSON_MEDIA_TYPE
-            roles = ["index"]
-            kerchunk_indices = None
-        elif p.format == "bufr":
-            media_type = None
-            roles = ["data"]
-            kerchunk_indices = None
+                indices = {}
+
+        extra_fields: dict[str, Any] = {} if split_by_step else {"ecmwf:step": p.step}
+        # Sidecars hold the full references, so that they open on their own.
+        # Only inline indices are split from the template.
+        if indices and references_href is not None:
+            key = "references" if split_by_step else f"{p.step}-references"
+            href = refs.references_href(
+                references_href, item_id, key, format=options.references_format
+            )
+            with profiling.phase("references"):
+                refs_media_type = refs.write_references(
+                    indices, href, format=options.references_format
+                )
+            yield key, {
+                "href": href,
+                "type": refs_media_type,
+                "title": "Kerchunk references",
+                **extra_fields,
+                "roles": ["references"],
+            }
         else:
-            raise ValueError(f"Bad extension: {p.format}")
-
-        item.add_asset(
-            p.asset_id,
-            pystac.Asset(
-                p.filename,
-                media_type=media_type,
-                roles=roles,
-                extra_fields={"ecmwf:step": p.step, "kerchunk:indices": kerchunk_indices} if not split_by_step else {"kerchunk:indices": kerchunk_indices},
-            ),
-        )
-
-    return item
-
-
-def _assets_key(combination):
-    return combination[:4]
+            if indices and template is not None:
+                indices = refs.split_references(indices, template)
+                extra_fields[refs.TEMPLATE_FIELD] = template_key
+            extra_fields["kerchunk:indices"] = indices
+
+        asset: dict[str, Any] = {"href": p.filename}
+        if media_type is not None:
+            asset["type"] = media_type
+        asset.update(extra_fields)
+        asset["roles"] = list(roles)
+        yield p.asset_id, asset
+
+
+def _has_kerchunk_indices(part: Parts, options: ItemOptions) -> bool:
+    """Whether kerchunk indices are built for the GRIB2 asset `part`."""
+    product = (part.stream, part.type)
+    return (
+        part.format == "grib2"
+        and product in options.kerchunk_products
+        and product in constants.COMBINE_RULES
+    )
 
 
 def list_sibling_assets(filename) -> list[Parts]:
@@ -433,23 +1370,22 @@ def list_sibling_assets(filename) -> list[Parts]:
     """
     p = Parts.from_filename(filename)
 
-    # mypy failing on python 3.7
-    combinations = constants.get_combinations()  # type: ignore
-    d = {
-        k: list(v) for k, v in itertools.groupby(combinations, key=_assets_key)
-    }  # type: ignore
-    combos = list(d[p.format, p.type, p.reference_datetime.strftime("%H"), p.stream])
-    prefix = p.prefix or ""
-
-    other_files = [
-        f"{prefix}{p.reference_datetime:%Y%m%d%H}0000-{combo.step}-{combo.stream}"
-        f"-{combo.type}.{combo.format}"
-        for combo in combos
+    steps = constants.ITEM_STEPS[
+        p.format, p.type, p.reference_datetime.strftime("%H"), p.stream
+    ]
+    stem = f"{p.prefix or ''}{p.reference_datetime:%Y%m%d%H}0000-"
+    suffix = f"-{p.stream}-{p.type}."
+    formats = [p.format, "index"] if p.format == "grib2" else [p.format]
+
+    return [
+        Parts(
+            reference_datetime=p.reference_datetime,
+            stream=p.stream,
+            step=step,
+            type=p.type,
+            format=fmt,
+            filename=f"{stem}{step}{suffix}{fmt}",
+        )
+        for step in steps
+        for fmt in formats
     ]
-
-    if p.format == "grib2":
-        other_files.extend([file.rsplit(".", 1)[0] + ".index" for file in other_files])
-    parts = [Parts.from_filename(other_file) for other_file in other_files]
-    parts = sorted(parts, key=operator.attrgetter("step"))
-
-    return parts
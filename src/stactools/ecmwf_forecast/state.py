@@ -0,0 +1,88 @@
+"""
+A local record of the items that have been created, for incremental updates.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import sqlite3
+from typing import Any, Optional
+
+import pystac
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    assets TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    updated TEXT NOT NULL
+)
+"""
+
+
+class StateStore:
+    """
+    Records, per item, the assets it was created from and a checksum of the item.
+
+    The assets are a mapping of HREF to the file's ETag / size / modification
+    time (see `cache.file_token`), so a changed file marks its item as changed.
+    The state is stored in a SQLite database at `path`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        (n,) = self._connection.execute("SELECT COUNT(*) FROM items").fetchone()
+        return n
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.get(item_id) is not None
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get(self, item_id: str) -> Optional[dict[str, Any]]:
+        """The recorded ``assets``, ``checksum`` and ``updated`` time for `item_id`."""
+        row = self._connection.execute(
+            "SELECT assets, checksum, updated FROM items WHERE item_id = ?", (item_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        assets, checksum, updated = row
+        return {"assets": json.loads(assets), "checksum": checksum, "updated": updated}
+
+    def is_current(self, item_id: str, assets: dict[str, Any]) -> bool:
+        """Whether `item_id` was created from exactly these `assets`."""
+        record = self.get(item_id)
+        return record is not None and record["assets"] == assets
+
+    def put(self, item: pystac.Item, assets: dict[str, Any]) -> None:
+        """Record that `item` was created from `assets`."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)",
+            (
+                item.id,
+                json.dumps(assets, sort_keys=True),
+                item_checksum(item),
+                datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            ),
+        )
+        self._connection.commit()
+
+
+def item_checksum(item: pystac.Item) -> str:
+    """A SHA-256 checksum of the item's JSON."""
+    d = item.to_dict(include_self_link=False)
+    return hashlib.sha256(json.dumps(d, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,67 @@
+import click
+import pytest
+
+from stactools.ecmwf_forecast import cache
+from stactools.ecmwf_forecast.commands import create_ecmwfforecast_command
+
+from .synthetic import PRODUCTS, write_grib2
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the default kerchunk cache out of the user's cache directory."""
+    directory = str(tmp_path / "cache")
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, directory)
+    cache._cache_for.cache_clear()
+    yield directory
+    cache._cache_for.cache_clear()
+
+
+def write_hrefs(
+    directory, dates=("20231019",), steps=(0,), stream="wave", type="fc", messages=None
+):
+    """
+    Write a synthetic GRIB2 file and its ``.index`` file for each date and step,
+    and return their HREFs: ``[grib2, index, grib2, index, ...]``, by date then
+    step.
+
+    The messages default to those of ``synthetic.PRODUCTS[stream, type]``.
+    """
+    if messages is None:
+        messages = PRODUCTS[stream, type]
+    hrefs = []
+    for date in dates:
+        for step in steps:
+            href = str(directory / f"{date}000000-{step}h-{stream}-{type}.grib2")
+            write_grib2(href, messages, stream=stream, type=type, date=date, step=step)
+            hrefs.extend([href, href.replace(".grib2", ".index")])
+    return hrefs
+
+
+@pytest.fixture
+def hrefs_options():
+    """The `write_hrefs` arguments of `hrefs`; override it for a whole module."""
+    return {}
+
+
+@pytest.fixture
+def hrefs(request, tmp_path, hrefs_options):
+    """
+    The HREFs of synthetic GRIB2 files and their ``.index`` files, in `tmp_path`.
+
+    A single wave forecast by default. Parametrize it indirectly with a dict of
+    `write_hrefs` arguments, or override `hrefs_options`.
+    """
+    return write_hrefs(tmp_path, **{**hrefs_options, **getattr(request, "param", {})})
+
+
+@pytest.fixture
+def cli():
+    """A command group with the ``ecmwf-forecast`` commands."""
+
+    @click.group()
+    def cli():
+        pass
+
+    create_ecmwfforecast_command(cli)
+    return cli
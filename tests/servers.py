@@ -0,0 +1,67 @@
+"""
+A local HTTP server for tests reading files with range requests.
+"""
+
+import contextlib
+import http.server
+import os
+import re
+import threading
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve files, honoring single ``Range`` requests like blob storage does."""
+
+    requests: list = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_file(head=True)
+
+    def do_GET(self):
+        self.send_file()
+
+    def send_file(self, head=False):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(data)
+            body = data[start:end]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.requests.append((self.command, self.path, len(body)))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+@contextlib.contextmanager
+def serve(directory):
+    """Serve `directory` over HTTP, yielding the base URL."""
+    RangeRequestHandler.requests = []
+
+    def handler(*args, **kwargs):
+        return RangeRequestHandler(*args, directory=str(directory), **kwargs)
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
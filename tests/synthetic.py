@@ -0,0 +1,188 @@
+"""
+Write small synthetic GRIB2 files and their ``.index`` sidecars.
+
+The files mimic the layout of the ECMWF open data products (one file per
+step, one message per parameter / level / ensemble member) on a tiny grid so
+that tests can run without network access.
+"""
+
+import json
+import os
+
+import eccodes
+import numpy as np
+
+# 180 grid points, regularly spaced. Enough that kerchunk references the values
+# rather than inlining them.
+GRID = {
+    "Ni": 18,
+    "Nj": 10,
+    "latitudeOfFirstGridPointInDegrees": 90,
+    "latitudeOfLastGridPointInDegrees": -90,
+    "longitudeOfFirstGridPointInDegrees": -180,
+    "longitudeOfLastGridPointInDegrees": 160,
+    "iDirectionIncrementInDegrees": 20,
+    "jDirectionIncrementInDegrees": 20,
+}
+
+LEVTYPES = {"sfc": "surface", "msl": "meanSea", "pl": "isobaricInhPa"}
+
+
+def encode_message(
+    param,
+    levtype="sfc",
+    levelist=None,
+    number=None,
+    date="20231019",
+    time="0000",
+    step=0,
+) -> bytes:
+    sample = "regular_ll_pl_grib2" if levtype == "pl" else "regular_ll_sfc_grib2"
+    h = eccodes.codes_grib_new_from_samples(sample)
+    try:
+        if number is not None:
+            eccodes.codes_set(h, "productDefinitionTemplateNumber", 1)
+            eccodes.codes_set(h, "perturbationNumber", int(number))
+            eccodes.codes_set(h, "numberOfForecastsInEnsemble", 50)
+        eccodes.codes_set_key_vals(h, GRID)
+        eccodes.codes_set(h, "dataDate", int(date))
+        eccodes.codes_set(h, "dataTime", int(time))
+        eccodes.codes_set(h, "typeOfLevel", LEVTYPES[levtype])
+        if levelist is not None:
+            eccodes.codes_set(h, "level", int(levelist))
+        eccodes.codes_set(h, "shortName", param)
+        eccodes.codes_set(h, "stepRange", str(step))
+        seed = sum(map(ord, f"{param}{levelist}{number}{step}"))
+        values = np.random.default_rng(seed).random(GRID["Ni"] * GRID["Nj"])
+        eccodes.codes_set_values(h, values)
+        return eccodes.codes_get_message(h)
+    finally:
+        eccodes.codes_release(h)
+
+
+def write_grib2(
+    path, messages, stream="wave", type="fc", date="20231019", time="0000", step=0
+):
+    """
+    Write ``messages`` to a GRIB2 file at ``path``, and the matching ``.index`` file.
+
+    Each message is a dict with a ``param`` and optional ``levtype``, ``levelist``,
+    ``number``, ``step`` (overriding `step`) and ``type`` (of the index entry).
+    Returns the list of index entries.
+    """
+    path = str(path)
+    index_path = path.rsplit(".", 1)[0] + ".index"
+    entries = []
+    offset = 0
+    with open(path, "wb") as f:
+        for message in messages:
+            fields = {k: v for k, v in message.items() if k != "type"}
+            data = encode_message(
+                **{"date": date, "time": time, "step": step, **fields}
+            )
+            f.write(data)
+            entry = {
+                "domain": "g",
+                "date": date,
+                "time": time,
+                "expver": "0001",
+                "class": "od",
+                "type": message.get("type", "pf" if message.get("number") else type),
+                "stream": stream,
+                "step": str(message.get("step", step)),
+                "levtype": message.get("levtype", "sfc"),
+                "param": message["param"],
+            }
+            for key in ("levelist", "number"):
+                if message.get(key) is not None:
+                    entry[key] = str(message[key])
+            entry["_offset"] = offset
+            entry["_length"] = len(data)
+            entries.append(entry)
+            offset += len(data)
+
+    with open(index_path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+    return entries
+
+
+def _members(messages, numbers=(0, 1, 2)):
+    return [
+        {**message, "number": number, "type": "cf" if number == 0 else "pf"}
+        for message in messages
+        for number in numbers
+    ]
+
+
+# Representative messages of each (stream, type) in `constants.COMBINE_RULES`
+PRODUCTS = {
+    ("oper", "fc"): [
+        {"param": "msl", "levtype": "msl"},
+        {"param": "2t", "levtype": "sfc"},
+        *[
+            {"param": param, "levtype": "pl", "levelist": level}
+            for param in ["t", "u"]
+            for level in [1000, 850, 500]
+        ],
+    ],
+    ("enfo", "ef"): _members(
+        [
+            {"param": "2t", "levtype": "sfc"},
+            *[
+                {"param": "t", "levtype": "pl", "levelist": level}
+                for level in [1000, 850]
+            ],
+        ]
+    ),
+    ("enfo", "ep"): [
+        {"param": param, "levtype": "sfc", "step": step}
+        for param in ["2t", "10u"]
+        for step in [240, 360]
+    ],
+    ("waef", "ef"): _members([{"param": "swh", "levtype": "msl"}]),
+    ("waef", "ep"): [
+        {"param": "swh", "levtype": "msl", "step": step} for step in [240, 360]
+    ],
+    ("wave", "fc"): [
+        {"param": "swh", "levtype": "msl"},
+        {"param": "mwp", "levtype": "msl"},
+    ],
+}
+PRODUCTS[("scda", "fc")] = PRODUCTS[("oper", "fc")]
+PRODUCTS[("scwv", "fc")] = PRODUCTS[("wave", "fc")]
+
+
+def write_combinations(directory, combinations=None, date="20231019"):
+    """
+    Write a GRIB2 file and its ``.index`` for each of `combinations`, by default
+    every entry of `constants.get_combinations`, with the messages of `PRODUCTS`.
+
+    The files are laid out like the ECMWF open data, under
+    ``{directory}/{date}/{time}z/0p4-beta/{stream}/``. Returns the HREFs of the
+    GRIB2 files.
+    """
+    from stactools.ecmwf_forecast import constants
+
+    if combinations is None:
+        combinations = constants.get_combinations()
+    hrefs = []
+    for combination in combinations:
+        prefix = f"{directory}/{date}/{combination.reference_time}z/0p4-beta/{combination.stream}"
+        os.makedirs(prefix, exist_ok=True)
+        href = (
+            f"{prefix}/{date}{combination.reference_time}0000-{combination.step}-"
+            f"{combination.stream}-{combination.type}.grib2"
+        )
+        write_grib2(
+            href,
+            PRODUCTS[combination.stream, combination.type],
+            stream=combination.stream,
+            type=combination.type,
+            date=date,
+            time=f"{combination.reference_time}00",
+            step=int(combination.step[:-1]),
+        )
+        hrefs.append(href)
+    return hrefs
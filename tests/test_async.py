@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast.cache import KerchunkCache
+from stactools.ecmwf_forecast.index import IndexFile
+
+from .servers import RangeRequestHandler, serve
+
+
+@pytest.fixture
+def hrefs_options():
+    return {"steps": [0, 3]}
+
+
+@pytest.fixture
+def urls(hrefs, tmp_path):
+    """The HREFs of the synthetic files, served over HTTP."""
+    with serve(tmp_path) as url:
+        yield [href.replace(str(tmp_path), url) for href in hrefs]
+
+
+@pytest.mark.parametrize("use_index", [True, False])
+def test_create_item_async(urls, use_index):
+    result = asyncio.run(stac.create_item_async(urls, use_index=use_index, cache=False))
+    expected = stac.create_item(urls, use_index=use_index, cache=False)
+    assert result.to_dict() == expected.to_dict()
+    refs = result.assets["3h-grib2"].extra_fields["kerchunk:indices"]["refs"]
+    assert refs["swh/0.0.0"][0] == urls[2]
+
+
+def test_create_item_async_reads_index(urls):
+    asyncio.run(stac.create_item_async(urls, use_index=True, cache=False))
+    gets = [r for r in RangeRequestHandler.requests if r[0] == "GET"]
+    grib2 = [r for r in gets if r[1].endswith(".grib2")]
+    # the adjacent messages of each file are read with a single request
+    assert len(grib2) == 2
+    assert len([r for r in gets if r[1].endswith(".index")]) == 2
+
+
+def test_create_items_async(urls):
+    items = asyncio.run(
+        stac.create_items_async(
+            urls, split_by_step=True, use_index=True, cache=False, max_concurrency=2
+        )
+    )
+    assert [item.id for item in items] == [
+        "ecmwf-2023-10-19T00-wave-fc-0h",
+        "ecmwf-2023-10-19T00-wave-fc-3h",
+    ]
+
+
+def test_create_item_async_datacube_semaphore(urls, monkeypatch):
+    semaphore = asyncio.Semaphore(1)
+    locked = []
+    from_href = IndexFile.from_href
+
+    def record(href, *args, **kwargs):
+        locked.append(semaphore.locked())
+        return from_href(href, *args, **kwargs)
+
+    monkeypatch.setattr(IndexFile, "from_href", record)
+    IndexFile.clear_cache()
+    # only the index files, so that nothing else holds the semaphore
+    asyncio.run(stac.create_item_async(urls[1::2], datacube=True, semaphore=semaphore))
+    assert locked == [True, True]
+
+
+def test_create_item_async_cached(urls, tmp_path):
+    cache = KerchunkCache(str(tmp_path / "cache"))
+    first = asyncio.run(stac.create_item_async(urls, use_index=True, cache=cache))
+    second = asyncio.run(stac.create_item_async(urls, use_index=True, cache=cache))
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert first.to_dict() == second.to_dict()
@@ -0,0 +1,85 @@
+import os
+import time
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast.cache import KerchunkCache, resolve_cache
+
+
+def test_get_set(tmp_path):
+    href = tmp_path / "file.grib2"
+    href.write_bytes(b"GRIB")
+    cache = KerchunkCache(str(tmp_path / "cache"))
+
+    key = cache.key(str(href))
+    assert cache.get(key) is None
+    cache.set(key, {"version": 1, "refs": {}})
+    assert cache.get(key) == {"version": 1, "refs": {}}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # so do other options
+    assert cache.key(str(href), use_index=True) != key
+
+    # A changed file gets a new key
+    href.write_bytes(b"GRIB2")
+    assert cache.key(str(href)) != key
+
+
+def test_evict_lru(tmp_path):
+    cache = KerchunkCache(str(tmp_path / "cache"), max_entries=2)
+    now = time.time()
+    for i, key in enumerate(["a", "b"]):
+        cache.set(key, {"i": i})
+        os.utime(cache._path(key), (now - 10 + i, now - 10 + i))
+
+    # "a" is now the most recently used
+    os.utime(cache._path("a"), (now - 5, now - 5))
+    cache.set("c", {"i": 2})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"i": 0}
+    assert cache.get("c") == {"i": 2}
+
+
+def test_evict_size(tmp_path):
+    cache = KerchunkCache(str(tmp_path / "cache"), max_bytes=100)
+    cache.set("a", {"refs": "x" * 80})
+    cache.set("b", {"refs": "y" * 80})
+    assert len(os.listdir(cache.directory)) == 1
+
+
+def test_resolve_cache(cache_dir):
+    assert resolve_cache(False) is None
+    default = resolve_cache(True)
+    assert default.directory == cache_dir
+    assert resolve_cache(True) is default
+    assert resolve_cache(default) is default
+
+
+def test_create_item_cached(hrefs, tmp_path, monkeypatch):
+    cache = KerchunkCache(str(tmp_path / "kerchunk"))
+
+    expected = stac.create_item(hrefs[:1], cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache not used")
+
+    monkeypatch.setattr(khf, "_get_kerchunk_indices", fail)
+    result = stac.create_item(hrefs[:1], cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert result.to_dict() == expected.to_dict()
+
+
+def test_create_item_not_cached_by_default(hrefs, cache_dir):
+    stac.create_item(hrefs[:1])
+    assert not os.path.exists(cache_dir)
+
+
+def test_create_item_cached_by_use_index(hrefs, tmp_path):
+    cache = KerchunkCache(str(tmp_path / "kerchunk"))
+
+    stac.create_item(hrefs, cache=cache)
+    stac.create_item(hrefs, cache=cache, use_index=True)
+    assert (cache.hits, cache.misses) == (0, 2)
+    stac.create_item(hrefs, cache=cache, use_index=True)
+    assert (cache.hits, cache.misses) == (1, 2)
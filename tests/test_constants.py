@@ -0,0 +1,27 @@
+import datetime
+import random
+
+import pytest
+
+from stactools.ecmwf_forecast import constants
+
+
+def test_index_combinations_unsorted():
+    combinations = list(constants.get_combinations())
+    random.Random(0).shuffle(combinations)
+    assert constants.index_combinations(combinations) == dict(constants.ITEM_STEPS)
+
+
+def test_item_steps():
+    steps = constants.ITEM_STEPS["grib2", "ef", "00", "enfo"]
+    assert len(steps) == 85
+    assert steps == tuple(sorted(steps))
+    assert constants.ITEM_STEPS["grib2", "ep", "12", "waef"] == ("240h", "360h")
+    with pytest.raises(TypeError):
+        constants.ITEM_STEPS["grib2", "fc", "00", "oper"] = ()  # type: ignore
+
+
+def test_step_offsets():
+    assert constants.STEP_OFFSETS["0h"] == datetime.timedelta(0)
+    assert constants.STEP_OFFSETS["360h"] == datetime.timedelta(hours=360)
+    assert "1m" not in constants.STEP_OFFSETS
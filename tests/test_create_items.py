@@ -0,0 +1,209 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast import stac
+
+from .synthetic import PRODUCTS
+
+
+@pytest.fixture
+def hrefs_options():
+    return {"dates": ["20231019", "20231020"], "steps": [0, 3]}
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_create_items(hrefs, executor, workers):
+    items = list(stac.create_items(hrefs, workers=workers, executor=executor))
+    assert [item.id for item in items] == [
+        "ecmwf-2023-10-19T00-wave-fc",
+        "ecmwf-2023-10-20T00-wave-fc",
+    ]
+    expected = stac.create_item(hrefs[:4])
+    assert items[0].to_dict() == expected.to_dict()
+
+    items = stac.create_items(hrefs[::-1], workers=workers, executor=executor)
+    assert [item.id for item in items] == [
+        "ecmwf-2023-10-19T00-wave-fc",
+        "ecmwf-2023-10-20T00-wave-fc",
+    ]
+
+
+def test_create_items_split_by_step(hrefs):
+    items = list(stac.create_items(hrefs, split_by_step=True, use_index=True))
+    assert [item.id for item in items] == [
+        "ecmwf-2023-10-19T00-wave-fc-0h",
+        "ecmwf-2023-10-19T00-wave-fc-3h",
+        "ecmwf-2023-10-20T00-wave-fc-0h",
+        "ecmwf-2023-10-20T00-wave-fc-3h",
+    ]
+    assert set(items[0].assets) == {"data", "index"}
+
+
+def test_item_options(hrefs):
+    options = stac.ItemOptions(split_by_step=True, use_index=True)
+    assert stac.ItemOptions.of(options) is options
+    assert stac.ItemOptions.of(options, use_index=False) == stac.ItemOptions(
+        split_by_step=True
+    )
+    with pytest.raises(TypeError, match="options must be ItemOptions, not bool"):
+        stac.ItemOptions.of(True)
+
+    items = list(stac.create_items(hrefs, options=options, workers=2))
+    assert (
+        items[0].to_dict()
+        == stac.create_item(hrefs[:2], split_by_step=True, use_index=True).to_dict()
+    )
+    # keyword arguments override the options
+    item = stac.create_item(hrefs[:4], options=options, split_by_step=False)
+    assert item.id == "ecmwf-2023-10-19T00-wave-fc"
+    # split_by_step and resolution are still positional
+    item = stac.create_item(hrefs[:2], True, "0p4-beta")
+    assert item.id == "ecmwf-2023-10-19T00-wave-fc-0h-0p4-beta"
+
+
+def test_create_items_bad_executor(hrefs):
+    with pytest.raises(ValueError, match="Bad executor"):
+        list(stac.create_items(hrefs, executor="gpu"))
+
+
+def test_create_items_command(cli, hrefs, tmp_path):
+    destination = str(tmp_path / "items.ndjson")
+    result = CliRunner().invoke(
+        cli,
+        ["ecmwf-forecast", "create-items", "-", destination, "--workers", "2"],
+        input="\n".join(hrefs),
+    )
+    assert result.exit_code == 0, result.output
+    with open(destination) as f:
+        ids = [json.loads(line)["id"] for line in f]
+    assert ids == ["ecmwf-2023-10-19T00-wave-fc", "ecmwf-2023-10-20T00-wave-fc"]
+
+    destination = str(tmp_path / "items")
+    result = CliRunner().invoke(
+        cli,
+        ["ecmwf-forecast", "create-items", "-", destination, "--split-by-step"],
+        input="\n".join(hrefs),
+    )
+    assert result.exit_code == 0, result.output
+    assert len(list((tmp_path / "items").iterdir())) == 4
+
+
+def test_create_items_command_processes(cli, hrefs, tmp_path, monkeypatch):
+    scanned = []
+    scan_grib_parallel = khf.scan_grib_parallel
+
+    def record(href, index_href, processes, **kwargs):
+        scanned.append(processes)
+        return scan_grib_parallel(href, index_href, processes, **kwargs)
+
+    monkeypatch.setattr(khf, "scan_grib_parallel", record)
+    destination = str(tmp_path / "items.ndjson")
+    result = CliRunner().invoke(
+        cli,
+        ["ecmwf-forecast", "create-items", "-", destination, "--processes", "2"],
+        input="\n".join(hrefs),
+    )
+    assert result.exit_code == 0, result.output
+    assert scanned == [2] * 4
+
+
+def test_create_items_stream(hrefs):
+    # The synthetic files only cover two steps, so groups are flushed at the end.
+    items = list(stac.create_items(iter(hrefs), stream=True, workers=2))
+    assert [item.id for item in items] == [
+        "ecmwf-2023-10-19T00-wave-fc",
+        "ecmwf-2023-10-20T00-wave-fc",
+    ]
+
+
+@pytest.mark.parametrize(
+    "hrefs",
+    [
+        {"dates": ["20231019"], "steps": [0], "stream": stream, "type": type}
+        for stream, type in sorted(PRODUCTS)
+    ],
+    ids=[f"{stream}-{type}" for stream, type in sorted(PRODUCTS)],
+    indirect=True,
+)
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"split_by_step": True, "datacube": True},
+        {"references_href": "memory://references"},
+    ],
+)
+def test_create_item_dict(hrefs, kwargs):
+    d = stac.create_item_dict(hrefs, cache=False, **kwargs)
+    expected = stac.create_item(hrefs, cache=False, **kwargs)
+    assert d == expected.to_dict(include_self_link=False)
+    stac.validate_item_dict(d)
+
+
+def test_create_item_dict_templates(hrefs):
+    templates = stac.build_templates(stac.create_items(hrefs))
+    d = stac.create_item_dict(hrefs[:4], templates=templates)
+    assert d == stac.create_item(hrefs[:4], templates=templates).to_dict(
+        include_self_link=False
+    )
+    assert d["assets"]["0h-grib2"]["kerchunk:template"] == "wave-fc"
+
+
+def test_validate_item_dict(hrefs):
+    d = stac.create_item_dict(hrefs[:2])
+    stac.validate_item_dict(d)
+    d["properties"]["datetime"] = "2023-10-19T00:00:00+00:00"
+    with pytest.raises(
+        ValueError, match=r"differs once loaded by pystac, in \['properties'\]"
+    ):
+        stac.validate_item_dict(d)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_create_item_dicts(hrefs, tmp_path, executor):
+    dicts = list(
+        stac.create_item_dicts(hrefs, executor=executor, workers=2, validate_sample=1.0)
+    )
+    items = list(stac.create_items(hrefs))
+    assert dicts == [item.to_dict(include_self_link=False) for item in items]
+
+    destination = str(tmp_path / "items.ndjson")
+    assert stac.write_item_dicts(dicts, destination) == 2
+    with open(destination) as f:
+        assert [json.loads(line) for line in f] == json.loads(json.dumps(dicts))
+
+    assert stac.write_item_dicts(dicts, str(tmp_path / "items")) == 2
+    with open(tmp_path / "items" / "ecmwf-2023-10-20T00-wave-fc.json") as f:
+        assert json.load(f)["id"] == "ecmwf-2023-10-20T00-wave-fc"
+
+
+def test_create_items_command_fast(cli, hrefs, tmp_path):
+    destination = str(tmp_path / "items.ndjson")
+    result = CliRunner().invoke(
+        cli,
+        [
+            "ecmwf-forecast",
+            "create-items",
+            "-",
+            destination,
+            "--fast",
+            "--validate-sample",
+            "1",
+        ],
+        input="\n".join(hrefs),
+    )
+    assert result.exit_code == 0, result.output
+    with open(destination) as f:
+        ids = [json.loads(line)["id"] for line in f]
+    assert ids == ["ecmwf-2023-10-19T00-wave-fc", "ecmwf-2023-10-20T00-wave-fc"]
+
+
+def test_dumps_without_orjson(hrefs, monkeypatch):
+    d = stac.create_item_dict(hrefs[:2])
+    encoded = stac._dumps(d)
+    monkeypatch.setattr(stac, "orjson", None)
+    assert stac._dumps(d) == encoded
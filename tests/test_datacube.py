@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast.datacube import datacube_properties
+from stactools.ecmwf_forecast.filesystems import FileSystems
+from stactools.ecmwf_forecast.index import IndexFile
+
+
+@pytest.fixture
+def hrefs_options():
+    return {"steps": [0, 3], "stream": "enfo", "type": "ef"}
+
+
+def test_datacube_properties(hrefs):
+    indexes = [IndexFile.from_href(href) for href in hrefs[1::2]]
+    properties = datacube_properties(indexes)
+    assert properties["cube:variables"] == {
+        "2t": {
+            "type": "data",
+            "dimensions": ["step", "number", "latitude", "longitude"],
+        },
+        "t": {
+            "type": "data",
+            "dimensions": ["step", "number", "isobaricInhPa", "latitude", "longitude"],
+        },
+    }
+    dimensions = properties["cube:dimensions"]
+    assert dimensions["step"] == {"type": "other", "values": [0, 3], "unit": "h"}
+    assert dimensions["number"] == {"type": "other", "values": [0, 1, 2]}
+    assert dimensions["isobaricInhPa"] == {
+        "type": "spatial",
+        "axis": "z",
+        "values": [850, 1000],
+        "unit": "hPa",
+    }
+    assert dimensions["latitude"]["extent"] == [-90.0, 90.0]
+
+
+def test_datacube_properties_empty():
+    assert datacube_properties([]) == {"cube:dimensions": {}, "cube:variables": {}}
+
+
+def test_create_item_datacube(hrefs):
+    item = stac.create_item(hrefs, datacube=True, cache=False)
+    assert (
+        "https://stac-extensions.github.io/datacube/v2.2.0/schema.json"
+        in item.stac_extensions
+    )
+    assert set(item.properties["cube:variables"]) == {"2t", "t"}
+    assert item.properties["cube:dimensions"]["step"]["values"] == [0, 3]
+
+    plain = stac.create_item(hrefs, cache=False)
+    assert "cube:variables" not in plain.properties
+
+    result = asyncio.run(stac.create_item_async(hrefs, datacube=True, cache=False))
+    assert result.to_dict() == item.to_dict()
+
+
+def test_create_item_datacube_split_by_step(hrefs):
+    item = stac.create_item(hrefs[2:], split_by_step=True, datacube=True, cache=False)
+    assert item.properties["cube:dimensions"]["step"]["values"] == [3]
+
+
+def test_create_item_datacube_filesystems(hrefs):
+    filesystems = FileSystems()
+    item = stac.create_item(hrefs, datacube=True, filesystems=filesystems)
+    assert set(item.properties["cube:variables"]) == {"2t", "t"}
+    # the ensemble forecast has no kerchunk indices, so only the indexes are read
+    assert filesystems.stats()["created"] == 1
@@ -0,0 +1,116 @@
+import gc
+import pickle
+import tracemalloc
+
+import fsspec
+import pytest
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast.filesystems import (
+    FileSystems,
+    default_filesystems,
+    resolve_filesystems,
+)
+
+from .synthetic import PRODUCTS, write_grib2
+
+
+def test_get_reuses_filesystems(tmp_path):
+    filesystems = FileSystems()
+    fs, path = filesystems.get(str(tmp_path / "a.grib2"))
+    assert path == str(tmp_path / "a.grib2")
+    other, _ = filesystems.get(f"file://{tmp_path}/b.grib2")
+    assert other is fs
+    memory, path = filesystems.get("memory://ecmwf/a.grib2")
+    assert memory is not fs
+    assert path == "/ecmwf/a.grib2"
+    assert filesystems.stats() == {"filesystems": 2, "listings": 0, "created": 2}
+    # not shared through fsspec's instance cache
+    assert fsspec.filesystem("file") is not fs
+
+
+def test_max_age(tmp_path):
+    filesystems = FileSystems(max_age=0)
+    fs, _ = filesystems.get(str(tmp_path))
+    other, _ = filesystems.get(str(tmp_path))
+    assert other is not fs
+    assert filesystems.stats()["created"] == 2
+
+
+def test_max_listings():
+    memory = fsspec.filesystem("memory")
+    for i in range(5):
+        memory.pipe_file(f"/listings/{i}/a", b"a")
+    with FileSystems(max_listings=2) as filesystems:
+        fs, _ = filesystems.get("memory://listings")
+        fs.dircache.update({f"/listings/{i}": [] for i in range(5)})
+        assert filesystems.stats()["listings"] == 5
+        filesystems.get("memory://listings")
+        assert filesystems.stats()["listings"] == 0
+    assert filesystems.stats()["filesystems"] == 0
+    memory.rm("/listings", recursive=True)
+
+
+def test_pickle(tmp_path):
+    filesystems = FileSystems({"file": {"auto_mkdir": True}}, max_age=10)
+    filesystems.get(str(tmp_path))
+    result = pickle.loads(pickle.dumps(filesystems))
+    assert result.storage_options == {"file": {"auto_mkdir": True}}
+    assert result.max_age == 10
+    assert result.stats() == {"filesystems": 0, "listings": 0, "created": 0}
+    fs, _ = result.get(str(tmp_path))
+    assert fs.auto_mkdir
+
+
+def test_resolve_filesystems():
+    filesystems = FileSystems()
+    assert resolve_filesystems(filesystems) is filesystems
+    assert resolve_filesystems(None) is default_filesystems()
+
+
+@pytest.fixture
+def simulated_items(tmp_path):
+    """50 items of small synthetic wave forecasts in memory."""
+    source = str(tmp_path / "20231019000000-0h-wave-fc.grib2")
+    write_grib2(source, PRODUCTS["wave", "fc"])
+    with open(source, "rb") as f:
+        data = f.read()
+    with open(khf.index_href(source), "rb") as f:
+        index = f.read()
+
+    memory = fsspec.filesystem("memory")
+    items = []
+    for i in range(50):
+        href = f"memory://simulated/{i}/20231019{i % 4 * 6:02d}0000-0h-wave-fc.grib2"
+        memory.pipe_file(href, data)
+        memory.pipe_file(khf.index_href(href), index)
+        items.append([href, khf.index_href(href)])
+    yield items
+    memory.rm("/simulated", recursive=True)
+
+
+def test_memory_is_flat_over_many_items(simulated_items):
+    filesystems = FileSystems()
+
+    def create(hrefs):
+        # scan every GRIB2 file, without the cache
+        item = stac.create_item(hrefs, cache=False, filesystems=filesystems)
+        assert item.assets["0h-grib2"].extra_fields["kerchunk:indices"]["refs"]
+
+    for hrefs in simulated_items[:10]:
+        create(hrefs)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for hrefs in simulated_items[10:]:
+            create(hrefs)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # one filesystem, reused by every item
+    assert filesystems.stats()["created"] == 1
+    assert after - before < 128 * 1024
@@ -0,0 +1,133 @@
+import json
+import os
+
+import fsspec
+import numpy as np
+import pytest
+
+from stactools.ecmwf_forecast import reads
+from stactools.ecmwf_forecast.cache import file_token
+from stactools.ecmwf_forecast.index import IndexFile
+
+from .synthetic import PRODUCTS, write_grib2
+
+
+@pytest.fixture
+def entries(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.grib2")
+    return write_grib2(href, PRODUCTS["enfo", "ef"], stream="enfo", type="ef")
+
+
+@pytest.fixture
+def index(entries, tmp_path):
+    IndexFile.clear_cache()
+    yield IndexFile.from_href(str(tmp_path / "20231019000000-0h-enfo-ef.index"))
+    IndexFile.clear_cache()
+
+
+def test_from_href(index, entries, tmp_path):
+    assert len(index) == len(entries)
+    assert index.offset.dtype == np.int64
+    assert index.offset.tolist() == [e["_offset"] for e in entries]
+    assert index.columns["param"].tolist() == [e["param"] for e in entries]
+    assert index.columns["levelist"].tolist() == [
+        e.get("levelist", "") for e in entries
+    ]
+    # parsed once per href
+    assert (
+        IndexFile.from_href(str(tmp_path / "20231019000000-0h-enfo-ef.index")) is index
+    )
+
+
+def test_from_href_rewritten(index, entries, tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.index")
+    with open(href, "w") as f:
+        f.write(json.dumps(entries[0]) + "\n")
+    # cached files aren't checked again, unless their token is given
+    assert IndexFile.from_href(href) is index
+    token = file_token(fsspec.filesystem("file").info(href))
+    rewritten = IndexFile.from_href(href, token=token)
+    assert len(rewritten) == 1
+    assert IndexFile.from_href(href, token=token) is rewritten
+    assert IndexFile.from_href(href) is rewritten
+
+
+def test_from_href_cached_without_requests(index, tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.index")
+    os.remove(href)
+    assert IndexFile.from_href(href) is index
+
+
+def test_messages(index, entries):
+    assert index.messages() == [
+        {
+            k: v
+            for k, v in e.items()
+            if k in (*reads.SELECTION_KEYS, "_offset", "_length")
+        }
+        for e in entries
+    ]
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        {"param": "t"},
+        {"param": ["t", "2t"], "number": 1},
+        {"levelist": [500, 850], "number": ["0", "2"]},
+        {"levtype": "sfc", "levelist": None},
+        {"param": "q"},
+    ],
+)
+def test_select(index, entries, selection):
+    expected = reads.select_messages(entries, **selection)
+    result = index.select(**selection).messages()
+    assert [m["_offset"] for m in result] == [m["_offset"] for m in expected]
+
+
+def test_select_bad_key(index):
+    with pytest.raises(ValueError, match="Bad selection keys"):
+        index.select(level=500)
+
+
+def test_unique(index):
+    assert index.unique("param") == ["2t", "t"]
+    assert index.unique("levelist") == ["1000", "850"]
+    assert index.unique("number") == ["0", "1", "2"]
+
+
+def test_to_ranges(index, entries):
+    ranges = index.to_ranges()
+    assert ranges.tolist() == [
+        [e["_offset"], e["_offset"] + e["_length"]] for e in entries
+    ]
+    # adjacent messages are merged
+    assert index.to_ranges(max_gap=0).tolist() == [
+        [0, entries[-1]["_offset"] + entries[-1]["_length"]]
+    ]
+
+    selected = index.select(param="t", levelist="850")
+    plan = reads.plan_reads(selected.messages(), max_gap=0)
+    assert selected.to_ranges(max_gap=0).tolist() == [[r.start, r.end] for r in plan]
+    assert index.select(param="q").to_ranges(max_gap=0).shape == (0, 2)
+
+
+def test_from_lines():
+    lines = [
+        json.dumps(
+            {
+                "param": "t",
+                "levtype": "pl",
+                "levelist": "500",
+                "_offset": 10,
+                "_length": 5,
+            }
+        ),
+        "",
+        json.dumps(
+            {"param": "2t", "levtype": "sfc", "_offset": 0, "_length": 10}
+        ).encode(),
+    ]
+    index = IndexFile.from_lines(lines)
+    assert len(index) == 2
+    assert index.to_ranges(max_gap=0).tolist() == [[0, 15]]
@@ -0,0 +1,211 @@
+import base64
+import concurrent.futures
+import copy
+import json
+
+import fsspec
+import numpy as np
+import pytest
+import xarray as xr
+from kerchunk.combine import MultiZarrToZarr
+from kerchunk.grib2 import scan_grib
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast import constants, stac
+from stactools.ecmwf_forecast.range_codec import Range
+
+from .synthetic import PRODUCTS, write_grib2
+
+MESSAGES = {
+    "wave": [
+        {"param": "swh", "levtype": "msl"},
+        {"param": "mwd", "levtype": "msl"},
+        {"param": "mwp", "levtype": "msl"},
+    ],
+    "oper": [
+        {"param": "msl", "levtype": "msl"},
+        {"param": "2t", "levtype": "sfc"},
+        *[
+            {"param": param, "levtype": "pl", "levelist": level}
+            for param in ["t", "u"]
+            for level in [1000, 850, 500]
+        ],
+    ],
+}
+
+
+@pytest.mark.parametrize("stream", ["wave", "oper"])
+def test_scan_grib_from_index(tmp_path, stream):
+    href = str(tmp_path / f"20231019000000-0h-{stream}-fc.grib2")
+    write_grib2(href, MESSAGES[stream], stream=stream)
+
+    result = khf.scan_grib_from_index(href, khf.index_href(href))
+    expected = scan_grib(href)
+    assert len(result) == len(expected)
+    for a, b in zip(result, expected):
+        assert khf.convert_base64(a)["refs"] == khf.convert_base64(b)["refs"]
+
+
+def test_representatives_by_type_and_stream():
+    messages = [
+        {"param": "2t", "levtype": "sfc", "step": 0, "type": type_, "stream": stream}
+        for stream, type_ in [
+            ("enfo", "cf"),
+            ("enfo", "pf"),
+            ("enfo", "pf"),
+            ("oper", "fc"),
+        ]
+    ]
+    assert khf._representatives(messages) == [messages[0], messages[1], messages[3]]
+
+
+@pytest.mark.parametrize("stream", ["wave", "oper"])
+def test_iter_grib(tmp_path, stream):
+    href = str(tmp_path / f"20231019000000-0h-{stream}-fc.grib2")
+    write_grib2(href, MESSAGES[stream], stream=stream)
+
+    messages = khf.iter_grib(href)
+    assert not isinstance(messages, list)
+    assert list(messages) == scan_grib(href)
+
+
+def test_scan_grib_parallel(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.grib2")
+    write_grib2(href, PRODUCTS["enfo", "ef"], stream="enfo", type="ef")
+
+    result = khf.scan_grib_parallel(href, khf.index_href(href), processes=2)
+    assert result == scan_grib(href)
+
+    part = stac.Parts.from_filename(href)
+    assert khf.get_kerchunk_indices(part, processes=2) == khf.get_kerchunk_indices(part)
+
+
+def test_scan_grib_parallel_concurrent(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.grib2")
+    write_grib2(href, PRODUCTS["enfo", "ef"], stream="enfo", type="ef")
+    expected = scan_grib(href)
+
+    # calls with a different number of processes don't stop each other's pool
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        results = pool.map(
+            lambda processes: khf.scan_grib_parallel(
+                href, khf.index_href(href), processes
+            ),
+            [1, 2, 1, 2],
+        )
+        assert all(result == expected for result in results)
+    assert sorted(khf._pools) == [1, 2]
+
+
+def test_combine_messages_shares_values(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-oper-fc.grib2")
+    write_grib2(href, MESSAGES["oper"], stream="oper")
+
+    groups = khf._partition(khf.iter_grib(href), ("isobaricInhPa",))
+    assert [len(groups[dim]) for dim in [None, "isobaricInhPa"]] == [2, 6]
+    first, *others = [m["refs"] for group in groups.values() for m in group]
+    for refs in others:
+        assert refs["latitude/0"] is first["latitude/0"]
+        assert refs["longitude/0"] is first["longitude/0"]
+
+    part = stac.Parts.from_filename(href)
+    assert khf.combine_messages(part, khf.iter_grib(href)) == khf.combine_messages(
+        part, scan_grib(href)
+    )
+
+
+def test_get_kerchunk_indices_use_index(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-wave-fc.grib2")
+    write_grib2(href, MESSAGES["wave"], stream="wave")
+    part = stac.Parts.from_filename(href)
+
+    result = khf.get_kerchunk_indices(part, use_index=True, cache=False)
+    expected = khf.get_kerchunk_indices(part, cache=False)
+    assert result == expected
+
+
+def _combined_refs(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-wave-fc.grib2")
+    write_grib2(href, MESSAGES["wave"], stream="wave")
+    return MultiZarrToZarr(scan_grib(href), concat_dims=["time"]).translate()
+
+
+def test_postprocess_refs(tmp_path):
+    refs = _combined_refs(tmp_path)
+    expected = khf.convert_base64(khf.compress_lat_lon(copy.deepcopy(refs)))
+    result = khf.postprocess_refs(refs)
+    assert result == expected
+
+    zarray = json.loads(result["refs"]["latitude/.zarray"])
+    assert zarray["filters"] == [{"id": "range"}]
+    assert zarray["shape"] == [10]
+    for key in ["time/0", "step/0", "meanSea/0", "latitude/0"]:
+        assert result["refs"][key].startswith("base64:")
+
+    latitude = Range().decode(base64.b64decode(result["refs"]["latitude/0"][7:]))
+    np.testing.assert_allclose(latitude, np.arange(90, -91, -20))
+
+
+@pytest.mark.parametrize("hrefs", [{"steps": [0, 3, 6]}], indirect=True)
+def test_combine_steps(hrefs):
+    item = stac.create_item(hrefs)
+    refs = stac.create_run_references(item)
+    ds = xr.open_dataset(
+        fsspec.filesystem("reference", fo=refs).get_mapper(""),
+        engine="zarr",
+        consolidated=False,
+    )
+    assert ds.swh.dims == ("step", "time", "latitude", "longitude")
+    assert ds.step.values.astype("timedelta64[h]").astype(int).tolist() == [0, 3, 6]
+    assert ds.latitude.size == 10
+
+    # one item per step gives the same references, in any order
+    items = stac.create_items(hrefs[::-1], split_by_step=True)
+    assert stac.create_run_references(items) == refs
+
+    for step in [0, 3, 6]:
+        expected = xr.open_dataset(
+            hrefs[step // 3 * 2], engine="cfgrib", backend_kwargs={"indexpath": ""}
+        )
+        actual = ds.sel(step=expected.step.values).isel(time=0)
+        np.testing.assert_allclose(actual.swh.values, expected.swh.values, rtol=1e-6)
+
+
+def test_combine_steps_without_step(hrefs):
+    (item,) = stac.create_items(hrefs, split_by_step=True)
+    del item.properties["ecmwf:step"]
+    with pytest.raises(ValueError, match="doesn't have an ecmwf:step"):
+        stac.create_run_references(item)
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+@pytest.mark.parametrize("stream, type_", sorted(constants.COMBINE_RULES))
+def test_combine_rules(tmp_path, stream, type_, use_index):
+    href = str(tmp_path / f"20231019000000-0h-{stream}-{type_}.grib2")
+    entries = write_grib2(href, PRODUCTS[stream, type_], stream=stream, type=type_)
+    part = stac.Parts.from_filename(href)
+    assert stac._has_kerchunk_indices(
+        part, stac.ItemOptions(kerchunk_products=stac.ALL_KERCHUNK_PRODUCTS)
+    )
+
+    refs = khf.get_kerchunk_indices(part, use_index=use_index, cache=False)
+    chunks = [v for v in refs["refs"].values() if isinstance(v, list)]
+    assert sorted(chunks) == sorted(
+        [href, entry["_offset"], entry["_length"]] for entry in entries
+    )
+
+    ds = xr.open_dataset(
+        fsspec.filesystem("reference", fo=refs).get_mapper(""),
+        engine="zarr",
+        consolidated=False,
+    )
+    ds.load()
+
+
+def test_combine_messages_unknown():
+    part = stac.Parts.from_filename("20231019000000-0h-oper-ep.grib2")
+    assert not stac._has_kerchunk_indices(
+        part, stac.ItemOptions(kerchunk_products=stac.ALL_KERCHUNK_PRODUCTS)
+    )
+    with pytest.raises(ValueError, match="No kerchunk combine rule"):
+        khf.combine_messages(part, [])
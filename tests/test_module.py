@@ -1,8 +1,44 @@
+import subprocess
+import sys
+import textwrap
 import unittest
 
 import stactools.ecmwf_forecast
 
+# Only needed to build kerchunk references or plot, and slow to import.
+HEAVY_MODULES = [
+    "cfgrib",
+    "eccodes",
+    "kerchunk",
+    "matplotlib",
+    "numcodecs",
+    "xarray",
+    "zarr",
+]
+
 
 class TestModule(unittest.TestCase):
     def test_version(self):
         self.assertIsNotNone(stactools.ecmwf_forecast.__version__)
+
+    def test_lazy_imports(self):
+        # In a new interpreter, since the tests import everything.
+        code = textwrap.dedent(f"""
+            import sys
+
+            from stactools.ecmwf_forecast import commands, stac
+
+            hrefs = [
+                f"20231019000000-{{step}}h-wave-fc.{{fmt}}"
+                for step in [0, 3]
+                for fmt in ["grib2", "index"]
+            ]
+            stac.Parts.from_filenames(hrefs)
+            list(stac.group_assets(hrefs))
+            stac.list_sibling_assets(hrefs[0])
+            print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+            """)
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
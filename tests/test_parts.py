@@ -0,0 +1,152 @@
+import datetime
+import os
+
+import pytest
+
+from stactools.ecmwf_forecast import _kerchunk_helper_functions as khf
+from stactools.ecmwf_forecast import constants, stac
+
+from .synthetic import write_combinations
+
+
+@pytest.mark.parametrize("key", list(constants.ITEM_STEPS))
+def test_list_sibling_assets(key):
+    fmt, type_, reference_time, stream = key
+    steps = constants.ITEM_STEPS[key]
+    filename = (
+        f"ecmwf/20220202/20220202{reference_time}0000-{steps[0]}-{stream}-{type_}.{fmt}"
+    )
+
+    siblings = stac.list_sibling_assets(filename)
+    assert len(siblings) == 2 * len(steps)
+    assert [p.step for p in siblings[::2]] == list(steps)
+    for p in siblings:
+        assert p == stac.Parts.from_filename(p.filename)
+        assert p.prefix == "ecmwf/20220202/"
+
+
+def test_write_combinations(tmp_path):
+    # the first step of every item
+    combinations = [
+        constants.Combination(*key, steps[0])
+        for key, steps in constants.ITEM_STEPS.items()
+    ]
+    hrefs = write_combinations(str(tmp_path), combinations)
+    assert len(hrefs) == len(constants.ITEM_STEPS)
+    for href in hrefs:
+        assert os.path.exists(khf.index_href(href))
+        siblings = stac.list_sibling_assets(href)
+        assert [p.filename for p in siblings[:2]] == [href, khf.index_href(href)]
+
+    grouped = stac.group_assets(hrefs)
+    assert len([hrefs for _, hrefs in grouped]) == len(hrefs)
+
+
+def test_parts_frozen():
+    p = stac.Parts.from_filename("ecmwf/20231019/20231019000000-3h-wave-fc.grib2")
+    assert not hasattr(p, "__dict__")
+    with pytest.raises(AttributeError):
+        p.step = "6h"  # type: ignore
+    assert p.item_id == "ecmwf-2023-10-19T00-wave-fc"
+    assert p.forecast_datetime == datetime.datetime(2023, 10, 19, 3)
+    assert p.prefix == "ecmwf/20231019/"
+    assert p.name == "20231019000000-3h-wave-fc.grib2"
+    assert hash(p) == hash(stac.Parts.from_filename(p.filename))
+
+
+def test_parts_monthly_offset():
+    p = stac.Parts.from_filename("20231019000000-1m-mmsf-fc.grib2")
+    with pytest.raises(NotImplementedError):
+        p.offset
+
+
+def test_from_filenames():
+    filenames = [
+        "20231019000000-0h-wave-fc.grib2",
+        "20231019000000-0h-wave-fc.index",
+        "20231019120000-3h-enfo-ef.grib2",
+    ]
+    result = stac.Parts.from_filenames(filenames, split_by_step=True, resolution="0.25")
+    assert result == [
+        stac.Parts.from_filename(f, split_by_step=True, resolution="0.25")
+        for f in filenames
+    ]
+    assert result[2].item_id == "ecmwf-2023-10-19T12-enfo-ef-3h-0.25"
+
+    with pytest.raises(ValueError, match="bad.grib2"):
+        stac.Parts.from_filenames(["bad.grib2"])
+
+
+def test_group_assets_parses_once():
+    calls = []
+
+    def key(href):
+        calls.append(href)
+        return stac.item_key(href)
+
+    hrefs = [
+        "20231019000000-3h-wave-fc.grib2",
+        "20231019120000-0h-wave-fc.grib2",
+        "20231019000000-0h-wave-fc.grib2",
+    ]
+    groups = [(k, list(v)) for k, v in stac.group_assets(hrefs, key=key)]
+    assert len(calls) == len(hrefs)
+    assert groups == [
+        (
+            (datetime.datetime(2023, 10, 19), "wave", "fc"),
+            ["20231019000000-3h-wave-fc.grib2", "20231019000000-0h-wave-fc.grib2"],
+        ),
+        (
+            (datetime.datetime(2023, 10, 19, 12), "wave", "fc"),
+            ["20231019120000-0h-wave-fc.grib2"],
+        ),
+    ]
+
+
+def _wave_hrefs(date="20231019", steps=None):
+    steps = steps or constants.ITEM_STEPS["grib2", "fc", "00", "wave"]
+    return [
+        f"ecmwf/{date}/{date}000000-{step}-wave-fc.{ext}"
+        for step in steps
+        for ext in ["grib2", "index"]
+    ]
+
+
+def test_stream_assets():
+    first, second = _wave_hrefs("20231019"), _wave_hrefs("20231020")
+    # interleaved, and the first item is complete before the stream ends
+    hrefs = [h for pair in zip(first, second) for h in pair]
+
+    def listing():
+        yield from hrefs
+        raise AssertionError("stream exhausted")
+
+    groups = stac.stream_assets(listing())
+    key, group = next(groups)
+    assert key == (datetime.datetime(2023, 10, 19), "wave", "fc")
+    assert sorted(group) == sorted(first)
+
+
+def test_stream_assets_incomplete():
+    hrefs = _wave_hrefs(steps=["0h", "3h"]) + ["20231019000000-1m-mmsf-fc.grib2"]
+    groups = list(stac.stream_assets(hrefs))
+    assert [len(hrefs) for _, hrefs in groups] == [4, 1]
+
+
+def test_stream_assets_split_by_step():
+    hrefs = _wave_hrefs(steps=["0h", "3h"])
+    groups = stac.stream_assets(iter(hrefs[::-1]), split_by_step=True)
+    assert [(k[-1], v) for k, v in groups] == [
+        (datetime.timedelta(hours=3), hrefs[3:1:-1]),
+        (datetime.timedelta(hours=0), hrefs[1::-1]),
+    ]
+
+
+def test_stream_assets_timeout(monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(stac.time, "monotonic", lambda: next(clock))
+    hrefs = _wave_hrefs("20231019", steps=["0h"]) + _wave_hrefs("20231020")
+    groups = stac.stream_assets(hrefs, timeout=5)
+    key, group = next(groups)
+    assert key[0] == datetime.datetime(2023, 10, 19)
+    assert group == hrefs[:2]
@@ -0,0 +1,158 @@
+import copy
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from stactools.ecmwf_forecast import pgstac, stac
+
+BASE = {
+    "type": "Feature",
+    "stac_version": "1.1.0",
+    "assets": {"data": {"type": "a", "roles": ["data"], "title": "Data"}},
+    "collection": "c",
+}
+
+
+@pytest.fixture
+def hrefs_options():
+    return {"stream": "enfo", "type": "ef"}
+
+
+def test_dehydrate():
+    item = {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "id": "item",
+        "assets": {
+            "data": {"href": "x", "type": "a", "roles": ["data"], "extra": [1]},
+            "other": {"href": "y", "type": "a"},
+        },
+        "collection": "c",
+    }
+    dehydrated = pgstac.dehydrate(BASE, item)
+    assert dehydrated == {
+        "stac_version": "1.0.0",
+        "id": "item",
+        "assets": {
+            "data": {"href": "x", "extra": [1], "title": pgstac.DO_NOT_MERGE_MARKER},
+            "other": {"href": "y", "type": "a"},
+        },
+    }
+    assert pgstac.hydrate(BASE, copy.deepcopy(dehydrated)) == item
+
+    # Missing and empty values
+    item = {"type": "Feature", "assets": {"data": {"href": "x", "roles": []}}}
+    dehydrated = pgstac.dehydrate(BASE, item)
+    assert dehydrated == {
+        "assets": {
+            "data": {
+                "href": "x",
+                "roles": [],
+                "type": pgstac.DO_NOT_MERGE_MARKER,
+                "title": pgstac.DO_NOT_MERGE_MARKER,
+            }
+        },
+        "stac_version": pgstac.DO_NOT_MERGE_MARKER,
+        "collection": pgstac.DO_NOT_MERGE_MARKER,
+    }
+    assert pgstac.hydrate(BASE, dehydrated) == item
+
+
+def test_hydrate_copies_base():
+    items = [pgstac.hydrate(BASE, {"id": str(i)}) for i in range(2)]
+    items[0]["assets"]["data"]["roles"].append("x")
+    assert items[1]["assets"]["data"]["roles"] == ["data"]
+    assert BASE["assets"]["data"]["roles"] == ["data"]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"split_by_step": True},
+        {"split_by_step": True, "datacube": True},
+        {"split_by_step": True, "references_href": "memory://references"},
+        {},
+    ],
+)
+def test_dehydrate_items(hrefs, kwargs):
+    collection = stac.create_collection()
+    item = stac.create_item_dict(
+        hrefs, cache=False, kerchunk_products=stac.ALL_KERCHUNK_PRODUCTS, **kwargs
+    )
+    expected = {**item, "collection": "ecmwf-forecast"}
+
+    (dehydrated,) = pgstac.dehydrate_items(
+        [item], collection, inherit_item_assets=False
+    )
+    assert "type" not in dehydrated and "collection" not in dehydrated
+    (hydrated,) = pgstac.hydrate_items([json.loads(json.dumps(dehydrated))], collection)
+    assert hydrated == json.loads(json.dumps(expected))
+
+    (dehydrated,) = pgstac.dehydrate_items([item], collection.to_dict())
+    (hydrated,) = pgstac.hydrate_items([json.loads(json.dumps(dehydrated))], collection)
+    item_assets = pgstac.base_item(collection)["assets"]
+    expected["assets"] = pgstac.with_item_assets(item["assets"], item_assets)
+    assert hydrated == json.loads(json.dumps(expected))
+    if kwargs.get("split_by_step"):
+        assert hydrated["assets"]["data"]["title"] == "GRIB2 data file"
+        fields = (
+            {"href"} if "references_href" in kwargs else {"href", "kerchunk:indices"}
+        )
+        assert set(dehydrated["assets"]["data"]) == fields
+    else:
+        # the assets are keyed by step
+        assert dehydrated["assets"]["data"] == pgstac.DO_NOT_MERGE_MARKER
+
+
+def test_create_items_command_dehydrate(cli, hrefs, tmp_path):
+    collection = tmp_path / "collection.json"
+    collection.write_text(json.dumps(stac.create_collection().to_dict()))
+    for fast in [[], ["--fast"]]:
+        destination = str(tmp_path / "items.ndjson")
+        result = CliRunner().invoke(
+            cli,
+            [
+                "ecmwf-forecast",
+                "create-items",
+                "-",
+                destination,
+                "--split-by-step",
+                "--dehydrate",
+                "--collection",
+                str(collection),
+            ]
+            + fast,
+            input="\n".join(hrefs),
+        )
+        assert result.exit_code == 0, result.output
+        with open(destination, encoding="utf-8") as f:
+            (dehydrated,) = [json.loads(line) for line in f]
+        (item,) = pgstac.hydrate_items([dehydrated], stac.create_collection())
+        assert item["id"] == "ecmwf-2023-10-19T00-enfo-ef-0h"
+        assert item["assets"]["index"]["type"] == stac.NDJSON_MEDIA_TYPE
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (
+            ["items.ndjson", "--collection", "collection.json"],
+            "--collection requires --dehydrate",
+        ),
+        (["items", "--dehydrate"], "--dehydrate requires a .ndjson destination"),
+    ],
+)
+def test_create_items_command_dehydrate_usage(cli, hrefs, tmp_path, args, message):
+    collection = tmp_path / "collection.json"
+    collection.write_text(json.dumps(stac.create_collection().to_dict()))
+    destination, *options = args
+    result = CliRunner().invoke(
+        cli,
+        ["ecmwf-forecast", "create-items", "-", str(tmp_path / destination)]
+        + [str(tmp_path / o) if o.endswith(".json") else o for o in options],
+        input="\n".join(hrefs),
+    )
+    assert result.exit_code == 2
+    assert message in result.output
+    assert not (tmp_path / destination).exists()
@@ -0,0 +1,158 @@
+import io
+import json
+import logging
+
+import pytest
+from click.testing import CliRunner
+
+from stactools.ecmwf_forecast import profiling, stac
+
+from .synthetic import PRODUCTS, write_grib2
+
+# Ensemble forecasts only get kerchunk indices on request
+ALL = stac.ALL_KERCHUNK_PRODUCTS
+
+
+@pytest.fixture
+def enfo(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.grib2")
+    entries = write_grib2(href, PRODUCTS["enfo", "ef"], stream="enfo", type="ef")
+    return href, entries
+
+
+def test_phases():
+    sink = profiling.MemorySink()
+    with profiling.phase("ignored"):
+        profiling.add_read(10)
+    with profiling.recording(sink):
+        with profiling.item("item-1"):
+            with profiling.phase("read"):
+                profiling.add_read(100)
+                profiling.add_read(50, requests=2)
+            with profiling.phase("other", item_id="item-2"):
+                pass
+        with profiling.phase("list"):
+            pass
+    assert [(r.item_id, r.phase, r.bytes_read, r.requests) for r in sink.records] == [
+        ("item-1", "read", 150, 3),
+        ("item-2", "other", 0, 0),
+        ("item-1", "item", 150, 3),
+        (None, "list", 0, 0),
+    ]
+    assert all(r.peak_memory is None for r in sink.records)
+    assert profiling.current() is None
+
+
+def test_memory():
+    sink = profiling.MemorySink()
+    with profiling.recording(sink, memory=True):
+        with profiling.phase("outer"):
+            with profiling.phase("inner"):
+                data = [bytearray(1_000_000)]
+            del data
+            with profiling.phase("small"):
+                pass
+    inner, small, outer = sink.records
+    assert inner.peak_memory >= 1_000_000
+    assert small.peak_memory < 100_000
+    assert outer.peak_memory >= inner.peak_memory
+
+
+def test_create_item(enfo):
+    href, entries = enfo
+    sink = profiling.MemorySink()
+    with profiling.recording(sink):
+        item = stac.create_item(
+            [href],
+            split_by_step=True,
+            use_index=True,
+            cache=False,
+            kerchunk_products=ALL,
+        )
+
+    records = {r.phase: r for r in sink.records}
+    assert {r.item_id for r in sink.records} == {item.id}
+    assert list(records) == ["scan", "combine", "postprocess", "kerchunk", "item"]
+    # the index, and one message per parameter in a single range request
+    assert records["kerchunk"].requests == 2
+    assert records["item"].bytes_read == records["kerchunk"].bytes_read > 0
+
+    sink = profiling.MemorySink()
+    with profiling.recording(sink):
+        stac.create_item([href], split_by_step=True, cache=False, kerchunk_products=ALL)
+    records = {r.phase: r for r in sink.records}
+    # the whole file, while scanning
+    assert records["scan"].bytes_read == sum(e["_length"] for e in entries)
+    assert records["scan"].requests == 1
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_create_items(enfo, executor):
+    href, _ = enfo
+    sink = profiling.MemorySink()
+    with profiling.recording(sink):
+        items = list(
+            stac.create_items([href], cache=False, executor=executor, workers=1)
+        )
+    assert [r.phase for r in sink.records][-2:] == ["item", "serialize"]
+    assert {r.item_id for r in sink.records} == {items[0].id}
+
+
+def test_sinks(caplog):
+    record = profiling.Record("item-1", "scan", 0.5, 100, 1)
+    f = io.StringIO()
+    profiling.JSONLinesSink(f).emit(record)
+    assert json.loads(f.getvalue()) == {
+        "item_id": "item-1",
+        "phase": "scan",
+        "seconds": 0.5,
+        "bytes_read": 100,
+        "requests": 1,
+        "peak_memory": None,
+    }
+
+    with caplog.at_level(logging.DEBUG, logger=profiling.__name__):
+        profiling.LoggingSink().emit(record)
+    assert "item-1 scan: 0.500s, 100 bytes in 1 requests" in caplog.text
+
+
+def test_format_summary():
+    records = [
+        profiling.Record("a", "scan", 1.0, 2_000_000, 2, 3_000_000),
+        profiling.Record("b", "scan", 3.0, 0, 0, 1_000_000),
+        profiling.Record("a", "item", 5.0),
+    ]
+    summary = profiling.summarize(records)
+    assert summary["scan"] == {
+        "count": 2,
+        "seconds": 4.0,
+        "mean_seconds": 2.0,
+        "bytes_read": 2_000_000,
+        "requests": 2,
+        "peak_memory": 3_000_000,
+    }
+    lines = profiling.format_summary(records).splitlines()
+    assert lines[1].split() == ["item", "1", "5.000", "5000.000", "0.0", "0"]
+    assert lines[2].split() == ["scan", "2", "4.000", "2000.000", "2.0", "2", "3.0"]
+
+
+def test_profile_option(cli, enfo, tmp_path):
+    href, _ = enfo
+    result = CliRunner().invoke(
+        cli,
+        [
+            "ecmwf-forecast",
+            "create-item",
+            href,
+            href.replace(".grib2", ".index"),
+            str(tmp_path / "item.json"),
+            "--no-cache",
+            "--all-products",
+            "--profile",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    phases = [line.split()[0] for line in result.stderr.splitlines()[1:]]
+    assert sorted(phases) == sorted(
+        ["item", "kerchunk", "scan", "combine", "postprocess", "write"]
+    )
@@ -0,0 +1,62 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from stactools.ecmwf_forecast.range_codec import Range
+
+
+@pytest.mark.parametrize(
+    "array",
+    [
+        90 - 0.4 * np.arange(451),
+        -180 + 0.4 * np.arange(900),
+        90 - 0.25 * np.arange(721),
+        -180 + 0.25 * np.arange(1440),
+    ],
+)
+def test_roundtrip(array):
+    codec = Range()
+    encoded = codec.encode(array.tobytes())
+    assert len(encoded) == 3 * 8
+    np.testing.assert_allclose(codec.decode(encoded), array, rtol=0, atol=1e-10)
+
+
+def test_irregular_raw():
+    array = np.array([0.0, 1.0, 3.0, 4.0])
+    encoded = Range().encode(array.tobytes())
+    assert len(encoded) == 5 * 8
+    np.testing.assert_array_equal(Range().decode(encoded), array)
+
+
+def test_irregular_raise():
+    array = np.array([0.0, 1.0, 3.0, 4.0])
+    with pytest.raises(ValueError, match="not regularly spaced"):
+        Range(irregular="raise").encode(array.tobytes())
+
+    # within the tolerance
+    Range(irregular="raise", tolerance=1.0).encode(array.tobytes())
+
+
+def test_decode_out_and_memoized():
+    codec = Range()
+    encoded = codec.encode((90 - 0.4 * np.arange(451)).tobytes())
+    a, b = codec.decode(encoded), codec.decode(bytearray(encoded))
+    assert a is b
+    assert not a.flags.writeable
+
+    out = np.empty(451)
+    result = codec.decode(encoded, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, a)
+
+
+def test_decode_existing_references():
+    with open("tests/blob_kerchunk_indices.json") as f:
+        refs = json.load(f)["refs"]
+    latitude = Range().decode(base64.b64decode(refs["latitude/0"][7:]))
+    longitude = Range().decode(base64.b64decode(refs["longitude/0"][7:]))
+    assert latitude.shape == (451,)
+    assert longitude.shape == (900,)
+    assert (latitude[0], longitude[0]) == (90.0, -180.0)
@@ -0,0 +1,156 @@
+import asyncio
+import io
+
+import pytest
+from click.testing import CliRunner
+
+from stactools.ecmwf_forecast import reads
+
+from .servers import RangeRequestHandler, serve
+from .synthetic import PRODUCTS, write_grib2
+
+
+def _message(offset, length, **kwargs):
+    return {"_offset": offset, "_length": length, **kwargs}
+
+
+def test_plan_reads():
+    messages = [
+        _message(200, 50),
+        _message(0, 100),
+        _message(100, 50),
+        _message(160, 10),
+    ]
+    plan = reads.plan_reads(messages, max_gap=0)
+    assert [(r.start, r.end) for r in plan] == [(0, 150), (160, 170), (200, 250)]
+    assert plan[0].messages == (messages[1], messages[2])
+
+    plan = reads.plan_reads(messages, max_gap=30)
+    assert [(r.start, r.end) for r in plan] == [(0, 250)]
+
+    plan = reads.plan_reads(messages, max_gap=30, max_size=200)
+    assert [(r.start, r.end) for r in plan] == [(0, 170), (200, 250)]
+
+    assert reads.plan_reads([]) == []
+
+
+def test_select_messages():
+    messages = [
+        _message(0, 1, param="t", levtype="pl", levelist="500", number="1"),
+        _message(1, 1, param="t", levtype="pl", levelist="850", number="1"),
+        _message(2, 1, param="u", levtype="pl", levelist="500", number="2"),
+        _message(3, 1, param="2t", levtype="sfc", number="1"),
+    ]
+    assert reads.select_messages(messages, param="t") == messages[:2]
+    assert (
+        reads.select_messages(messages, levelist=[500, 850], number=1) == messages[:2]
+    )
+    assert reads.select_messages(messages, param=["t", "u"], levelist=500) == [
+        messages[0],
+        messages[2],
+    ]
+    assert reads.select_messages(messages, levelist=None) == messages
+    with pytest.raises(ValueError, match="Bad selection keys"):
+        reads.select_messages(messages, level=500)
+
+
+@pytest.fixture
+def enfo(tmp_path):
+    href = str(tmp_path / "20231019000000-0h-enfo-ef.grib2")
+    entries = write_grib2(href, PRODUCTS["enfo", "ef"], stream="enfo", type="ef")
+    with open(href, "rb") as f:
+        data = f.read()
+    return href, entries, data
+
+
+def _expected(entries, data):
+    return [data[e["_offset"] : e["_offset"] + e["_length"]] for e in entries]
+
+
+def test_read_messages(enfo):
+    href, entries, data = enfo
+    selected = reads.select_messages(entries, param="t")
+    assert len(selected) == 6
+    # in the order asked for, even when the file order differs
+    selected = selected[::-1]
+    assert reads.read_messages(href, selected) == _expected(selected, data)
+    assert reads.read_messages(href, selected, max_gap=0, max_concurrency=2) == (
+        _expected(selected, data)
+    )
+    assert reads.read_messages(href, []) == []
+
+
+def test_read_messages_coalesces_requests(enfo, tmp_path):
+    _, entries, data = enfo
+    selected = reads.select_messages(entries, param="t")
+    with serve(tmp_path) as url:
+        href = f"{url}/20231019000000-0h-enfo-ef.grib2"
+        result = reads.read_messages(href, selected)
+        requests = [r for r in RangeRequestHandler.requests if r[0] == "GET"]
+        assert len(requests) == 1
+
+        RangeRequestHandler.requests = []
+        result_async = asyncio.run(reads.read_messages_async(href, selected))
+        requests = [r for r in RangeRequestHandler.requests if r[0] == "GET"]
+        assert len(requests) == 1
+
+    assert result == result_async == _expected(selected, data)
+
+
+def test_iter_messages(enfo):
+    _, entries, data = enfo
+    expected = [(e["_offset"], m) for e, m in zip(entries, _expected(entries, data))]
+    assert list(reads.iter_messages(io.BytesIO(data))) == expected
+
+    # padding before and between messages, across reading blocks
+    first, second = expected[0][1], expected[1][1]
+    padding = b"\0" * 2000
+    padded = padding + first + padding + second + b"\0" * 10
+    result = list(reads.iter_messages(io.BytesIO(padded)))
+    assert result == [(2000, first), (4000 + len(first), second)]
+
+
+@pytest.mark.parametrize(
+    "data,match",
+    [
+        (b"GRIB\0\0\0\x02" + b"\0" * 108, "Bad GRIB2 message length 0"),
+        (b"GRIB\0\0\0\x01" + b"\0" * 108, "Bad GRIB edition 1"),
+        (b"GRIB\0\0\0\x02", "Truncated"),
+    ],
+)
+def test_iter_messages_bad(data, match):
+    with pytest.raises(ValueError, match=match):
+        list(reads.iter_messages(io.BytesIO(data)))
+
+
+def test_iter_messages_truncated(enfo):
+    _, entries, data = enfo
+    end = entries[0]["_offset"] + entries[0]["_length"]
+    with pytest.raises(ValueError, match="Truncated GRIB2 message at offset 0"):
+        list(reads.iter_messages(io.BytesIO(data[: end - 10])))
+    # a wrong length, with the next message's bytes instead of the trailer
+    bad = bytearray(data)
+    bad[8:16] = (entries[0]["_length"] + 8).to_bytes(8, "big")
+    with pytest.raises(ValueError, match="Truncated"):
+        list(reads.iter_messages(io.BytesIO(bytes(bad))))
+
+
+def test_extract_command(cli, enfo, tmp_path):
+    href, entries, data = enfo
+    destination = tmp_path / "t-500.grib2"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "ecmwf-forecast",
+            "extract",
+            href,
+            str(destination),
+            "--param",
+            "t",
+            "--levelist",
+            "850",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    selected = reads.select_messages(entries, param="t", levelist="850")
+    assert destination.read_bytes() == b"".join(_expected(selected, data))
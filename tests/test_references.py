@@ -0,0 +1,186 @@
+import json
+
+import fsspec
+import pytest
+import xarray as xr
+from click.testing import CliRunner
+
+from stactools.ecmwf_forecast import references, stac
+
+from .conftest import write_hrefs
+
+
+def test_references_href():
+    assert (
+        references.references_href("s3://bucket/refs/", "item", "0h-references")
+        == "s3://bucket/refs/item/0h-references.json"
+    )
+    assert (
+        references.references_href("refs", "item", "references", format="parquet")
+        == "refs/item/references.parq"
+    )
+
+
+def test_write_references_bad_format(tmp_path):
+    with pytest.raises(ValueError, match="Bad references format"):
+        references.write_references({}, str(tmp_path / "refs"), format="csv")
+
+
+def test_create_item_json_references(hrefs, tmp_path):
+    inline = stac.create_item(hrefs)
+    item = stac.create_item(hrefs, references_href=str(tmp_path / "refs"))
+
+    data = item.assets["0h-grib2"]
+    assert "kerchunk:indices" not in data.extra_fields
+    asset = item.assets["0h-references"]
+    assert asset.href == str(tmp_path / "refs" / item.id / "0h-references.json")
+    assert asset.media_type == references.JSON_MEDIA_TYPE
+    assert asset.roles == ["references"]
+    assert asset.extra_fields == {"ecmwf:step": "0h"}
+
+    with open(asset.href) as f:
+        assert (
+            json.load(f) == inline.assets["0h-grib2"].extra_fields["kerchunk:indices"]
+        )
+
+    # the index asset never has references
+    assert item.assets["0h-index"].to_dict() == inline.assets["0h-index"].to_dict()
+
+
+def test_create_item_parquet_references(hrefs, tmp_path):
+    pytest.importorskip("fastparquet")
+    inline = stac.create_item(hrefs, split_by_step=True)
+    item = stac.create_item(
+        hrefs,
+        split_by_step=True,
+        references_href=str(tmp_path / "refs"),
+        references_format="parquet",
+    )
+    asset = item.assets["references"]
+    assert asset.media_type == references.PARQUET_MEDIA_TYPE
+    assert asset.href.endswith("references.parq")
+
+    fs = fsspec.filesystem("reference", fo=asset.href, remote_protocol="file")
+    ds = xr.open_dataset(fs.get_mapper(""), engine="zarr", consolidated=False)
+    indices = inline.assets["data"].extra_fields["kerchunk:indices"]
+    expected = xr.open_dataset(
+        fsspec.filesystem("reference", fo=indices).get_mapper(""),
+        engine="zarr",
+        consolidated=False,
+    )
+    xr.testing.assert_identical(ds.load(), expected.load())
+
+
+@pytest.fixture
+def items(tmp_path):
+    hrefs = write_hrefs(tmp_path, dates=["20231019", "20231020"])
+    return [stac.create_item(list(pair)) for pair in zip(hrefs[::2], hrefs[1::2])]
+
+
+def test_split_merge_references():
+    template = {"version": 1, "refs": {".zgroup": "a", "x/0": "b", "y/0": "c"}}
+    refs = {"version": 1, "refs": {".zgroup": "a", "x/0": "B", "z/0": "d"}}
+    delta = references.split_references(refs, template)
+    assert delta == {"version": 1, "refs": {"x/0": "B", "z/0": "d"}, "deleted": ["y/0"]}
+    assert references.merge_references(template, delta) == refs
+
+
+def test_build_template():
+    template = references.build_template(
+        [
+            {"version": 1, "refs": {".zgroup": "a", "time/0": "1"}},
+            {"version": 1, "refs": {".zgroup": "a", "time/0": "2"}},
+        ]
+    )
+    assert template == {"version": 1, "refs": {".zgroup": "a"}}
+    with pytest.raises(ValueError):
+        references.build_template([])
+
+
+def test_create_item_with_templates(items):
+    templates = stac.build_templates(items)
+    assert list(templates) == ["wave-fc"]
+    template = templates["wave-fc"]["refs"]
+    assert ".zgroup" in template
+    assert "latitude/0" in template
+    assert "time/0" not in template
+    assert "swh/0.0.0" not in template
+
+    full = items[1].assets["0h-grib2"].extra_fields
+    item = stac.create_item(
+        [items[1].assets["0h-grib2"].href, items[1].assets["0h-index"].href],
+        templates=templates,
+    )
+    fields = item.assets["0h-grib2"].extra_fields
+    assert fields["kerchunk:template"] == "wave-fc"
+    assert set(fields["kerchunk:indices"]["refs"]) == {
+        "time/0",
+        "valid_time/0",
+        "swh/0.0.0",
+        "mwp/0.0.0",
+    }
+    assert len(json.dumps(fields)) < len(json.dumps(full)) / 5
+    assert references.asset_references(fields, templates) == full["kerchunk:indices"]
+    assert references.asset_references(full, templates) == full["kerchunk:indices"]
+
+    collection = stac.create_collection(templates=templates)
+    assert collection.extra_fields["kerchunk:templates"] == templates
+
+
+def test_create_templates_command(cli, items, tmp_path):
+    items_path = tmp_path / "items.ndjson"
+    items_path.write_text("".join(json.dumps(item.to_dict()) + "\n" for item in items))
+    templates_path = tmp_path / "templates.json"
+
+    result = CliRunner().invoke(
+        cli,
+        ["ecmwf-forecast", "create-templates", str(items_path), str(templates_path)],
+    )
+    assert result.exit_code == 0, result.output
+    assert json.loads(templates_path.read_text()) == stac.build_templates(items)
+
+
+def test_create_run_references_from_sidecars(items, tmp_path):
+    templates = stac.build_templates(items)
+    hrefs = [items[1].assets["0h-grib2"].href, items[1].assets["0h-index"].href]
+    item = stac.create_item(
+        hrefs, templates=templates, references_href=str(tmp_path / "refs")
+    )
+    assert stac.create_run_references(
+        item, templates=templates
+    ) == stac.create_run_references(items[1])
+
+
+@pytest.mark.parametrize("format", ["json", "parquet"])
+def test_references_with_templates_open(items, tmp_path, format):
+    if format == "parquet":
+        pytest.importorskip("fastparquet")
+    templates = stac.build_templates(items)
+    hrefs = [items[1].assets["0h-grib2"].href, items[1].assets["0h-index"].href]
+    item = stac.create_item(
+        hrefs,
+        split_by_step=True,
+        templates=templates,
+        references_href=str(tmp_path / "refs"),
+        references_format=format,
+    )
+    asset = item.assets["references"]
+    assert references.TEMPLATE_FIELD not in asset.extra_fields
+    assert references.TEMPLATE_FIELD not in item.assets["data"].extra_fields
+
+    ds = xr.open_dataset(
+        "reference://",
+        engine="zarr",
+        backend_kwargs={
+            "consolidated": False,
+            "storage_options": {"fo": asset.href, "remote_protocol": "file"},
+        },
+    )
+    expected = xr.open_dataset(
+        fsspec.filesystem(
+            "reference", fo=items[1].assets["0h-grib2"].extra_fields["kerchunk:indices"]
+        ).get_mapper(""),
+        engine="zarr",
+        consolidated=False,
+    )
+    xr.testing.assert_identical(ds.load(), expected.load())
@@ -0,0 +1,47 @@
+import os
+
+import pystac
+
+from stactools.ecmwf_forecast import stac
+from stactools.ecmwf_forecast.state import StateStore, item_checksum
+
+from .conftest import write_hrefs
+
+
+def test_state_store(tmp_path):
+    item = pystac.Item("a", None, None, pystac.utils.str_to_datetime("2023-10-19"), {})
+    path = str(tmp_path / "state.db")
+    with StateStore(path) as state:
+        assert len(state) == 0
+        state.put(item, {"a.grib2": {"size": "1"}})
+
+    with StateStore(path) as state:
+        assert "a" in state
+        assert state.get("a")["checksum"] == item_checksum(item)
+        assert state.is_current("a", {"a.grib2": {"size": "1"}})
+        assert not state.is_current("a", {"a.grib2": {"size": "2"}})
+        assert not state.is_current("b", {})
+
+
+def test_update_items(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_hrefs(data, dates=["20231019", "20231020"])
+    (data / "README.txt").write_text("not an asset")
+
+    with StateStore(str(tmp_path / "state.db")) as state:
+        items = list(stac.update_items(str(data), state, split_by_step=True))
+        assert [item.id for item in items] == [
+            "ecmwf-2023-10-19T00-wave-fc-0h",
+            "ecmwf-2023-10-20T00-wave-fc-0h",
+        ]
+        assert len(state) == 2
+
+        assert list(stac.update_items(str(data), state, split_by_step=True)) == []
+
+        # rewrite one of the files
+        index = data / "20231020000000-0h-wave-fc.index"
+        os.utime(index, (0, 0))
+        items = list(stac.update_items(str(data), state, split_by_step=True))
+        assert [item.id for item in items] == ["ecmwf-2023-10-20T00-wave-fc-0h"]
+        assert list(stac.update_items(str(data), state, split_by_step=True)) == []